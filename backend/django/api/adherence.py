@@ -0,0 +1,91 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+
+from .models import AdherenceDaily, Medicine, MedicineIntake, User
+from .timeutils import get_zone
+
+STATUSES = ('pending', 'taken', 'missed', 'skipped')
+
+
+def intake_owners(medicine_ids):
+    """Medicine id -> ``(user_id, timezone name)`` for the given medicines, in one query."""
+    return {
+        medicine_id: (user_id, zone_name)
+        for medicine_id, user_id, zone_name in (
+            Medicine.objects.filter(id__in=medicine_ids).values_list('id', 'user_id', 'user__timezone')
+        )
+    }
+
+
+def record_status_changes(changes, owners=None):
+    """
+    Fold intake status transitions into the daily rollup.
+
+    ``changes`` is an iterable of ``(medicine_id, scheduled_time, old_status, new_status)``; use
+    ``None`` for the old status of a new intake or the new status of a deleted one. Days are
+    bucketed in the owner's timezone. Each affected (medicine, day) row gets a single UPDATE.
+    ``owners`` maps medicine id to ``(user_id, timezone name)`` when the caller already has
+    them; otherwise they are loaded with ``intake_owners``. Stock (api/refills.py) and cache
+    invalidation are the callers' business.
+    """
+    changes = [change for change in changes if change[2] != change[3]]
+    if not changes:
+        return
+    if owners is None:
+        owners = intake_owners({change[0] for change in changes})
+    zones = {zone_name: get_zone(zone_name) for _, zone_name in owners.values()}
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for medicine_id, scheduled_time, old_status, new_status in changes:
+        if medicine_id not in owners:
+            continue
+        user_id, zone_name = owners[medicine_id]
+        day = scheduled_time.astimezone(zones[zone_name]).date()
+        if old_status in STATUSES:
+            deltas[(user_id, medicine_id, day)][old_status] -= 1
+        if new_status in STATUSES:
+            deltas[(user_id, medicine_id, day)][new_status] += 1
+
+    with transaction.atomic():
+        AdherenceDaily.objects.bulk_create(
+            [AdherenceDaily(user_id=user_id, medicine_id=medicine_id, date=day) for user_id, medicine_id, day in deltas],
+            ignore_conflicts=True,
+        )
+        for (user_id, medicine_id, day), counts in deltas.items():
+            updates = {status: F(status) + delta for status, delta in counts.items() if delta}
+            if updates:
+                AdherenceDaily.objects.filter(medicine_id=medicine_id, date=day).update(**updates)
+
+
+def rebuild_rollup(users=None):
+    """
+    Recompute the rollup from MedicineIntake for the given users (all users by default).
+
+    Runs one aggregate query per distinct timezone so days are bucketed in local time.
+    """
+    user_qs = User.objects.all() if users is None else User.objects.filter(id__in=[getattr(u, 'id', u) for u in users])
+    by_zone = defaultdict(list)
+    for user_id, name in user_qs.values_list('id', 'timezone'):
+        by_zone[name].append(user_id)
+
+    with transaction.atomic():
+        for name, user_ids in by_zone.items():
+            AdherenceDaily.objects.filter(user_id__in=user_ids).delete()
+            rows = (
+                MedicineIntake.objects
+                .filter(medicine__user_id__in=user_ids)
+                .annotate(day=TruncDate('scheduled_time', tzinfo=get_zone(name)))
+                .values('medicine__user_id', 'medicine_id', 'day', 'status')
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+            rollups = {}
+            for row in rows:
+                key = (row['medicine__user_id'], row['medicine_id'], row['day'])
+                rollup = rollups.setdefault(key, AdherenceDaily(user_id=key[0], medicine_id=key[1], date=key[2]))
+                if row['status'] in STATUSES:
+                    setattr(rollup, row['status'], row['count'])
+            AdherenceDaily.objects.bulk_create(rollups.values(), batch_size=1000)
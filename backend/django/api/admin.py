@@ -2,8 +2,38 @@ from django.contrib import admin
 from .models import User, Medicine, MedicineSchedule, Notification, MedicineIntake, Caregiver
 
 admin.site.register(User)
-admin.site.register(Medicine)
-admin.site.register(MedicineSchedule)
-admin.site.register(Notification)
-admin.site.register(MedicineIntake)
-admin.site.register(Caregiver)
+
+
+@admin.register(Medicine)
+class MedicineAdmin(admin.ModelAdmin):
+    list_display = ('name', 'dosage', 'user', 'remaining_count')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(MedicineSchedule)
+class MedicineScheduleAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'days_of_week', 'is_active', 'next_fire_at')
+    list_select_related = ('medicine',)
+    raw_id_fields = ('medicine',)
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'type', 'status', 'created_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(MedicineIntake)
+class MedicineIntakeAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'scheduled_time', 'status')
+    list_select_related = ('medicine',)
+    raw_id_fields = ('medicine',)
+
+
+@admin.register(Caregiver)
+class CaregiverAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'relationship', 'phone_number')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class ApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if settings.DRUG_CATALOG_PRELOAD:
+            from .drugmatch import warm_catalog
+            warm_catalog()
@@ -0,0 +1,271 @@
+"""
+Async-native versions of the hottest API endpoints, mounted under ``/api/async/``.
+
+These are plain Django ``async def`` views, so under ASGI a request only leaves the event
+loop for the queries themselves instead of holding a worker thread for its whole lifetime
+the way the DRF viewsets do. Responses match the DRF endpoints (same fields, same
+cursor-paginated ``{next, previous, results}`` envelope), built with the fast-path row
+builders and rendered with FastJSONRenderer.
+"""
+import inspect
+import json
+from functools import partial, wraps
+
+from django.db import IntegrityError
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import StreamToken, aget_user, caching_enabled
+from .fastpath import (
+    FastJSONRenderer,
+    INTAKE_FIELDS,
+    MEDICINE_FIELDS,
+    NOTIFICATION_FIELDS,
+    intake_rows,
+    medicine_rows,
+    medicine_schedules,
+    notification_rows,
+)
+from .models import Medicine, MedicineIntake, Notification, User
+from .push import get_broker
+from .pagination import AsyncKeysetPagination, InvalidCursor
+from .serializers import BulkIntakeItemSerializer, MedicineIntakeSerializer, NotificationSerializer, UserSerializer
+
+_renderer = FastJSONRenderer()
+_jwt = JWTAuthentication()
+
+medicine_pagination = AsyncKeysetPagination(('-created_at', '-id'))
+intake_pagination = AsyncKeysetPagination(('-scheduled_time', '-id'))
+notification_pagination = AsyncKeysetPagination(('-created_at', '-id'))
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(_renderer.render(data), status=status_code, content_type='application/json', headers=headers)
+
+
+async def authenticate(request, stream_token=False):
+    """
+    Resolve the bearer token to an active user the way CachedJWTAuthentication does.
+
+    Token decoding is pure CPU work (no blacklist app is installed), so only the user lookup
+    awaits, and that is usually a cache hit.
+    ``stream_token`` also accepts a StreamToken as ``?stream_token=`` for EventSource, which
+    cannot send headers.
+    """
+    header = _jwt.get_header(request)
+    raw_token = _jwt.get_raw_token(header) if header else None
+    if raw_token is not None:
+        validated = _jwt.get_validated_token(raw_token)
+    elif stream_token and request.GET.get('stream_token'):
+        try:
+            validated = StreamToken(request.GET['stream_token'])
+        except TokenError as exc:
+            raise InvalidToken(str(exc))
+    else:
+        return None
+    try:
+        user_id = validated[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Token contained no recognizable user identification')
+    if caching_enabled():
+        user = await aget_user(user_id)
+        return user if user is not None and user.is_active else None
+    return await User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}, is_active=True).afirst()
+
+
+def jwt_required(view=None, *, stream_token=False):
+    """Authenticate an async view with the bearer token, answering 401 like DRF's IsAuthenticated."""
+    if view is None:
+        return partial(jwt_required, stream_token=stream_token)
+
+    @csrf_exempt
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await authenticate(request, stream_token)
+        except AuthenticationFailed as exc:
+            # Includes InvalidToken and the malformed-header errors of get_raw_token
+            return unauthorized(request, exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail})
+        if user is None:
+            has_token = 'HTTP_AUTHORIZATION' in request.META or (stream_token and 'stream_token' in request.GET)
+            message = 'User not found' if has_token else 'Authentication credentials were not provided.'
+            return unauthorized(request, {'detail': message})
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def unauthorized(request, detail):
+    return json_response(
+        detail, status.HTTP_401_UNAUTHORIZED, headers={'WWW-Authenticate': _jwt.authenticate_header(request)},
+    )
+
+
+def asgi_required(view):
+    """
+    Answer 503 outside ASGI. A WSGI server serves a streaming response by draining its async
+    iterator first, so an endless stream would never send a byte and pin the worker for good.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return json_response(
+                {'detail': 'The notification stream needs an ASGI server; poll /api/notifications/ instead.'},
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@require_GET
+@jwt_required
+async def me(request):
+    return json_response(UserSerializer(request.user).data)
+
+
+async def page_response(request, pagination, queryset, fields, build):
+    """One cursor-paginated ``{next, previous, results}`` response, like DRF's CursorPagination."""
+    try:
+        rows, next_url, previous_url = await pagination.paginate(request, queryset, fields)
+    except InvalidCursor as exc:
+        return json_response({'detail': str(exc)}, status.HTTP_400_BAD_REQUEST)
+    results = build(rows)
+    if inspect.isawaitable(results):
+        results = await results
+    return json_response({'next': next_url, 'previous': previous_url, 'results': results})
+
+
+async def medicine_results(rows):
+    schedules = [schedule async for schedule in medicine_schedules(rows)] if rows else []
+    return medicine_rows(rows, schedules)
+
+
+@require_GET
+@jwt_required
+async def medicine_list(request):
+    queryset = Medicine.objects.filter(user=request.user)
+    return await page_response(request, medicine_pagination, queryset, MEDICINE_FIELDS, medicine_results)
+
+
+@require_http_methods(['GET', 'POST'])
+@jwt_required
+async def intake_list(request):
+    if request.method == 'POST':
+        return await intake_create(request)
+    queryset = MedicineIntake.objects.filter(medicine__user=request.user)
+    return await page_response(request, intake_pagination, queryset, INTAKE_FIELDS, intake_rows)
+
+
+async def intake_create(request):
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return json_response({'detail': 'Expected a JSON object'}, status.HTTP_400_BAD_REQUEST)
+    payload.pop('id', None)
+    payload.setdefault('status', 'pending')
+    serializer = BulkIntakeItemSerializer(data=payload)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+
+    if not await Medicine.objects.filter(id=data['medicine'], user=request.user).aexists():
+        return json_response({'detail': 'You can only create intakes for your own medicines'}, status.HTTP_403_FORBIDDEN)
+    duplicate = {'non_field_errors': ['The fields medicine, scheduled_time must make a unique set.']}
+    if await MedicineIntake.objects.filter(medicine_id=data['medicine'], scheduled_time=data['scheduled_time']).aexists():
+        return json_response(duplicate, status.HTTP_400_BAD_REQUEST)
+    try:
+        intake = await MedicineIntake.objects.acreate(
+            medicine_id=data['medicine'], scheduled_time=data['scheduled_time'], status=data['status'],
+            actual_time=data.get('actual_time'), notes=data.get('notes'),
+        )
+    except IntegrityError:
+        return json_response(duplicate, status.HTTP_400_BAD_REQUEST)
+    return json_response(MedicineIntakeSerializer(intake).data, status.HTTP_201_CREATED)
+
+
+@require_GET
+@jwt_required
+async def notification_list(request):
+    queryset = Notification.objects.filter(user=request.user)
+    return await page_response(request, notification_pagination, queryset, NOTIFICATION_FIELDS, notification_rows)
+
+
+@require_POST
+@jwt_required
+async def notification_mark_read(request, pk):
+    notification = await Notification.objects.filter(pk=pk, user=request.user).afirst()
+    if notification is None:
+        return json_response({'detail': 'No Notification matches the given query.'}, status.HTTP_404_NOT_FOUND)
+    notification.status = 'read'
+    await notification.asave(update_fields=['status', 'updated_at'])
+    return json_response(NotificationSerializer(notification).data)
+
+
+
+def sse_event(notification):
+    return b'id: %d\nevent: notification\ndata: %s\n\n' % (notification['id'], _renderer.render(notification))
+
+
+@require_POST
+@asgi_required
+@jwt_required
+async def notification_stream_token(request):
+    """A StreamToken for opening the stream; 503 tells the client to poll instead."""
+    return json_response({
+        'token': str(StreamToken.for_user(request.user)),
+        'expires_in': settings.NOTIFICATION_STREAM_TOKEN_LIFETIME,
+    })
+
+
+@require_GET
+@asgi_required
+@jwt_required(stream_token=True)
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of the user's new notifications, replacing list polling.
+
+    Browsers authenticate with ``?stream_token=`` from notification_stream_token, since
+    EventSource cannot send the Authorization header.
+    Reconnecting clients send Last-Event-ID (EventSource does this itself) and first get
+    whatever was created after that id. Idle connections get a keep-alive comment every
+    NOTIFICATION_STREAM_HEARTBEAT seconds.
+    """
+    user_id = request.user.pk
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or 0)
+    except ValueError:
+        last_id = 0
+
+    async def events():
+        # Subscribe before replaying so nothing created in between is missed; ids dedupe the overlap
+        async with get_broker().subscribe(user_id) as subscription:
+            yield b'retry: 5000\n\n'
+            sent = last_id
+            if last_id:
+                missed = Notification.objects.filter(user_id=user_id, id__gt=last_id).order_by('id')
+                for notification in notification_rows([row async for row in missed.values(*NOTIFICATION_FIELDS)]):
+                    sent = notification['id']
+                    yield sse_event(notification)
+            while True:
+                notification = await subscription.next(settings.NOTIFICATION_STREAM_HEARTBEAT)
+                if notification is None:
+                    yield b': keep-alive\n\n'
+                elif notification['id'] > sent:
+                    sent = notification['id']
+                    yield sse_event(notification)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,98 @@
+"""
+JWT authentication that serves the request user from the cache instead of the users table.
+
+simplejwt's JWTAuthentication loads the User row on every request. CachedJWTAuthentication
+keeps each active user's fields (minus the password hash, which stays deferred and is only
+loaded if something reads it) in the shared cache for AUTH_USER_CACHE_TIMEOUT seconds. The
+post_save/post_delete signals in api/signals.py drop the entry, so deactivating or editing a
+user takes effect on their next request; queryset ``update()`` calls bypass signals and are
+only bounded by the timeout.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import Token
+
+from .models import User
+
+CACHED_FIELDS = tuple(field.attname for field in User._meta.concrete_fields if field.attname != 'password')
+
+
+def _key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def forget_user(user_id):
+    cache.delete(_key(user_id))
+
+
+def _from_cache(values):
+    return User.from_db(DEFAULT_DB_ALIAS, CACHED_FIELDS, values)
+
+
+def caching_enabled():
+    # Revocation compares a token claim with the password hash, which is never cached
+    return settings.AUTH_USER_CACHE_TIMEOUT > 0 and not jwt_settings.CHECK_REVOKE_TOKEN
+
+
+def _lookup(user_id):
+    return User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).only(*CACHED_FIELDS)
+
+
+def get_user(user_id):
+    """The user with this token id, from the cache when possible; None if missing."""
+    key = _key(user_id)
+    values = cache.get(key)
+    if values is not None:
+        return _from_cache(values)
+    user = _lookup(user_id).first()
+    if user is not None and user.is_active:
+        cache.set(key, tuple(getattr(user, name) for name in CACHED_FIELDS), settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+async def aget_user(user_id):
+    """Async ``get_user`` for the views in api/async_views.py."""
+    key = _key(user_id)
+    values = await cache.aget(key)
+    if values is not None:
+        return _from_cache(values)
+    user = await _lookup(user_id).afirst()
+    if user is not None and user.is_active:
+        await cache.aset(key, tuple(getattr(user, name) for name in CACHED_FIELDS), settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if not caching_enabled():
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user = get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+
+class StreamToken(Token):
+    """
+    Short-lived token that only opens the notification stream.
+
+    EventSource cannot send headers, so its token travels in the query string and ends up in
+    access logs. Its own type keeps it from authenticating anything else, and the access token
+    that would otherwise be logged stays valid for a day.
+    """
+    token_type = 'stream'
+    lifetime = timedelta(seconds=settings.NOTIFICATION_STREAM_TOKEN_LIFETIME)
@@ -0,0 +1,97 @@
+import hashlib
+import uuid
+from contextlib import contextmanager
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _version_key(scope, user_id):
+    return f'resp-version:{scope}:{user_id}'
+
+
+def get_version(scope, user_id):
+    """Current version token of a user's cached responses for ``scope``, creating one if missing."""
+    key = _version_key(scope, user_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key) or version
+    return version
+
+
+def invalidate(scope, user_id):
+    """Retire every cached response (and ETag) for one user and scope in a single write."""
+    cache.set(_version_key(scope, user_id), uuid.uuid4().hex, None)
+
+
+def invalidate_on_commit(scope, user_id):
+    """
+    ``invalidate`` once the current transaction commits (at once outside a transaction).
+
+    Bumping the version before the commit would let a concurrent request cache the
+    pre-commit rows under the new version, where they would stay until the next write.
+    """
+    transaction.on_commit(partial(invalidate, scope, user_id), robust=True)
+
+
+@contextmanager
+def lock(key, timeout):
+    """
+    Best-effort mutual exclusion across workers through the shared cache (Redis in production).
+
+    Yields whether the lock was acquired; it expires after ``timeout`` seconds if never released.
+    """
+    key = f'lock:{key}'
+    token = uuid.uuid4().hex
+    acquired = cache.add(key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+def cached_response(scope, vary=None):
+    """
+    Cache a read action's response data per user, scope and query string.
+
+    ``vary(request)`` returns an extra string the response depends on (e.g. the user's
+    local date), so a new value starts a new cache entry without an invalidation.
+
+    The ETag is derived from the scope's version token, so a matching If-None-Match is
+    answered with 304 before the queryset or serializer is touched. Signals in
+    api/signals.py call ``invalidate_on_commit`` when the underlying rows change.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            user_id = request.user.pk
+            version = get_version(scope, user_id)
+            extra = vary(request) if vary else ''
+            variant = hashlib.md5(f'{request.get_host()}?{request.META.get("QUERY_STRING", "")}#{extra}'.encode()).hexdigest()[:16]
+            etag = f'W/"{scope}-{version}-{variant}"'
+            headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+            if etag in request.headers.get('If-None-Match', ''):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            key = f'resp:{scope}:{user_id}:{version}:{variant}'
+            data = cache.get(key)
+            if data is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+            for header, value in headers.items():
+                response[header] = value
+            return response
+        return wrapper
+    return decorator
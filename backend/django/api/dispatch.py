@@ -0,0 +1,112 @@
+from dataclasses import dataclass, field
+from itertools import groupby
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import MedicineIntake
+from .timeutils import get_zone
+
+
+class SMSClient:
+    """Thin wrapper around the SMS gateway sharing one pooled HTTP session."""
+
+    def __init__(self, url=None, timeout=None, pool_size=None):
+        self.url = url or settings.SMS_GATEWAY_URL
+        self.timeout = timeout if timeout is not None else settings.SMS_GATEWAY_TIMEOUT
+        pool_size = pool_size or settings.SMS_DISPATCH_CONCURRENCY
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def send(self, phone, message):
+        response = self.session.post(self.url, json={'phone': phone, 'message': message}, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+@dataclass
+class DispatchStats:
+    sent: int = 0
+    failed: int = 0
+    latencies: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self):
+        return (
+            f"sent={self.sent} failed={self.failed} "
+            f"p50={self.percentile(50) * 1000:.1f}ms p95={self.percentile(95) * 1000:.1f}ms"
+        )
+
+
+def due_intakes(now=None, window_minutes=30, shard=None, shards=1):
+    """
+    Pending, un-notified intakes due within the window, joined to medicine and user in one query.
+
+    Ordered by user and scheduled time, so ``reminder_slots`` can coalesce them as they stream
+    by. With ``shard`` set, only intakes of users whose id falls in that shard (``user_id % shards``).
+    """
+    now = now or timezone.now()
+    window = now + timezone.timedelta(minutes=window_minutes)
+    intakes = MedicineIntake.objects.all()
+    if shard is not None:
+        intakes = intakes.alias(user_shard=Mod('medicine__user_id', shards)).filter(user_shard=shard)
+    return (
+        intakes
+        .filter(
+            scheduled_time__gte=now,
+            scheduled_time__lte=window,
+            status='pending',
+            notified_at__isnull=True,
+            medicine__user__sms_enabled=True,
+        )
+        .exclude(Q(medicine__user__phone_number__isnull=True) | Q(medicine__user__phone_number=''))
+        .select_related('medicine__user')
+        .only('id', 'scheduled_time', 'medicine__name', 'medicine__dosage', 'medicine__user__phone_number', 'medicine__user__timezone')
+        .order_by('medicine__user_id', 'scheduled_time', 'id')
+    )
+
+
+def reminder_slots(intakes):
+    """
+    Group intakes ordered as ``due_intakes`` returns them into one list per (user, minute).
+
+    A patient taking five medicines at 08:00 gets one reminder instead of five.
+    """
+    def slot(intake):
+        return intake.medicine.user_id, intake.scheduled_time.replace(second=0, microsecond=0)
+
+    for _, group in groupby(intakes, key=slot):
+        yield list(group)
+
+
+def _local_time(intake):
+    return intake.scheduled_time.astimezone(get_zone(intake.medicine.user.timezone)).strftime('%H:%M')
+
+
+def reminder_message(intake):
+    return f"Reminder: Take your medicine {intake.medicine.name} at {_local_time(intake)}"
+
+
+def slot_reminder_message(intakes):
+    """One reminder for every medicine due in the same slot; a single intake reads as before."""
+    if len(intakes) == 1:
+        return reminder_message(intakes[0])
+    names = [f'{intake.medicine.name} {intake.medicine.dosage}'.strip() for intake in intakes]
+    return f"Reminder: Take your medicines at {_local_time(intakes[0])}: {', '.join(names[:-1])} and {names[-1]}"
+
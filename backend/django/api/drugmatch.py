@@ -0,0 +1,206 @@
+"""
+Fuzzy matching of OCR'd medicine labels against a local drug catalog.
+
+The catalog (DRUG_CATALOG_PATH, a ``name<TAB>strength;strength`` file) is loaded once per
+process into an in-memory trigram index: every name's trigrams (padded per word, as
+pg_trgm does) map to a compact posting array of entry ids. A lookup scores candidate
+phrases of the OCR text by trigram similarity (shared / union, pg_trgm's measure). The
+posting arrays of a phrase's trigrams are concatenated and counted by ``Counter`` in C,
+so no Python code runs per posting, and once ``limit`` names are found the threshold rises
+to the weakest of them, which keeps later phrases cheap. Lookups stay in the low
+milliseconds with 100k+ names (``python -m benchmarks.drugmatch``).
+
+It does not depend on the database, so it works the same on SQLite and PostgreSQL.
+"""
+import heapq
+import logging
+import math
+import re
+from array import array
+from collections import Counter, defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Digits OCR tends to read in place of letters inside words ("Amoxici11in")
+_DIGITS_AS_LETTERS = str.maketrans('0158', 'olsb')
+# Letters OCR tends to read in place of digits inside numbers ("5OO mg")
+_LETTERS_AS_DIGITS = str.maketrans('OoIl', '0011')
+_WORD = re.compile(r'[a-z0-9]+')
+_DOSAGE = re.compile(
+    r'(?<![\w.])(\d[\dOoIl]*(?:[.,][\dOo]+)?)\s?(mg|mcg|µg|ug|g|ml|iu|units?|meq|%)(?![a-z])', re.IGNORECASE,
+)
+_UNITS = {'µg': 'mcg', 'ug': 'mcg', 'iu': 'IU', 'unit': 'IU', 'units': 'IU', 'meq': 'mEq'}
+# Label words that never start a drug name
+STOPWORDS = frozenset('''
+    tablet tablets capsule capsules take taken each daily once twice three times with without food
+    mouth oral water every hours hour morning night bedtime before after meal meals refill refills
+    pharmacy prescription patient doctor quantity expires expiry date lot store keep reach children
+    directions warning caution only used use tabs caps film coated extended release delayed
+'''.split())
+MAX_QUERY_WORDS = 300
+MAX_PHRASE_WORDS = 3
+
+
+def normalize(text):
+    """Lowercased words of ``text``, with OCR digit confusions inside words undone."""
+    words = []
+    for word in _WORD.findall(text.lower()):
+        if sum(character.isalpha() for character in word) >= 4:
+            word = word.translate(_DIGITS_AS_LETTERS)
+        words.append(word)
+    return words
+
+
+def trigrams(words):
+    grams = set()
+    for word in words:
+        padded = f'  {word} '
+        grams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return grams
+
+
+def parse_dosages(text):
+    """Dosages in ``text`` in the catalog's format ("500 mg"), in order of appearance."""
+    found = []
+    for number, unit in _DOSAGE.findall(text):
+        number = number.translate(_LETTERS_AS_DIGITS).replace(',', '.')
+        if '.' in number:
+            number = number.rstrip('0').rstrip('.')
+        unit = _UNITS.get(unit.lower(), unit.lower())
+        dosage = f'{number} {unit}'
+        if dosage not in found:
+            found.append(dosage)
+    return found
+
+
+class DrugCatalog:
+    def __init__(self, entries):
+        """``entries`` is an iterable of ``(name, strengths)``; duplicate names are merged."""
+        self.names = []
+        self.strengths = []
+        self.sizes = array('H')
+        index_of = {}
+        postings = defaultdict(list)
+        for name, strengths in entries:
+            key = ' '.join(normalize(name))
+            if not key:
+                continue
+            if key in index_of:
+                known = self.strengths[index_of[key]]
+                known.extend(strength for strength in strengths if strength not in known)
+                continue
+            index = index_of[key] = len(self.names)
+            grams = trigrams(key.split())
+            self.names.append(name)
+            self.strengths.append(list(strengths))
+            self.sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(index)
+        self.postings = {gram: array('I', ids) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path):
+        def entries():
+            with open(path, encoding='utf-8') as catalog:
+                for line in catalog:
+                    if not line.strip() or line.startswith('#'):
+                        continue
+                    name, _, strengths = line.rstrip('\n').partition('\t')
+                    yield name.strip(), [strength.strip() for strength in strengths.split(';') if strength.strip()]
+        return cls(entries())
+
+    def search(self, words, threshold):
+        """Entry index -> similarity for every name at least ``threshold`` similar to ``words``."""
+        grams = trigrams(words)
+        if not grams:
+            return {}
+        known = [self.postings[gram] for gram in grams if gram in self.postings]
+        required = max(math.ceil(threshold * len(grams)), 1)
+        if len(known) < required:
+            return {}
+        # Counter counts a flat array in C, which is far cheaper than a Python loop per posting
+        hits = array('I')
+        for postings in known:
+            hits.extend(postings)
+        shared = Counter(hits)
+        scores = {}
+        for index, common in shared.items():
+            if common < required:
+                continue
+            score = common / (len(grams) + self.sizes[index] - common)
+            if score >= threshold:
+                scores[index] = score
+        return scores
+
+    def match(self, text, limit=5, threshold=None):
+        """
+        Ranked catalog names for noisy label text, each with the dosage read from the same line.
+
+        Every run of one to MAX_PHRASE_WORDS words not starting with a STOPWORD is a candidate
+        phrase; a name keeps its best score over all phrases.
+        """
+        threshold = settings.DRUG_MATCH_THRESHOLD if threshold is None else threshold
+        best = {}
+        floor = 0
+        budget = MAX_QUERY_WORDS
+        for line in text.splitlines() or [text]:
+            words = normalize(line)[:budget]
+            budget -= len(words)
+            dosages = parse_dosages(line)
+            for start, first in enumerate(words):
+                if len(first) < 3 or first in STOPWORDS or not first[0].isalpha():
+                    continue
+                for end in range(start + 1, min(start + MAX_PHRASE_WORDS, len(words)) + 1):
+                    if end > start + 1 and not words[end - 1][0].isalpha():
+                        # A number ends the name ("Amoxicillin 500 mg"); longer phrases only dilute it
+                        break
+                    phrase = words[start:end]
+                    for index, score in self.search(phrase, max(threshold, floor)).items():
+                        if index not in best or score > best[index][0]:
+                            best[index] = (score, ' '.join(phrase), dosages)
+                    if len(best) >= limit:
+                        # Names scoring under the current top ``limit`` can no longer make the cut
+                        floor = heapq.nlargest(limit, (entry[0] for entry in best.values()))[-1]
+            if budget <= 0:
+                break
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], self.names[item[0]]))[:limit]
+        results = []
+        for index, (score, phrase, dosages) in ranked:
+            strengths = self.strengths[index]
+            dosage = next((dosage for dosage in dosages if dosage in strengths), dosages[0] if dosages else None)
+            results.append({
+                'name': self.names[index],
+                'dosage': dosage,
+                'score': round(score, 3),
+                'matched_text': phrase,
+                'strengths': strengths,
+            })
+        return results
+
+
+@lru_cache(maxsize=None)
+def _load(path):
+    return DrugCatalog.load(path)
+
+
+def get_catalog():
+    """The catalog at DRUG_CATALOG_PATH, indexed on first use and kept for the life of the process."""
+    return _load(str(Path(settings.DRUG_CATALOG_PATH)))
+
+
+def warm_catalog():
+    """Index the catalog at startup so the first match request does not pay for it."""
+    try:
+        catalog = get_catalog()
+    except OSError as exc:
+        logger.warning('Drug catalog %s could not be loaded: %s', settings.DRUG_CATALOG_PATH, exc)
+        return
+    logger.info('Drug catalog indexed: %d names', len(catalog))
@@ -0,0 +1,126 @@
+"""
+Streaming CSV and NDJSON exports of a user's intake history and daily adherence.
+
+Rows come from ``.values_list().iterator(chunk_size=EXPORT_CHUNK_SIZE)`` with the medicine
+columns joined in SQL, and are encoded a chunk at a time into a StreamingHttpResponse, so
+memory stays flat however long the history is. Date and medicine filters are applied in
+the query. Times are written in the user's timezone.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from .models import AdherenceDaily, MedicineIntake
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+INTAKE_COLUMNS = ('id', 'medicine', 'medicine_name', 'dosage', 'scheduled_time', 'actual_time', 'status', 'notes')
+ADHERENCE_COLUMNS = ('date', 'medicine', 'medicine_name', 'pending', 'taken', 'missed', 'skipped', 'adherence')
+
+# Spreadsheet apps evaluate cells starting with these; notes are free text from the user
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Lines:
+    """File-like sink for csv.writer that hands each formatted line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _encode(columns, rows, fmt):
+    """Yield the encoded export, one chunk of EXPORT_CHUNK_SIZE rows at a time."""
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    if fmt == 'csv':
+        writer = csv.writer(_Lines())
+
+        def encode(row):
+            return writer.writerow([_csv_cell(value) for value in row])
+
+        yield writer.writerow(columns).encode()
+    else:
+        dumps = (lambda data: orjson.dumps(data).decode()) if orjson else partial(json.dumps, separators=(',', ':'))
+
+        def encode(row):
+            return dumps(dict(zip(columns, row))) + '\n'
+
+    lines = []
+    for row in rows:
+        lines.append(encode(row))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines).encode()
+            lines = []
+    if lines:
+        yield ''.join(lines).encode()
+
+
+def local_range(start, end, zone):
+    """Aware [start, end + 1 day) bounds for local calendar dates; either may be None."""
+    lower = datetime.combine(start, time.min, zone) if start else None
+    upper = datetime.combine(end + timedelta(days=1), time.min, zone) if end else None
+    return lower, upper
+
+
+def intake_rows(user_id, zone, start=None, end=None, medicine_ids=None):
+    """Export rows of a user's intakes between two local dates (inclusive), oldest first."""
+    queryset = MedicineIntake.objects.filter(medicine__user_id=user_id)
+    lower, upper = local_range(start, end, zone)
+    if lower:
+        queryset = queryset.filter(scheduled_time__gte=lower)
+    if upper:
+        queryset = queryset.filter(scheduled_time__lt=upper)
+    if medicine_ids:
+        queryset = queryset.filter(medicine_id__in=medicine_ids)
+    rows = queryset.order_by('scheduled_time', 'id').values_list(
+        'id', 'medicine_id', 'medicine__name', 'medicine__dosage', 'scheduled_time', 'actual_time', 'status', 'notes',
+    )
+    for id, medicine_id, name, dosage, scheduled_time, actual_time, status, notes in rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield (
+            id, medicine_id, name, dosage, scheduled_time.astimezone(zone).isoformat(),
+            actual_time.astimezone(zone).isoformat() if actual_time else None, status, notes,
+        )
+
+
+def adherence_rows(user_id, start=None, end=None, medicine_ids=None):
+    """Export rows of a user's daily adherence rollup, oldest first."""
+    queryset = AdherenceDaily.objects.filter(user_id=user_id)
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    if medicine_ids:
+        queryset = queryset.filter(medicine_id__in=medicine_ids)
+    rows = queryset.order_by('date', 'medicine_id').values_list(
+        'date', 'medicine_id', 'medicine__name', 'pending', 'taken', 'missed', 'skipped',
+    )
+    for date, medicine_id, name, pending, taken, missed, skipped in rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        resolved = taken + missed + skipped
+        adherence = round(taken / resolved, 4) if resolved else None
+        yield date.isoformat(), medicine_id, name, pending, taken, missed, skipped, adherence
+
+
+def streaming_export(columns, rows, fmt, filename):
+    response = StreamingHttpResponse(_encode(columns, rows, fmt), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    response['Cache-Control'] = 'private, no-store'
+    return response
@@ -0,0 +1,171 @@
+"""
+Read-only fast path for list endpoints.
+
+List actions build plain dicts straight from ``.values()`` rows instead of running every
+row through ModelSerializer field machinery, and responses are rendered with orjson when it
+is installed. The output is byte-for-byte identical to the regular serializers and
+JSONRenderer (api/tests.py holds the parity suite); set ``API_FAST_LIST_SERIALIZATION = False``
+to fall back to the serializers.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import MedicineSchedule
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def datetime_repr(value, zone):
+    """
+    Same representation as DRF's DateTimeField with the default ISO-8601 format.
+
+    ``zone`` is the current timezone, looked up once per page by the callers since the
+    thread-local lookup costs more than the formatting itself.
+    """
+    if not value:
+        return None
+    value = value.astimezone(zone).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def str_or_none(value):
+    return None if value is None else str(value)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that hands compact output to orjson when available."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data)
+        except TypeError:
+            # Lazy strings, Decimals, UUIDs... anything orjson does not know goes the slow way
+            return super().render(data, accepted_media_type, renderer_context)
+        # Keep JSONRenderer's strict-javascript escaping of the line/paragraph separators
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+def schedule_row(row):
+    return {
+        'id': row['id'],
+        'medicine': row['medicine_id'],
+        'time_of_day': str(row['time_of_day']),
+        'days_of_week': row['days_of_week'],
+        'is_active': row['is_active'],
+    }
+
+
+SCHEDULE_FIELDS = ('id', 'medicine_id', 'time_of_day', 'days_of_week', 'is_active')
+
+
+def medicine_schedules(rows):
+    """The schedules queryset prefetch_related('schedules') would issue for a page of Medicine rows."""
+    return MedicineSchedule.objects.filter(medicine_id__in=[row['id'] for row in rows]).values(*SCHEDULE_FIELDS)
+
+
+def medicine_rows(rows, schedule_values=None):
+    """
+    Mirror MedicineSerializer (with nested schedules) for a page of Medicine ``.values()`` rows.
+
+    Async callers fetch ``medicine_schedules(rows)`` themselves and pass the rows in.
+    """
+    zone = timezone.get_current_timezone()
+    schedules = {row['id']: [] for row in rows}
+    if schedules:
+        if schedule_values is None:
+            schedule_values = medicine_schedules(rows)
+        for schedule in schedule_values:
+            schedules[schedule['medicine_id']].append(schedule_row(schedule))
+    return [
+        {
+            'id': row['id'],
+            'name': str(row['name']),
+            'dosage': str(row['dosage']),
+            'type': str(row['med_type']),
+            'remaining_count': int(row['remaining_count']),
+            'refill_threshold': int(row['refill_threshold']),
+            'runs_out_on': row['runs_out_on'].isoformat() if row['runs_out_on'] else None,
+            'instructions': str_or_none(row['instructions']),
+            'side_effects': str_or_none(row['side_effects']),
+            'created_at': datetime_repr(row['created_at'], zone),
+            'schedules': schedules[row['id']],
+        }
+        for row in rows
+    ]
+
+
+MEDICINE_FIELDS = (
+    'id', 'name', 'dosage', 'med_type', 'remaining_count', 'refill_threshold', 'runs_out_on',
+    'instructions', 'side_effects', 'created_at',
+)
+
+
+def intake_rows(rows):
+    """Mirror MedicineIntakeSerializer for a page of MedicineIntake ``.values()`` rows."""
+    zone = timezone.get_current_timezone()
+    return [
+        {
+            'id': row['id'],
+            'medicine': row['medicine_id'],
+            'scheduled_time': datetime_repr(row['scheduled_time'], zone),
+            'actual_time': datetime_repr(row['actual_time'], zone),
+            'status': str(row['status']),
+            'notes': str_or_none(row['notes']),
+            'created_at': datetime_repr(row['created_at'], zone),
+        }
+        for row in rows
+    ]
+
+
+INTAKE_FIELDS = ('id', 'medicine_id', 'scheduled_time', 'actual_time', 'status', 'notes', 'created_at')
+
+
+def notification_rows(rows):
+    """Mirror NotificationSerializer for a page of Notification ``.values()`` rows."""
+    zone = timezone.get_current_timezone()
+    return [
+        {
+            'id': row['id'],
+            'title': str(row['title']),
+            'message': str(row['message']),
+            'type': str(row['type']),
+            'status': str(row['status']),
+            'scheduled_for': datetime_repr(row['scheduled_for'], zone),
+            'created_at': datetime_repr(row['created_at'], zone),
+        }
+        for row in rows
+    ]
+
+
+NOTIFICATION_FIELDS = ('id', 'title', 'message', 'type', 'status', 'scheduled_for', 'created_at')
+
+
+class FastListMixin:
+    """
+    Serve ``list`` from ``.values()`` rows through ``fast_list_builder``.
+
+    Views set ``fast_list_fields`` (which must include the pagination ordering fields) and
+    ``fast_list_builder``, a staticmethod turning a page of rows into serializer-shaped dicts.
+    """
+    fast_list_fields = ()
+    fast_list_builder = None
+
+    def list(self, request, *args, **kwargs):
+        if not settings.API_FAST_LIST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*self.fast_list_fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.fast_list_builder(page))
+        return Response(self.fast_list_builder(list(queryset)))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2-SHA256 hasher with the work factor taken from PASSWORD_HASH_ITERATIONS.
+
+    The algorithm name is unchanged, so existing hashes still verify; one stored with a
+    different iteration count is re-hashed at the new cost on the user's next login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
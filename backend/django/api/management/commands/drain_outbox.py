@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from api.outbox import backlog, drain
+
+class Command(BaseCommand):
+    help = 'Send due notification outbox messages, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages claimed per batch')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+        parser.add_argument('--concurrency', type=int, default=None, help='Maximum in-flight sends')
+        parser.add_argument('--stats', action='store_true', help='Only print the outbox backlog')
+
+    def handle(self, *args, **options):
+        if not options['stats']:
+            stats = drain(batch_size=options['batch_size'], max_batches=options['max_batches'], concurrency=options['concurrency'])
+            for number, (claimed, sent, failed) in enumerate(stats.batches, 1):
+                self.stdout.write(f"Batch {number}: claimed={claimed} sent={sent} failed={failed}")
+            for message, error in stats.errors:
+                self.stdout.write(self.style.ERROR(f"Failed to send {message.channel} to {message.recipient} (attempt {message.attempts}): {error}"))
+            self.stdout.write(self.style.SUCCESS(f"Outbox drained: {stats.summary()}"))
+        state = backlog()
+        counts = ' '.join(f'{status}={count}' for status, count in state['counts'].items())
+        self.stdout.write(f"Backlog: {counts} oldest_due={state['oldest_due_seconds']:.0f}s")
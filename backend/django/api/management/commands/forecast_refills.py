@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from api.refills import forecast_refills
+
+class Command(BaseCommand):
+    help = 'Recompute medicine run-out dates and send refill reminders for low stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Medicines processed per transaction')
+
+    def handle(self, *args, **options):
+        stats = forecast_refills(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Refill forecast complete: {stats.summary()}"))
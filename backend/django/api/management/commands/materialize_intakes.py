@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.scheduling import materialize_intakes
+
+class Command(BaseCommand):
+    help = 'Generate pending medicine intakes from active schedules over a rolling horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.INTAKE_MATERIALIZE_HORIZON_HOURS, help='Horizon to materialize, in hours')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users processed per chunk')
+
+    def handle(self, *args, **options):
+        generated = materialize_intakes(horizon_hours=options['hours'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Materialized {generated} intake slots over the next {options['hours']}h"))
@@ -1,26 +1,24 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from api.models import MedicineIntake
-import requests
+from api.dispatch import due_intakes
+from api.outbox import drain, enqueue_reminders
 
 class Command(BaseCommand):
-    help = 'Send medication reminders to users via SMS'
+    help = 'Queue medication reminders in the notification outbox and send them via SMS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=30, help='Minutes ahead to look for due intakes')
+        parser.add_argument('--concurrency', type=int, default=None, help='Maximum in-flight SMS requests')
+        parser.add_argument('--enqueue-only', action='store_true', help='Queue reminders and leave sending to drain_outbox')
 
     def handle(self, *args, **options):
-        now = timezone.now()
-        window = now + timezone.timedelta(minutes=30)
-        intakes = MedicineIntake.objects.filter(scheduled_time__gte=now, scheduled_time__lte=window, status='pending')
-        for intake in intakes:
-            user = intake.medicine.user
-            if hasattr(user, 'sms_enabled') and user.sms_enabled and user.phone_number:
-                payload = {
-                    'phone': user.phone_number,
-                    'message': f"Reminder: Take your medicine {intake.medicine.name} at {intake.scheduled_time.strftime('%H:%M')}"
-                }
-                try:
-                    requests.post('http://localhost:8787/api/sms', json=payload)
-                    intake.status = 'notified'
-                    intake.save()
-                    self.stdout.write(self.style.SUCCESS(f"SMS sent to {user.phone_number} for {intake.medicine.name}"))
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"Failed to send SMS: {e}"))
+        queued = enqueue_reminders(due_intakes(timezone.now(), window_minutes=options['window']))
+        self.stdout.write(f"Queued {queued.intakes} reminders as {queued.messages} messages ({queued.ratio():.2f} intakes per message)")
+        if options['enqueue_only']:
+            return
+        stats = drain(concurrency=options['concurrency'])
+        for number, (claimed, sent, failed) in enumerate(stats.batches, 1):
+            self.stdout.write(f"Batch {number}: claimed={claimed} sent={sent} failed={failed}")
+        for message, error in stats.errors:
+            self.stdout.write(self.style.ERROR(f"Failed to send {message.channel} to {message.recipient} (attempt {message.attempts}): {error}"))
+        self.stdout.write(self.style.SUCCESS(f"Reminder run complete: {stats.summary()}"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from api.outbox import drain
+from api.sweeper import sweep_missed_doses
+
+class Command(BaseCommand):
+    help = 'Mark overdue pending intakes as missed and notify caregivers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=None, help='Minutes after the scheduled time before a dose counts as missed')
+        parser.add_argument('--batch-size', type=int, default=None, help='Intakes swept per transaction')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+        parser.add_argument('--enqueue-only', action='store_true', help='Queue escalations in the outbox without sending them')
+
+    def handle(self, *args, **options):
+        stats = sweep_missed_doses(grace_minutes=options['grace'], batch_size=options['batch_size'], max_batches=options['max_batches'])
+        self.stdout.write(self.style.SUCCESS(f"Swept: {stats.summary()}"))
+        if stats.escalated and not options['enqueue_only']:
+            self.stdout.write(self.style.SUCCESS(f"Outbox drained: {drain().summary()}"))
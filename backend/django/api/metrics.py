@@ -0,0 +1,232 @@
+"""
+Always-on request instrumentation exposed in the Prometheus text format at ``/metrics``.
+
+MetricsMiddleware records, per route (the URL name) and method: request counts by status,
+a latency histogram, a DB query count histogram, total DB time and response bytes. Queries
+are counted by an execute wrapper installed on every database connection; it only adds
+a counter and a clock read per query, and hands the numbers to the request through a
+context variable, so the queries async views run in asgiref's worker thread are counted
+too. Requests issuing more than METRICS_QUERY_WARNING_THRESHOLD queries are logged with
+their most repeated statement, which is usually an N+1.
+
+Numbers are per process; scrape every worker.
+"""
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_request_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'statements')
+
+    def __init__(self, track_statements):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter() if track_statements else None
+
+
+def count_queries(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+        if stats.statements is not None:
+            stats.statements[sql] += 1
+
+
+def install_query_counter(connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+connection_created.connect(install_query_counter)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+class RouteStats:
+    __slots__ = ('statuses', 'latency', 'queries', 'db_time', 'response_bytes')
+
+    def __init__(self):
+        self.statuses = Counter()
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_time = 0.0
+        self.response_bytes = 0
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = defaultdict(RouteStats)
+
+    def reset(self):
+        with self._lock:
+            self.routes = defaultdict(RouteStats)
+
+    def record(self, route, method, status, elapsed, stats, size):
+        with self._lock:
+            entry = self.routes[(route, method)]
+            entry.statuses[status] += 1
+            entry.latency.observe(elapsed)
+            entry.queries.observe(stats.queries)
+            entry.db_time += stats.db_time
+            entry.response_bytes += size
+
+
+REGISTRY = Registry()
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _histogram_lines(name, histogram, labels):
+    for bound, total in histogram.cumulative():
+        yield f'{name}_bucket{_labels(**labels, le=bound)} {total}'
+    yield f'{name}_sum{_labels(**labels)} {histogram.sum}'
+    yield f'{name}_count{_labels(**labels)} {histogram.count}'
+
+
+def render(registry=REGISTRY):
+    from .outbox import COUNTERS
+
+    with registry._lock:
+        routes = sorted(registry.routes.items())
+        lines = [
+            '# HELP pillpall_http_requests_total Requests handled, by route, method and status.',
+            '# TYPE pillpall_http_requests_total counter',
+        ]
+        for (route, method), entry in routes:
+            for status, count in sorted(entry.statuses.items()):
+                lines.append(f'pillpall_http_requests_total{_labels(route=route, method=method, status=status)} {count}')
+        sections = (
+            ('pillpall_http_request_duration_seconds', 'Request latency.', lambda entry: entry.latency),
+            ('pillpall_http_request_db_queries', 'Database queries per request.', lambda entry: entry.queries),
+        )
+        for name, help_text, histogram in sections:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for (route, method), entry in routes:
+                lines += _histogram_lines(name, histogram(entry), {'route': route, 'method': method})
+        totals = (
+            ('pillpall_http_request_db_seconds_total', 'Time spent in database queries.', 'db_time'),
+            ('pillpall_http_response_bytes_total', 'Response body bytes sent.', 'response_bytes'),
+        )
+        for name, help_text, attribute in totals:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (route, method), entry in routes:
+                lines.append(f'{name}{_labels(route=route, method=method)} {getattr(entry, attribute)}')
+
+    outbox = COUNTERS.snapshot()
+    lines += ['# HELP pillpall_outbox_messages_total Outbox messages by drain outcome.', '# TYPE pillpall_outbox_messages_total counter']
+    for outcome in COUNTERS.FIELDS:
+        lines.append(f'pillpall_outbox_messages_total{_labels(outcome=outcome)} {outbox[outcome]}')
+    lines += ['# HELP pillpall_outbox_send_seconds_total Time spent sending outbox messages.', '# TYPE pillpall_outbox_send_seconds_total counter']
+    lines.append(f"pillpall_outbox_send_seconds_total {outbox['latency_seconds_sum']}")
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=401)
+    elif not settings.METRICS_PUBLIC:
+        return HttpResponse(status=403)
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported never fired connection_created for it
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started, stats, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self.finish(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        started, stats, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self.finish(request, response, started, stats)
+        return response
+
+    def start(self):
+        stats = RequestStats(track_statements=settings.METRICS_QUERY_WARNING_THRESHOLD > 0)
+        return time.perf_counter(), stats, _request_stats.set(stats)
+
+    def finish(self, request, response, started, stats):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        route = (match.view_name or match.route) if match else 'unmatched'
+        size = 0 if response.streaming else len(response.content)
+        REGISTRY.record(route, request.method, response.status_code, elapsed, stats, size)
+
+        threshold = settings.METRICS_QUERY_WARNING_THRESHOLD
+        if threshold and stats.queries > threshold:
+            statement, repeats = stats.statements.most_common(1)[0]
+            logger.warning(
+                '%s %s issued %d queries (threshold %d); most repeated (%dx): %s',
+                request.method, request.path, stats.queries, threshold, repeats, statement,
+            )
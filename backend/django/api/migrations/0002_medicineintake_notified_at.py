@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='caregiver',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelOptions(
+            name='medicine',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelOptions(
+            name='medicineintake',
+            options={'ordering': ['-scheduled_time']},
+        ),
+        migrations.AlterModelOptions(
+            name='medicineschedule',
+            options={'ordering': ['time_of_day']},
+        ),
+        migrations.AlterModelOptions(
+            name='notification',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelOptions(
+            name='user',
+            options={'verbose_name': 'user', 'verbose_name_plural': 'users'},
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='created_at',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='dosage',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='instructions',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='name',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='refill_threshold',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='remaining_count',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='side_effects',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='type',
+        ),
+        migrations.AddField(
+            model_name='medicineintake',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='medicine_id',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='medicine',
+            name='refill_threshold',
+            field=models.IntegerField(default=5),
+        ),
+        migrations.AlterField(
+            model_name='medicineintake',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('taken', 'Taken'), ('missed', 'Missed'), ('skipped', 'Skipped')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('read', 'Read'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(choices=[('medication_reminder', 'Medication Reminder'), ('refill_reminder', 'Refill Reminder'), ('appointment_reminder', 'Appointment Reminder'), ('test', 'Test'), ('system', 'System')], default='system', max_length=50),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:25
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Which of several intakes for one slot survives: a recorded outcome beats "pending"
+STATUS_PRIORITY = {'taken': 0, 'skipped': 1, 'missed': 2, 'pending': 3}
+
+
+def merge_duplicate_slots(apps, schema_editor):
+    """Collapse intakes sharing a (medicine, scheduled_time) so the unique constraint can be added."""
+    MedicineIntake = apps.get_model('api', 'MedicineIntake')
+    duplicates = (
+        MedicineIntake.objects
+        .values('medicine_id', 'scheduled_time')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for slot in list(duplicates):
+        rows = sorted(
+            MedicineIntake.objects.filter(medicine_id=slot['medicine_id'], scheduled_time=slot['scheduled_time']),
+            key=lambda row: (STATUS_PRIORITY.get(row.status, len(STATUS_PRIORITY)), -row.created_at.timestamp(), -row.id),
+        )
+        keep, others = rows[0], rows[1:]
+        # Keep details only a dropped duplicate recorded
+        for field in ('actual_time', 'notes', 'notified_at'):
+            if not getattr(keep, field):
+                setattr(keep, field, next((getattr(row, field) for row in others if getattr(row, field)), getattr(keep, field)))
+        keep.save(update_fields=['actual_time', 'notes', 'notified_at'])
+        MedicineIntake.objects.filter(id__in=[row.id for row in others]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_medicineintake_notified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='timezone',
+            field=models.CharField(default='UTC', max_length=64),
+        ),
+        migrations.RunPython(merge_duplicate_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='medicineintake',
+            constraint=models.UniqueConstraint(fields=('medicine', 'scheduled_time'), name='unique_intake_per_medicine_slot'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:26
+
+from django.db import migrations, models
+from django.utils import timezone
+
+from api.timeutils import days_to_mask, get_zone, minute_of_day, next_fire_after
+
+
+def populate_fire_index(apps, schema_editor):
+    MedicineSchedule = apps.get_model('api', 'MedicineSchedule')
+    now = timezone.now()
+    batch = []
+    schedules = MedicineSchedule.objects.select_related('medicine__user').iterator(chunk_size=2000)
+    for schedule in schedules:
+        schedule.minute_of_day = minute_of_day(schedule.time_of_day)
+        schedule.days_mask = days_to_mask(schedule.days_of_week)
+        schedule.next_fire_at = next_fire_after(
+            schedule.minute_of_day, schedule.days_mask, get_zone(schedule.medicine.user.timezone), now,
+        ) if schedule.is_active else None
+        batch.append(schedule)
+        if len(batch) >= 2000:
+            MedicineSchedule.objects.bulk_update(batch, ['minute_of_day', 'days_mask', 'next_fire_at'])
+            batch = []
+    if batch:
+        MedicineSchedule.objects.bulk_update(batch, ['minute_of_day', 'days_mask', 'next_fire_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_user_timezone_unique_intake_slot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicineschedule',
+            name='days_mask',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='medicineschedule',
+            name='minute_of_day',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='medicineschedule',
+            name='next_fire_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(populate_fire_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_schedule_fire_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='caregiver',
+            index=models.Index(fields=['user', '-created_at'], name='caregiver_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['user', '-created_at'], name='medicine_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicineintake',
+            index=models.Index(fields=['status', 'scheduled_time'], name='intake_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicineintake',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['scheduled_time'], name='intake_pending_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicineschedule',
+            index=models.Index(fields=['medicine', 'time_of_day'], name='schedule_medicine_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+        ),
+    ]
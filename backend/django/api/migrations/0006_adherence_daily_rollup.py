@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:31
+
+from collections import defaultdict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    # Self-contained (historical models only) so later changes to api.adherence cannot break it
+    MedicineIntake = apps.get_model('api', 'MedicineIntake')
+    AdherenceDaily = apps.get_model('api', 'AdherenceDaily')
+    User = apps.get_model('api', 'User')
+
+    by_zone = defaultdict(list)
+    for user_id, name in User.objects.values_list('id', 'timezone'):
+        by_zone[name].append(user_id)
+    for name, user_ids in by_zone.items():
+        try:
+            zone = ZoneInfo(name or 'UTC')
+        except (ZoneInfoNotFoundError, ValueError):
+            zone = ZoneInfo('UTC')
+        rows = (
+            MedicineIntake.objects
+            .filter(medicine__user_id__in=user_ids)
+            .annotate(day=TruncDate('scheduled_time', tzinfo=zone))
+            .values('medicine__user_id', 'medicine_id', 'day', 'status')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        rollups = {}
+        for row in rows:
+            key = (row['medicine__user_id'], row['medicine_id'], row['day'])
+            rollup = rollups.setdefault(key, AdherenceDaily(user_id=key[0], medicine_id=key[1], date=key[2]))
+            if row['status'] in ('pending', 'taken', 'missed', 'skipped'):
+                setattr(rollup, row['status'], row['count'])
+        AdherenceDaily.objects.bulk_create(rollups.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdherenceDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('pending', models.IntegerField(default=0)),
+                ('taken', models.IntegerField(default=0)),
+                ('missed', models.IntegerField(default=0)),
+                ('skipped', models.IntegerField(default=0)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adherence_days', to='api.medicine')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adherence_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['user', 'date'], name='adherence_user_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('medicine', 'date'), name='unique_adherence_medicine_day')],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
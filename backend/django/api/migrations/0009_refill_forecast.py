@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicine',
+            name='refill_reminded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='runs_out_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -1,11 +1,14 @@
 from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+from .timeutils import days_to_mask, get_zone, minute_of_day, next_fire_after
 
 
 class User(AbstractUser):
     sms_enabled = models.BooleanField(default=False)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
+    timezone = models.CharField(max_length=64, default='UTC')  # IANA name, e.g. Europe/Berlin
 
     def __str__(self):
         return self.username
@@ -18,15 +21,31 @@ class Medicine(models.Model):
     med_type = models.CharField(max_length=50)
     remaining_count = models.IntegerField(default=0)
     refill_threshold = models.IntegerField(default=5)
+    # Maintained by the refill forecaster (api/refills.py); remaining_count by intake transitions
+    runs_out_on = models.DateField(blank=True, null=True)
+    refill_reminded_at = models.DateTimeField(blank=True, null=True)
     instructions = models.TextField(blank=True, null=True)
     side_effects = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} - {self.dosage}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='medicine_user_created_idx'),
+            models.Index(fields=['user', 'updated_at'], name='medicine_user_updated_idx'),
+        ]
+
+
+def cached_owner(instance):
+    """The owning User of a schedule or intake when it is already loaded (e.g. via select_related), else None."""
+    if not type(instance).medicine.is_cached(instance):
+        return None
+    medicine = instance.medicine
+    return medicine.user if Medicine.user.is_cached(medicine) else None
 
 
 class MedicineSchedule(models.Model):
@@ -34,12 +53,42 @@ class MedicineSchedule(models.Model):
     time_of_day = models.CharField(max_length=5)  # HH:MM format
     days_of_week = models.JSONField(default=list)  # [1..7] where 1=Monday, 7=Sunday
     is_active = models.BooleanField(default=True)
+    # Queryable forms of time_of_day/days_of_week, maintained on save
+    minute_of_day = models.PositiveSmallIntegerField(default=0)
+    days_mask = models.PositiveSmallIntegerField(default=0)  # bit n-1 set for ISO weekday n
+    next_fire_at = models.DateTimeField(blank=True, null=True, db_index=True)  # NULL when inactive
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.medicine.name} at {self.time_of_day}"
 
+    def refresh_fire_index(self, zone_name=None, after=None):
+        self.minute_of_day = minute_of_day(self.time_of_day)
+        self.days_mask = days_to_mask(self.days_of_week)
+        if not self.is_active:
+            self.next_fire_at = None
+            return
+        if zone_name is None:
+            owner = cached_owner(self)
+            if owner is not None:
+                zone_name = owner.timezone
+            else:
+                zone_name = User.objects.filter(medicines=self.medicine_id).values_list('timezone', flat=True).first()
+        self.next_fire_at = next_fire_after(self.minute_of_day, self.days_mask, get_zone(zone_name), after or timezone.now())
+
+    def save(self, *args, **kwargs):
+        self.refresh_fire_index()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'minute_of_day', 'days_mask', 'next_fire_at'}
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['time_of_day']
+        indexes = [
+            models.Index(fields=['medicine', 'time_of_day'], name='schedule_medicine_time_idx'),
+            models.Index(fields=['medicine', 'updated_at'], name='schedule_medicine_updated_idx'),
+        ]
 
 
 class Notification(models.Model):
@@ -66,12 +115,17 @@ class Notification(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     scheduled_for = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+            models.Index(fields=['user', 'updated_at'], name='notification_user_updated_idx'),
+        ]
 
 
 class MedicineIntake(models.Model):
@@ -87,13 +141,72 @@ class MedicineIntake(models.Model):
     actual_time = models.DateTimeField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     notes = models.TextField(blank=True, null=True)
+    notified_at = models.DateTimeField(blank=True, null=True)  # When the SMS reminder went out
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.medicine.name} - {self.status}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded slot and status so save() can adjust the adherence rollup without a query
+        instance._rollup_state = (
+            instance.__dict__.get('medicine_id'), instance.__dict__.get('scheduled_time'), instance.__dict__.get('status'),
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .adherence import intake_owners, record_status_changes
+        from .refills import adjust_stock
+        if self._state.adding:
+            previous = (None, None, None)
+        else:
+            previous = getattr(self, '_rollup_state', (None, None, None))
+            if None in previous:
+                previous = (
+                    MedicineIntake.objects.filter(pk=self.pk).values_list('medicine_id', 'scheduled_time', 'status').first()
+                    or (None, None, None)
+                )
+        super().save(*args, **kwargs)
+        current = (self.medicine_id, self.scheduled_time, self.status)
+        if previous != current:
+            changes = [(self.medicine_id, self.scheduled_time, None, self.status)]
+            if previous[0] is not None:
+                # Removed from the slot (and medicine) it was in before, which may differ
+                changes.append((previous[0], previous[1], previous[2], None))
+            owner = cached_owner(self)
+            owners = {self.medicine_id: (owner.id, owner.timezone)} if owner else {}
+            missing = {change[0] for change in changes} - owners.keys()
+            if missing:
+                owners.update(intake_owners(missing))
+            record_status_changes(changes, owners)
+            adjust_stock(changes, owners)
+        self._rollup_state = current
+
+    def delete(self, *args, **kwargs):
+        from .adherence import intake_owners, record_status_changes
+        from .refills import adjust_stock
+        result = super().delete(*args, **kwargs)
+        changes = [(self.medicine_id, self.scheduled_time, self.status, None)]
+        owners = intake_owners([self.medicine_id])
+        record_status_changes(changes, owners)
+        adjust_stock(changes, owners)
+        return result
+
     class Meta:
         ordering = ['-scheduled_time']
+        constraints = [
+            # Also serves as the (medicine, scheduled_time) index for per-user history listings
+            models.UniqueConstraint(fields=['medicine', 'scheduled_time'], name='unique_intake_per_medicine_slot'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'scheduled_time'], name='intake_status_time_idx'),
+            models.Index(fields=['medicine', 'updated_at'], name='intake_medicine_updated_idx'),
+            # Reminder scan: pending intakes in an upcoming scheduled_time range
+            models.Index(fields=['scheduled_time'], condition=models.Q(status='pending'), name='intake_pending_time_idx'),
+        ]
 
 
 class Caregiver(models.Model):
@@ -105,9 +218,98 @@ class Caregiver(models.Model):
     notifications_enabled = models.BooleanField(default=True)
     emergency_contact = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} - {self.user.username}"
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='caregiver_user_created_idx'),
+            models.Index(fields=['user', 'updated_at'], name='caregiver_user_updated_idx'),
+        ]
+
+
+class AdherenceDaily(models.Model):
+    """Per-user, per-medicine, per-day intake counts, maintained incrementally by MedicineIntake writes."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="adherence_days")
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="adherence_days")
+    date = models.DateField()  # In the user's timezone
+    pending = models.IntegerField(default=0)
+    taken = models.IntegerField(default=0)
+    missed = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.medicine_id} on {self.date}"
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['medicine', 'date'], name='unique_adherence_medicine_day'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'], name='adherence_user_date_idx'),
+        ]
+
+
+class Tombstone(models.Model):
+    """Records a deleted row so delta-sync clients can drop it locally."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="tombstones")
+    model = models.CharField(max_length=50)  # Sync collection name, e.g. "intakes"
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.model} {self.object_id}"
+
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ]
+
+
+class OutboxMessage(models.Model):
+    """
+    An outgoing SMS, push or email, written in the same transaction as the change that caused it.
+
+    api/outbox.py drains pending rows. While a worker holds a row it is ``sending`` and
+    ``available_at`` is the end of its lease, so rows of a crashed worker become claimable again.
+    """
+    CHANNEL_CHOICES = [
+        ('sms', 'SMS'),
+        ('push', 'Push'),
+        ('email', 'Email'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    ]
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=255)
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="outbox_messages")
+    # Unique per logical message (e.g. "reminder:42:sms") so re-enqueueing is a no-op
+    dedupe_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
+
+    class Meta:
+        ordering = ['available_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ]
@@ -0,0 +1,271 @@
+"""
+Transactional outbox for outgoing SMS, push and email.
+
+Producers write OutboxMessage rows in the same transaction as the change that calls for
+them (``enqueue_reminders`` queues one reminder per user and time slot and stamps the
+intakes as notified), so a message is never
+lost to a crash and never queued for a change that rolled back. ``drain`` claims due rows
+in batches, sends them with bounded concurrency and records every outcome: failures are
+retried with exponential backoff and jitter, and a message that fails
+OUTBOX_MAX_ATTEMPTS times is dead-lettered (status ``dead``, last error kept).
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .dispatch import DispatchStats, SMSClient, reminder_slots, slot_reminder_message
+from .models import MedicineIntake, Notification, OutboxMessage
+
+# Channels that only write to our own database; they run on the draining thread rather than
+# the HTTP worker pool so they reuse its database connection.
+INLINE_CHANNELS = {'push'}
+
+
+@dataclass
+class DrainStats(DispatchStats):
+    claimed: int = 0
+    retried: int = 0
+    dead: int = 0
+    elapsed: float = 0.0
+    batches: list = field(default_factory=list)  # (claimed, sent, failed) per batch
+
+    def throughput(self):
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (
+            f"claimed={self.claimed} {super().summary()} retried={self.retried} dead={self.dead} "
+            f"throughput={self.throughput():.1f}/s"
+        )
+
+    def as_dict(self):
+        return {
+            'claimed': self.claimed, 'sent': self.sent, 'failed': self.failed, 'retried': self.retried,
+            'dead': self.dead, 'elapsed': self.elapsed, 'throughput': self.throughput(),
+            'p50': self.percentile(50), 'p95': self.percentile(95), 'batches': len(self.batches),
+        }
+
+
+class OutboxCounters:
+    """Cumulative per-process counters of everything ``drain`` has done, for monitoring."""
+
+    FIELDS = ('claimed', 'sent', 'failed', 'retried', 'dead')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.totals = dict.fromkeys(self.FIELDS, 0)
+            self.latency_sum = 0.0
+            self.latency_count = 0
+
+    def add(self, stats):
+        with self._lock:
+            for name in self.FIELDS:
+                self.totals[name] += getattr(stats, name)
+            self.latency_sum += sum(stats.latencies)
+            self.latency_count += len(stats.latencies)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.totals, latency_seconds_sum=self.latency_sum, latency_seconds_count=self.latency_count)
+
+
+COUNTERS = OutboxCounters()
+
+
+def backlog(now=None):
+    """Rows per status and the age in seconds of the oldest message due for sending, in one query."""
+    now = now or timezone.now()
+    counts = dict.fromkeys(dict(OutboxMessage.STATUS_CHOICES), 0)
+    oldest = None
+    for row in OutboxMessage.objects.values('status').annotate(count=Count('id'), oldest=Min('available_at')).order_by():
+        counts[row['status']] = row['count']
+        if row['status'] == 'pending' and row['oldest'] <= now:
+            oldest = (now - row['oldest']).total_seconds()
+    return {'counts': counts, 'oldest_due_seconds': oldest or 0.0}
+
+
+@dataclass
+class EnqueueStats:
+    intakes: int = 0
+    messages: int = 0
+
+    def ratio(self):
+        """Intakes covered per message sent; 1.0 means nothing was coalesced."""
+        return self.intakes / self.messages if self.messages else 0.0
+
+    def summary(self):
+        return f"intakes={self.intakes} messages={self.messages} coalescing={self.ratio():.2f}x"
+
+
+def enqueue_reminders(intakes, now=None):
+    """
+    Queue one SMS reminder per user and time slot and mark the intakes notified in the same transaction.
+
+    ``intakes`` must be ordered by user and scheduled time (``due_intakes`` is). A slot's
+    dedupe key is its lowest intake id, so re-queueing the same intakes is a no-op while an
+    intake added to the slot later still gets its own reminder.
+    """
+    slots = list(reminder_slots(intakes))
+    stats = EnqueueStats(intakes=sum(len(slot) for slot in slots), messages=len(slots))
+    if not slots:
+        return stats
+    now = now or timezone.now()
+    with transaction.atomic():
+        OutboxMessage.objects.bulk_create(
+            [
+                OutboxMessage(
+                    channel='sms', recipient=slot[0].medicine.user.phone_number, body=slot_reminder_message(slot),
+                    user_id=slot[0].medicine.user_id, dedupe_key=f'reminder:{min(intake.id for intake in slot)}:sms',
+                    available_at=now,
+                )
+                for slot in slots
+            ],
+            ignore_conflicts=True,
+        )
+        MedicineIntake.objects.filter(id__in=[intake.id for slot in slots for intake in slot]).update(notified_at=now)
+    return stats
+
+
+def backoff_delay(attempts):
+    """Seconds to wait after the given number of failed attempts: exponential, capped, with equal jitter."""
+    delay = min(settings.OUTBOX_BACKOFF_MAX_SECONDS, settings.OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _due(now):
+    # "sending" rows whose lease ran out belong to a worker that died mid-batch
+    return Q(status__in=('pending', 'sending'), available_at__lte=now)
+
+
+def claim(batch_size, now=None):
+    """
+    Lease up to ``batch_size`` due messages to this worker.
+
+    On PostgreSQL concurrent workers skip each other's rows with FOR UPDATE SKIP LOCKED. SQLite
+    has no row locks (select_for_update is a no-op there), so the UPDATE re-checks the due
+    condition and only rows carrying this claim's lease expiry are returned.
+    """
+    now = now or timezone.now()
+    lease_until = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS, microseconds=random.randrange(1000))
+    due = _due(now)
+    with transaction.atomic():
+        ids = list(
+            OutboxMessage.objects.filter(due).order_by('available_at')
+            .select_for_update(skip_locked=True).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        OutboxMessage.objects.filter(due, id__in=ids).update(
+            status='sending', available_at=lease_until, attempts=F('attempts') + 1,
+        )
+    return list(OutboxMessage.objects.filter(id__in=ids, status='sending', available_at=lease_until))
+
+
+def default_senders(client):
+    def send_push(message):
+        # In-app push: the notification reaches connected clients through the SSE stream
+        Notification.objects.create(
+            user_id=message.user_id, title=message.subject or 'PillPall', message=message.body,
+            type='medication_reminder', status='sent', scheduled_for=timezone.now(),
+        )
+
+    return {
+        'sms': lambda message: client.send(message.recipient, message.body),
+        'email': lambda message: send_mail(message.subject, message.body, None, [message.recipient]),
+        'push': send_push,
+    }
+
+
+def record_outcomes(results, now=None):
+    """Mark sent messages, reschedule failed ones with backoff and dead-letter those out of attempts."""
+    now = now or timezone.now()
+    sent_ids, failed = [], []
+    retried = dead = 0
+    for message, error in results:
+        if error is None:
+            sent_ids.append(message.id)
+            continue
+        message.last_error = f'{type(error).__name__}: {error}'[:2000]
+        if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            message.status = 'dead'
+            message.available_at = now
+            dead += 1
+        else:
+            message.status = 'pending'
+            message.available_at = now + timedelta(seconds=backoff_delay(message.attempts))
+            retried += 1
+        failed.append(message)
+    if sent_ids:
+        OutboxMessage.objects.filter(id__in=sent_ids).update(status='sent', sent_at=now, last_error='')
+    if failed:
+        OutboxMessage.objects.bulk_update(failed, ['status', 'available_at', 'last_error'])
+    return retried, dead
+
+
+def drain(batch_size=None, max_batches=None, client=None, senders=None, concurrency=None, now=None):
+    """
+    Send due outbox messages batch by batch until none are due (or ``max_batches`` is reached).
+
+    ``senders`` maps a channel to a callable taking the message; it overrides the defaults,
+    which send SMS through ``client`` (an SMSClient unless given). Returns DrainStats and adds
+    them to COUNTERS.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    concurrency = concurrency or settings.SMS_DISPATCH_CONCURRENCY
+    owns_client = client is None
+    client = client or SMSClient(pool_size=concurrency)
+    senders = {**default_senders(client), **(senders or {})}
+    stats = DrainStats()
+    started = time.perf_counter()
+
+    def send(message):
+        sent_at = time.perf_counter()
+        try:
+            senders[message.channel](message)
+            return message, None, time.perf_counter() - sent_at
+        except Exception as e:
+            return message, e, time.perf_counter() - sent_at
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while max_batches is None or len(stats.batches) < max_batches:
+                messages = claim(batch_size, now)
+                if not messages:
+                    break
+                stats.claimed += len(messages)
+                remote = [message for message in messages if message.channel not in INLINE_CHANNELS]
+                inline = [message for message in messages if message.channel in INLINE_CHANNELS]
+                results = []
+                sent, failed = stats.sent, stats.failed
+                for message, error, elapsed in [*executor.map(send, remote), *map(send, inline)]:
+                    stats.latencies.append(elapsed)
+                    results.append((message, error))
+                    if error is None:
+                        stats.sent += 1
+                    else:
+                        stats.failed += 1
+                        stats.errors.append((message, error))
+                stats.batches.append((len(messages), stats.sent - sent, stats.failed - failed))
+                retried, dead = record_outcomes(results, now)
+                stats.retried += retried
+                stats.dead += dead
+    finally:
+        if owns_client:
+            client.close()
+
+    stats.elapsed = time.perf_counter() - started
+    COUNTERS.add(stats)
+    return stats
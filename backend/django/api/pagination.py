@@ -0,0 +1,104 @@
+import binascii
+import json
+from base64 import b64decode, b64encode
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset pagination on the newest-first ``created_at`` listings; ``id`` breaks ties so cursors stay stable."""
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class ScheduledTimeCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-scheduled_time', '-id')
+
+
+class TimeOfDayCursorPagination(CreatedAtCursorPagination):
+    ordering = ('time_of_day', 'id')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class AsyncKeysetPagination:
+    """
+    Keyset pagination for the async views in api/async_views.py.
+
+    Pages on ``(field, id)`` like the cursor classes above, but fetches with the async ORM.
+    Cursors are opaque base64 JSON holding the boundary row's key and the direction.
+    """
+
+    def __init__(self, ordering, page_size=None, max_page_size=500):
+        self.field = ordering[0].lstrip('-')
+        self.descending = ordering[0].startswith('-')
+        self.page_size = page_size or api_settings.PAGE_SIZE
+        self.max_page_size = max_page_size
+
+    def encode_cursor(self, row, reverse):
+        value = row[self.field]
+        payload = {'v': value.isoformat() if isinstance(value, datetime) else value, 'id': row['id'], 'r': int(reverse)}
+        return b64encode(json.dumps(payload).encode(), altchars=b'-_').decode()
+
+    def decode_cursor(self, encoded):
+        try:
+            payload = json.loads(b64decode(encoded.encode(), altchars=b'-_', validate=True))
+            value, pk, reverse = payload['v'], int(payload['id']), bool(payload['r'])
+            if not isinstance(value, (str, int, float)):
+                raise TypeError(value)
+            # A string that is not a datetime is passed through for non-datetime keys
+            value = (parse_datetime(value) or value) if isinstance(value, str) else value
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise InvalidCursor('Invalid cursor')
+        return value, pk, reverse
+
+    def get_page_size(self, request):
+        try:
+            return min(max(int(request.GET['page_size']), 1), self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    async def paginate(self, request, queryset, fields):
+        """
+        Return ``(rows, next_url, previous_url)`` for the requested page of ``queryset.values(*fields)``.
+
+        Raises InvalidCursor for a cursor this class did not produce.
+        """
+        page_size = self.get_page_size(request)
+        encoded = request.GET.get('cursor')
+        reverse = False
+        if encoded:
+            value, pk, reverse = self.decode_cursor(encoded)
+            towards_smaller = self.descending != reverse
+            lookup = 'lt' if towards_smaller else 'gt'
+            try:
+                queryset = queryset.filter(
+                    Q(**{f'{self.field}__{lookup}': value}) | Q(**{self.field: value, f'id__{lookup}': pk})
+                )
+            except (ValidationError, TypeError, ValueError):
+                # A well-formed cursor whose key does not fit the field (e.g. not a datetime)
+                raise InvalidCursor('Invalid cursor')
+        descending = self.descending != reverse
+        order = (f'-{self.field}', '-id') if descending else (self.field, 'id')
+        rows = [row async for row in queryset.order_by(*order).values(*fields)[:page_size + 1]]
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        url = request.build_absolute_uri()
+        next_url = previous_url = None
+        if rows and (has_more if not reverse else True):
+            next_url = replace_query_param(url, 'cursor', self.encode_cursor(rows[-1], reverse=False))
+        if rows and (has_more if reverse else bool(encoded)):
+            previous_url = replace_query_param(url, 'cursor', self.encode_cursor(rows[0], reverse=True))
+        return rows, next_url, previous_url
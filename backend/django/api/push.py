@@ -0,0 +1,124 @@
+"""
+Fan-out of new notifications to clients connected to the push stream.
+
+``publish`` is called (from any thread) when a Notification is committed, see
+api/signals.py; ``subscribe`` is used by the SSE view in api/async_views.py on the ASGI
+event loop. NOTIFICATION_PUSH_BROKER picks the broker: InProcessBroker only reaches
+clients connected to the same process, RedisBroker fans out across workers through
+Redis pub/sub.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class InProcessBroker:
+    """Deliver events to subscribers in this process only (tests, single-worker deployments)."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        with self._lock:
+            queues = list(self._subscribers.get(user_id, ()))
+        for loop, queue in queues:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def subscribe(self, user_id):
+        return InProcessSubscription(self, user_id)
+
+    def subscriber_count(self, user_id):
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+
+class InProcessSubscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue = asyncio.Queue()
+        self._entry = None
+
+    async def __aenter__(self):
+        self._entry = (asyncio.get_running_loop(), self.queue)
+        with self.broker._lock:
+            self.broker._subscribers[self.user_id].add(self._entry)
+        return self
+
+    async def __aexit__(self, *exc):
+        with self.broker._lock:
+            subscribers = self.broker._subscribers[self.user_id]
+            subscribers.discard(self._entry)
+            if not subscribers:
+                del self.broker._subscribers[self.user_id]
+
+    async def next(self, timeout):
+        """The next event, or None when nothing arrives within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class RedisBroker:
+    """Fan out through Redis pub/sub on one channel per user, so every worker's clients are reached."""
+
+    def __init__(self, url=None):
+        import redis
+
+        self.url = url or settings.NOTIFICATION_PUSH_URL
+        self.client = redis.Redis.from_url(self.url)
+
+    @staticmethod
+    def channel(user_id):
+        return f'pillpall:notifications:{user_id}'
+
+    def publish(self, user_id, event):
+        self.client.publish(self.channel(user_id), json.dumps(event))
+
+    def subscribe(self, user_id):
+        return RedisSubscription(self, user_id)
+
+
+class RedisSubscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+
+    async def __aenter__(self):
+        import redis.asyncio
+
+        self.client = redis.asyncio.Redis.from_url(self.broker.url)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(self.broker.channel(self.user_id))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+    async def next(self, timeout):
+        message = await self.pubsub.get_message(timeout=timeout)
+        return json.loads(message['data']) if message else None
+
+
+@lru_cache(maxsize=None)
+def _broker(path):
+    return import_string(path)()
+
+
+def get_broker():
+    return _broker(settings.NOTIFICATION_PUSH_BROKER)
+
+
+def publish_notification(notification):
+    """Push a committed notification to the owner's connected clients."""
+    from .serializers import NotificationSerializer
+
+    get_broker().publish(notification.user_id, dict(NotificationSerializer(notification).data))
@@ -0,0 +1,141 @@
+"""
+Medicine stock tracking and refill forecasting.
+
+``adjust_stock`` keeps ``Medicine.remaining_count`` in step with intake transitions: every
+intake that becomes "taken" takes one unit off with an atomic ``F()`` UPDATE (never below
+zero), and undoing or deleting a taken intake puts it back. The intake write paths that can
+change a taken status (``MedicineIntake.save``/``delete`` and the bulk endpoint) call it next
+to ``record_status_changes``.
+
+``forecast_refills`` computes every medicine's run-out date from the doses per week of its
+active schedules, counted in SQL from ``days_mask`` in one aggregate query over all users,
+stores the dates and creates ``refill_reminder`` notifications in bulk for medicines at or
+under their refill threshold. A medicine is reminded once until it is restocked above the
+threshold. A remaining_count of 0 is read as "not tracked": it is never forecast, and
+``adjust_stock`` leaves it alone in both directions.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import invalidate_on_commit
+from .models import Medicine, Notification
+from .push import publish_notification
+from .timeutils import get_zone
+
+
+def adjust_stock(changes, owners):
+    """
+    Apply the net taken count of intake ``changes`` to the medicines' remaining_count.
+
+    ``changes`` and ``owners`` are as for ``record_status_changes``, but owners are required.
+    One UPDATE per distinct delta, usually just one.
+    """
+    taken = defaultdict(int)
+    for medicine_id, _, old_status, new_status in changes:
+        taken[medicine_id] += (new_status == 'taken') - (old_status == 'taken')
+    by_delta = defaultdict(list)
+    for medicine_id, delta in taken.items():
+        if delta:
+            by_delta[delta].append(medicine_id)
+    if not by_delta:
+        return
+    now = timezone.now()
+    for delta, medicine_ids in by_delta.items():
+        # A count of 0 is untracked (or empty) either way: taking from it is impossible and
+        # undoing into it would invent stock. Leaving it alone also keeps it out of delta sync.
+        medicines = Medicine.objects.filter(id__in=medicine_ids, remaining_count__gt=0)
+        # A queryset update skips auto_now and the cache signals, so both are handled here
+        medicines.update(
+            remaining_count=Greatest(F('remaining_count') - delta, 0), updated_at=now,
+        )
+    for user_id in {owners[medicine_id][0] for medicine_ids in by_delta.values() for medicine_id in medicine_ids if medicine_id in owners}:
+        invalidate_on_commit('medicines', user_id)
+
+
+@dataclass
+class ForecastStats:
+    medicines: int = 0
+    updated: int = 0
+    reminded: int = 0
+
+    def summary(self):
+        return f"medicines={self.medicines} updated={self.updated} reminded={self.reminded}"
+
+
+def weekly_doses():
+    """Doses per week of a medicine's active schedules: the set bits of each days_mask, summed."""
+    mask = F('schedules__days_mask')
+    return Sum(sum(mask.bitrightshift(day).bitand(1) for day in range(7)), filter=Q(schedules__is_active=True))
+
+
+def run_out_date(remaining, weekly, today):
+    if remaining <= 0 or not weekly:
+        return None
+    return today + timedelta(days=int(remaining * 7 / weekly))
+
+
+def refill_message(name, remaining, runs_out_on):
+    return f"{name} is running low: {remaining} left, enough until about {runs_out_on:%b %d}."
+
+
+def forecast_refills(now=None, batch_size=1000):
+    """Recompute run-out dates for every medicine and raise refill reminders, ``batch_size`` rows at a time."""
+    now = now or timezone.now()
+    stats = ForecastStats()
+    rows = (
+        Medicine.objects
+        .annotate(weekly=weekly_doses())
+        .values_list('id', 'user_id', 'user__timezone', 'name', 'remaining_count', 'refill_threshold', 'runs_out_on', 'refill_reminded_at', 'weekly')
+        .order_by('id')
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _apply(batch, now, stats)
+            batch = []
+    if batch:
+        _apply(batch, now, stats)
+    return stats
+
+
+def _apply(rows, now, stats):
+    """Store the forecasts of one batch that changed and create its reminders, in one transaction."""
+    today = {}
+    changed, notifications = [], []
+    for medicine_id, user_id, zone_name, name, remaining, threshold, runs_out_on, reminded_at, weekly in rows:
+        stats.medicines += 1
+        if zone_name not in today:
+            today[zone_name] = now.astimezone(get_zone(zone_name)).date()
+        forecast = run_out_date(remaining, weekly, today[zone_name])
+        reminder = reminded_at
+        if forecast is not None and remaining <= threshold:
+            if reminded_at is None:
+                reminder = now
+                notifications.append(Notification(
+                    user_id=user_id, medicine_id=str(medicine_id), title='Refill needed', type='refill_reminder',
+                    message=refill_message(name, remaining, forecast), status='sent', scheduled_for=now,
+                ))
+        elif remaining > threshold:
+            # Restocked, so the next time it runs low it is reminded again
+            reminder = None
+        if (forecast, reminder) != (runs_out_on, reminded_at):
+            changed.append(Medicine(id=medicine_id, user_id=user_id, runs_out_on=forecast, refill_reminded_at=reminder, updated_at=now))
+
+    with transaction.atomic():
+        Medicine.objects.bulk_update(changed, ['runs_out_on', 'refill_reminded_at', 'updated_at'])
+        created = Notification.objects.bulk_create(notifications)
+        # bulk_create skips post_save, so push the reminders to connected clients here
+        for notification in created:
+            transaction.on_commit(partial(publish_notification, notification), robust=True)
+    for user_id in {medicine.user_id for medicine in changed}:
+        invalidate_on_commit('medicines', user_id)
+    stats.updated += len(changed)
+    stats.reminded += len(created)
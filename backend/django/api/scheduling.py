@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .adherence import record_status_changes
+from .cache import invalidate_on_commit
+from .models import MedicineIntake, MedicineSchedule, User
+from .timeutils import get_zone, parse_time_of_day
+
+
+def expand_schedule(time_of_day, days_of_week, zone, start, end):
+    """Yield the aware datetimes in [start, end) at which a schedule fires in the given zone."""
+    at = parse_time_of_day(time_of_day)
+    days = set(days_of_week or [])
+    local_day = start.astimezone(zone).date()
+    last_day = end.astimezone(zone).date()
+    while local_day <= last_day:
+        if local_day.isoweekday() in days:
+            fire_at = datetime.combine(local_day, at, tzinfo=zone)
+            if start <= fire_at < end:
+                yield fire_at
+        local_day += timedelta(days=1)
+
+
+def schedules_due(start, end):
+    """Active schedules whose next firing falls in [start, end), served by the next_fire_at index."""
+    return MedicineSchedule.objects.filter(next_fire_at__gte=start, next_fire_at__lt=end)
+
+
+def reindex_schedules(schedules, after=None, batch_size=1000):
+    """Recompute next_fire_at (relative to ``after``) for the given schedules in bulk."""
+    after = after or timezone.now()
+    fields = ['minute_of_day', 'days_mask', 'next_fire_at']
+    batch = []
+    updated = 0
+    schedules = (
+        schedules
+        .select_related('medicine__user')
+        .only('time_of_day', 'days_of_week', 'is_active', 'medicine_id', 'medicine__user__timezone')
+    )
+    for schedule in schedules.iterator(chunk_size=batch_size):
+        schedule.refresh_fire_index(schedule.medicine.user.timezone, after)
+        batch.append(schedule)
+        if len(batch) >= batch_size:
+            MedicineSchedule.objects.bulk_update(batch, fields)
+            updated += len(batch)
+            batch = []
+    if batch:
+        MedicineSchedule.objects.bulk_update(batch, fields)
+        updated += len(batch)
+    return updated
+
+
+def advance_fired_schedules(now=None):
+    """Move next_fire_at forward for every schedule that has fired since it was last computed."""
+    now = now or timezone.now()
+    return reindex_schedules(MedicineSchedule.objects.filter(next_fire_at__lte=now), after=now)
+
+
+def _insert_slots(slots, batch_size):
+    """
+    Insert a pending intake per ``(medicine_id, scheduled_time)`` slot and return the inserted rows.
+
+    A slot a concurrent writer took after it was read fails the unique constraint; the insert
+    is then retried without the slots that now exist, so exactly the returned rows are new.
+    """
+    while slots:
+        intakes = [MedicineIntake(medicine_id=medicine_id, scheduled_time=fire_at, status='pending') for medicine_id, fire_at in slots]
+        try:
+            with transaction.atomic():
+                MedicineIntake.objects.bulk_create(intakes, batch_size=batch_size)
+            return intakes
+        except IntegrityError:
+            taken = set(
+                MedicineIntake.objects
+                .filter(medicine_id__in={medicine_id for medicine_id, _ in slots}, scheduled_time__in={fire_at for _, fire_at in slots})
+                .values_list('medicine_id', 'scheduled_time')
+            )
+            remaining = [slot for slot in slots if slot not in taken]
+            if len(remaining) == len(slots):
+                # Not a slot conflict (e.g. a medicine deleted meanwhile); retrying cannot help
+                raise
+            slots = remaining
+    return []
+
+
+def materialize_intakes(horizon_hours=None, now=None, chunk_size=500, batch_size=1000):
+    """
+    Create pending MedicineIntake rows for every active schedule firing within the horizon.
+
+    Candidate schedules are found through the next_fire_at index, so schedules that do not
+    fire before the horizon ends (and inactive ones, whose next_fire_at is NULL) are never read.
+
+    Users are processed in primary-key chunks so only one chunk of schedules is held in
+    memory at a time. Slots that already exist (or repeat within the batch) are filtered out
+    up front, and the (medicine, scheduled_time) unique constraint catches concurrent
+    writers, which makes repeated runs idempotent. Returns the number of intakes created.
+    """
+    horizon_hours = horizon_hours or settings.INTAKE_MATERIALIZE_HORIZON_HOURS
+    start = now or timezone.now()
+    end = start + timedelta(hours=horizon_hours)
+    generated = 0
+    last_user_id = 0
+    advance_fired_schedules(start)
+
+    while True:
+        users = list(
+            User.objects
+            .filter(id__gt=last_user_id, medicines__schedules__next_fire_at__lt=end)
+            .order_by('id')
+            .values_list('id', 'timezone')
+            .distinct()[:chunk_size]
+        )
+        if not users:
+            break
+        last_user_id = users[-1][0]
+        names = dict(users)
+        zones = {user_id: get_zone(name) for user_id, name in users}
+
+        schedules = (
+            MedicineSchedule.objects
+            .filter(next_fire_at__lt=end, medicine__user_id__in=zones)
+            .values_list('medicine_id', 'medicine__user_id', 'time_of_day', 'days_of_week')
+        )
+        existing = set(
+            MedicineIntake.objects
+            .filter(medicine__user_id__in=zones, scheduled_time__gte=start, scheduled_time__lt=end)
+            .values_list('medicine_id', 'scheduled_time')
+        )
+        slots, owners = [], {}
+        for medicine_id, user_id, time_of_day, days_of_week in schedules:
+            for fire_at in expand_schedule(time_of_day, days_of_week, zones[user_id], start, end):
+                # Two schedules of one medicine can fire at the same time (daily and weekdays 08:00)
+                if (medicine_id, fire_at) not in existing:
+                    existing.add((medicine_id, fire_at))
+                    slots.append((medicine_id, fire_at))
+                    owners[medicine_id] = (user_id, names[user_id])
+        intakes = _insert_slots(slots, batch_size)
+        record_status_changes(((intake.medicine_id, intake.scheduled_time, None, 'pending') for intake in intakes), owners)
+        # bulk_create skips the signals that would otherwise invalidate the today timelines
+        for user_id in {user_id for user_id, _ in owners.values()}:
+            invalidate_on_commit('today', user_id)
+        generated += len(intakes)
+
+    return generated
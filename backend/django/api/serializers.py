@@ -1,6 +1,8 @@
+from zoneinfo import available_timezones
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Medicine, MedicineSchedule, Notification, MedicineIntake, Caregiver
+from .timeutils import parse_time_of_day
 
 User = get_user_model()
 
@@ -8,15 +10,44 @@ User = get_user_model()
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'phone_number', 'sms_enabled']
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'phone_number', 'sms_enabled', 'timezone']
         read_only_fields = ['id']
 
 
+class OwnedMedicineField(serializers.PrimaryKeyRelatedField):
+    """Medicine primary key limited to the requesting user's medicines, with the owner joined in."""
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        if request is None:
+            return Medicine.objects.select_related('user')
+        return Medicine.objects.filter(user_id=request.user.id).select_related('user')
+
+
 class MedicineScheduleSerializer(serializers.ModelSerializer):
+    medicine = OwnedMedicineField()
+
     class Meta:
         model = MedicineSchedule
         fields = ['id', 'medicine', 'time_of_day', 'days_of_week', 'is_active']
 
+    def validate_time_of_day(self, value):
+        # save() derives the fire index from this, so anything it cannot parse is rejected here
+        try:
+            at = parse_time_of_day(value)
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("Use 24-hour HH:MM, e.g. 08:30.")
+        return f'{at:%H:%M}'
+
+    def validate_days_of_week(self, value):
+        try:
+            days = sorted({int(day) for day in value}) if isinstance(value, list) else None
+        except (TypeError, ValueError):
+            days = None
+        if days is None or not all(1 <= day <= 7 for day in days):
+            raise serializers.ValidationError("Use a list of ISO weekdays, 1 (Monday) to 7 (Sunday).")
+        return days
+
 
 class MedicineSerializer(serializers.ModelSerializer):
     schedules = MedicineScheduleSerializer(many=True, read_only=True)
@@ -24,9 +55,9 @@ class MedicineSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Medicine
-        fields = ['id', 'name', 'dosage', 'type', 'remaining_count', 'refill_threshold', 
+        fields = ['id', 'name', 'dosage', 'type', 'remaining_count', 'refill_threshold', 'runs_out_on',
                  'instructions', 'side_effects', 'created_at', 'schedules']
-        read_only_fields = ['id', 'created_at', 'schedules']
+        read_only_fields = ['id', 'runs_out_on', 'created_at', 'schedules']
 
     def create(self, validated_data):
         # Handle the type -> med_type mapping
@@ -49,12 +80,29 @@ class NotificationSerializer(serializers.ModelSerializer):
 
 
 class MedicineIntakeSerializer(serializers.ModelSerializer):
+    medicine = OwnedMedicineField()
+
     class Meta:
         model = MedicineIntake
         fields = ['id', 'medicine', 'scheduled_time', 'actual_time', 'status', 'notes', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
+class BulkIntakeItemSerializer(serializers.Serializer):
+    """One entry of a bulk intake request: a create (medicine + scheduled_time) or a transition (id)."""
+    id = serializers.IntegerField(required=False)
+    medicine = serializers.IntegerField(required=False)
+    scheduled_time = serializers.DateTimeField(required=False)
+    actual_time = serializers.DateTimeField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=MedicineIntake.STATUS_CHOICES)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate(self, attrs):
+        if 'id' not in attrs and not ('medicine' in attrs and 'scheduled_time' in attrs):
+            raise serializers.ValidationError("Provide either an intake id or a medicine and scheduled_time.")
+        return attrs
+
+
 class CaregiverSerializer(serializers.ModelSerializer):
     class Meta:
         model = Caregiver
@@ -63,17 +111,29 @@ class CaregiverSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class DrugMatchSerializer(serializers.Serializer):
+    """OCR text of a medicine label to match against the drug catalog."""
+    text = serializers.CharField(max_length=5000)
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=5)
+
+
 class SignupSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(min_length=6)
     full_name = serializers.CharField(max_length=200)
     phone_number = serializers.CharField(max_length=15, required=False, allow_blank=True)
+    timezone = serializers.CharField(max_length=64, required=False, default='UTC')
 
     def validate_email(self, value):
         if User.objects.filter(username=value.lower()).exists():
             raise serializers.ValidationError("An account with this email already exists.")
         return value.lower()
 
+    def validate_timezone(self, value):
+        if value not in available_timezones():
+            raise serializers.ValidationError("Unknown timezone.")
+        return value
+
     def create(self, validated_data):
         email = validated_data['email']
         password = validated_data['password']
@@ -91,6 +151,7 @@ class SignupSerializer(serializers.Serializer):
             password=password,
             first_name=first_name,
             last_name=last_name,
-            phone_number=phone_number
+            phone_number=phone_number,
+            timezone=validated_data.get('timezone', 'UTC'),
         )
         return user
\ No newline at end of file
@@ -0,0 +1,110 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import forget_user
+from .cache import invalidate_on_commit
+from .push import publish_notification
+from .models import Caregiver, Medicine, MedicineIntake, MedicineSchedule, Notification, Tombstone, User
+
+# Sync collection name for each model that delta sync tracks
+SYNC_COLLECTIONS = {
+    Medicine: 'medicines',
+    MedicineSchedule: 'schedules',
+    MedicineIntake: 'intakes',
+    Notification: 'notifications',
+    Caregiver: 'caregivers',
+}
+
+
+def _is_cascade(sender, origin):
+    """True when the row is going away because a parent (medicine or user) was deleted."""
+    if origin is None or isinstance(origin, sender):
+        return False
+    return not (isinstance(origin, QuerySet) and origin.model is sender)
+
+
+def _medicine_owner_id(instance):
+    """Owner of a schedule's or intake's medicine, without a query when the medicine is loaded."""
+    if type(instance).medicine.is_cached(instance):
+        return instance.medicine.user_id
+    return Medicine.objects.filter(pk=instance.medicine_id).values_list('user_id', flat=True).first()
+
+
+@receiver(post_delete, sender=Medicine)
+@receiver(post_delete, sender=MedicineSchedule)
+@receiver(post_delete, sender=MedicineIntake)
+@receiver(post_delete, sender=Notification)
+@receiver(post_delete, sender=Caregiver)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    # A deleted medicine's tombstone covers its schedules and intakes, and a deleted user
+    # has nobody left to sync, so cascades would only write thousands of redundant rows.
+    if _is_cascade(sender, origin):
+        return
+    user_id = getattr(instance, 'user_id', None)
+    if user_id is None:
+        user_id = _medicine_owner_id(instance)
+    if user_id is not None:
+        Tombstone.objects.create(user_id=user_id, model=SYNC_COLLECTIONS[sender], object_id=instance.pk)
+
+
+@receiver(post_save, sender=Medicine)
+@receiver(post_delete, sender=Medicine)
+def invalidate_medicines(sender, instance, **kwargs):
+    invalidate_on_commit('medicines', instance.user_id)
+    invalidate_on_commit('today', instance.user_id)
+
+
+@receiver(post_save, sender=MedicineSchedule)
+@receiver(post_delete, sender=MedicineSchedule)
+def invalidate_medicine_schedules(sender, instance, **kwargs):
+    # Schedules are nested in the medicine list and make up the today timeline
+    user_id = _medicine_owner_id(instance)
+    if user_id is not None:
+        invalidate_on_commit('medicines', user_id)
+        invalidate_on_commit('today', user_id)
+
+
+@receiver(post_save, sender=MedicineIntake)
+@receiver(post_delete, sender=MedicineIntake)
+def invalidate_today(sender, instance, origin=None, **kwargs):
+    # Bulk writes (bulk endpoint, sweeper, materializer) invalidate explicitly. A deleted
+    # medicine already invalidated the scope.
+    if _is_cascade(sender, origin):
+        return
+    user_id = _medicine_owner_id(instance)
+    if user_id is not None:
+        invalidate_on_commit('today', user_id)
+
+
+@receiver(post_save, sender=Caregiver)
+@receiver(post_delete, sender=Caregiver)
+def invalidate_caregivers(sender, instance, **kwargs):
+    invalidate_on_commit('caregivers', instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_profile(sender, instance, created=False, **kwargs):
+    # A new account may reuse the id of a deleted one, so start every scope afresh; a
+    # timezone change moves the bounds of the user's today timeline
+    for scope in (('me', 'medicines', 'caregivers', 'today') if created else ('me', 'today')):
+        invalidate_on_commit(scope, instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_authenticated_user(sender, instance, **kwargs):
+    # Drops the cached user so edits and deactivation apply to the next request, after the
+    # commit so a concurrent request cannot re-cache the old row
+    transaction.on_commit(partial(forget_user, instance.pk), robust=True)
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created=False, **kwargs):
+    # After commit, so a stream client never sees a notification that gets rolled back;
+    # robust so a broker outage cannot fail the request that created the row.
+    if created:
+        transaction.on_commit(partial(publish_notification, instance), robust=True)
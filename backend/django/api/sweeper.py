@@ -0,0 +1,126 @@
+"""
+Missed-dose sweeper: marks overdue pending intakes as missed and escalates to caregivers.
+
+Each batch is one ordered range scan of ``intake_status_time_idx`` (status, scheduled_time)
+joined to the medicine and its owner, one bulk UPDATE, one rollup update,
+one query for the affected users' caregivers and one bulk insert into the outbox, all in a
+single transaction; the users' today timelines are invalidated once it commits. Work per
+batch does not depend on how many pending rows exist beyond it.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .adherence import record_status_changes
+from .cache import invalidate_on_commit
+from .models import Caregiver, MedicineIntake, OutboxMessage
+from .timeutils import get_zone
+
+
+@dataclass
+class SweepStats:
+    missed: int = 0
+    escalated: int = 0
+    batches: int = 0
+
+    def summary(self):
+        return f"missed={self.missed} escalations={self.escalated} batches={self.batches}"
+
+
+def escalation_message(patient, doses, zone):
+    """One text per caregiver and patient listing the doses missed in this sweep."""
+    listed = ', '.join(f"{name} at {scheduled_time.astimezone(zone):%H:%M}" for name, scheduled_time in doses[:5])
+    more = f' and {len(doses) - 5} more' if len(doses) > 5 else ''
+    return f"PillPall: {patient} missed {listed}{more}."
+
+
+def escalations(missed, now):
+    """
+    Outbox messages for every caregiver of the users in ``missed`` who should hear about it.
+
+    ``missed`` holds the swept rows; caregivers are loaded for all users in one query.
+    Emergency contacts are told even if they turned routine notifications off, and only doses
+    due within MISSED_DOSE_ESCALATION_MAX_AGE_HOURS are escalated, so a backlog of old
+    pending rows does not page anyone.
+    """
+    recent = now - timedelta(hours=settings.MISSED_DOSE_ESCALATION_MAX_AGE_HOURS)
+    by_user = defaultdict(list)
+    for row in missed:
+        if row['scheduled_time'] >= recent:
+            by_user[row['medicine__user_id']].append(row)
+    if not by_user:
+        return []
+
+    caregivers = (
+        Caregiver.objects
+        .filter(Q(notifications_enabled=True) | Q(emergency_contact=True), user_id__in=by_user)
+        .exclude((Q(phone_number__isnull=True) | Q(phone_number='')) & (Q(email__isnull=True) | Q(email='')))
+        .only('id', 'user_id', 'phone_number', 'email')
+    )
+    messages = []
+    for caregiver in caregivers:
+        rows = by_user[caregiver.user_id]
+        first = rows[0]
+        patient = first['medicine__user__first_name'] or first['medicine__user__username']
+        body = escalation_message(
+            patient, [(row['medicine__name'], row['scheduled_time']) for row in rows], get_zone(first['medicine__user__timezone']),
+        )
+        channel, recipient = ('sms', caregiver.phone_number) if caregiver.phone_number else ('email', caregiver.email)
+        messages.append(OutboxMessage(
+            channel=channel, recipient=recipient, subject='Missed medication', body=body,
+            user_id=caregiver.user_id, available_at=now,
+            # The intakes only leave "pending" once, so their ids identify this escalation
+            dedupe_key=f"missed:{caregiver.id}:{min(row['id'] for row in rows)}:{len(rows)}",
+        ))
+    return messages
+
+
+def sweep_batch(cutoff, now, batch_size):
+    """Sweep up to ``batch_size`` pending intakes scheduled before ``cutoff``. Returns (missed, escalated)."""
+    with transaction.atomic():
+        missed = list(
+            MedicineIntake.objects
+            .filter(status='pending', scheduled_time__lt=cutoff)
+            .order_by('scheduled_time')
+            # Skip rows a user is updating right now (PostgreSQL); their own write wins
+            .select_for_update(skip_locked=True, of=('self',))
+            .values(
+                'id', 'medicine_id', 'scheduled_time', 'medicine__name', 'medicine__user_id',
+                'medicine__user__timezone', 'medicine__user__first_name', 'medicine__user__username',
+            )[:batch_size]
+        )
+        if not missed:
+            return 0, 0
+        # Queryset updates skip auto_now and the save() rollup hook, so both are done here
+        MedicineIntake.objects.filter(id__in=[row['id'] for row in missed], status='pending').update(status='missed', updated_at=now)
+        record_status_changes(
+            [(row['medicine_id'], row['scheduled_time'], 'pending', 'missed') for row in missed],
+            owners={row['medicine_id']: (row['medicine__user_id'], row['medicine__user__timezone']) for row in missed},
+        )
+        messages = escalations(missed, now)
+        OutboxMessage.objects.bulk_create(messages, ignore_conflicts=True)
+    for user_id in {row['medicine__user_id'] for row in missed}:
+        invalidate_on_commit('today', user_id)
+    return len(missed), len(messages)
+
+
+def sweep_missed_doses(now=None, grace_minutes=None, batch_size=None, max_batches=None):
+    """Mark every pending intake more than the grace period overdue as missed, batch by batch."""
+    now = now or timezone.now()
+    grace_minutes = settings.MISSED_DOSE_GRACE_MINUTES if grace_minutes is None else grace_minutes
+    batch_size = batch_size or settings.MISSED_DOSE_SWEEP_BATCH_SIZE
+    cutoff = now - timedelta(minutes=grace_minutes)
+    stats = SweepStats()
+    while max_batches is None or stats.batches < max_batches:
+        missed, escalated = sweep_batch(cutoff, now, batch_size)
+        if not missed:
+            break
+        stats.batches += 1
+        stats.missed += missed
+        stats.escalated += escalated
+    return stats
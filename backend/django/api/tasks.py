@@ -1,24 +1,67 @@
-from celery import shared_task
+from celery import group, shared_task
+from django.conf import settings
 from django.utils import timezone
-from api.models import MedicineIntake, Caregiver
-import requests
+from django.utils.dateparse import parse_datetime
+from api.cache import lock
+from api.dispatch import due_intakes
+from api.outbox import drain, enqueue_reminders
+from api.refills import forecast_refills as forecast
+from api.scheduling import materialize_intakes
+from api.sweeper import sweep_missed_doses as sweep
+
+
+@shared_task
+def send_medication_reminders(window_minutes=None, shards=None):
+    """
+    Beat entry point: fan the due window out to one sub-task per user-id shard.
+
+    Every shard scans the same window as of the same instant, so shards run in parallel
+    across workers without overlapping.
+    """
+    shards = shards or settings.REMINDER_SHARDS
+    window_minutes = window_minutes or settings.REMINDER_WINDOW_MINUTES
+    now = timezone.now().isoformat()
+    group(send_reminder_shard.s(shard, shards, now, window_minutes) for shard in range(shards)).apply_async()
+    return shards
+
+
+@shared_task
+def send_reminder_shard(shard, shards, now, window_minutes):
+    """
+    Queue and send the reminders of one shard.
+
+    A per-shard lock keeps overlapping beats from scanning the same shard at once, and the
+    outbox's per-intake dedupe key plus the notified_at stamp make a repeated scan a no-op.
+    """
+    with lock(f'reminder-shard:{shard}/{shards}', settings.REMINDER_SHARD_LOCK_SECONDS) as acquired:
+        if not acquired:
+            return {'shard': shard, 'skipped': True}
+        queued = enqueue_reminders(due_intakes(parse_datetime(now), window_minutes, shard=shard, shards=shards))
+        stats = drain() if queued.messages else None
+    return {'shard': shard, 'queued': queued.intakes, 'messages': queued.messages, **(stats.as_dict() if stats else {})}
+
+
+@shared_task
+def materialize_medicine_intakes(horizon_hours=None):
+    return materialize_intakes(horizon_hours=horizon_hours)
+
+
+@shared_task
+def drain_notification_outbox(max_batches=None):
+    return drain(max_batches=max_batches).as_dict()
+
+
+@shared_task
+def sweep_missed_doses(max_batches=None):
+    """Beat entry point for the missed-dose sweeper; the lock keeps a slow sweep from overlapping the next."""
+    with lock('missed-dose-sweep', settings.MISSED_DOSE_SWEEP_LOCK_SECONDS) as acquired:
+        if not acquired:
+            return {'skipped': True}
+        stats = sweep(max_batches=max_batches)
+        sent = drain() if stats.escalated else None
+    return {'missed': stats.missed, 'escalated': stats.escalated, **(sent.as_dict() if sent else {})}
+
 
 @shared_task
-def send_medication_reminders():
-    now = timezone.now()
-    window = now + timezone.timedelta(minutes=30)
-    intakes = MedicineIntake.objects.filter(time__gte=now, time__lte=window, notified=False)
-    for intake in intakes:
-        user = intake.user
-        if hasattr(user, 'sms_enabled') and user.sms_enabled and user.phone_number:
-            payload = {
-                'phone': user.phone_number,
-                'message': f"Reminder: Take your medicine {intake.medicine.name} at {intake.time.strftime('%H:%M')}"
-            }
-            # Call Node.js SMS service
-            try:
-                requests.post('http://localhost:3000/sms', json=payload)
-                intake.notified = True
-                intake.save()
-            except Exception as e:
-                pass
+def forecast_refills():
+    return forecast().summary()
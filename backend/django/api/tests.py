@@ -1,12 +1,1266 @@
-from django.test import TestCase
-from .models import Medicine, User
+import asyncio
+import base64
+import io
+import csv
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from pillpall_backend.celery import app as celery_app
+from .dispatch import due_intakes
+from .cache import lock
+from .fastpath import FastJSONRenderer
+from .metrics import REGISTRY
+from .push import get_broker
+from .adherence import rebuild_rollup
+from .authentication import StreamToken, get_user
+from .drugmatch import DrugCatalog, _load, get_catalog, parse_dosages
+from .models import AdherenceDaily, Caregiver, Medicine, MedicineIntake, MedicineSchedule, Notification, OutboxMessage, Tombstone, User
+from .outbox import backlog, claim, drain, enqueue_reminders
+from .tasks import send_medication_reminders, send_reminder_shard
+from .refills import forecast_refills
+from .sweeper import sweep_missed_doses
+from .scheduling import advance_fired_schedules, expand_schedule, materialize_intakes, reindex_schedules, schedules_due
 
 class MedicineModelTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpass')
-        self.medicine = Medicine.objects.create(user=self.user, name='Aspirin', dosage='100mg')
+        self.medicine = Medicine.objects.create(user=self.user, name='Aspirin', dosage='100mg', med_type='pill')
 
     def test_medicine_creation(self):
         self.assertEqual(self.medicine.name, 'Aspirin')
         self.assertEqual(self.medicine.dosage, '100mg')
         self.assertEqual(self.medicine.user.username, 'testuser')
+
+
+class FakeSMSClient:
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.messages = []
+
+    def send(self, phone, message):
+        if phone in self.fail_for:
+            raise ConnectionError('gateway unavailable')
+        self.messages.append((phone, message))
+
+    def close(self):
+        pass
+
+
+class ReminderDispatchTest(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.alice = User.objects.create_user(username='alice', password='x', sms_enabled=True, phone_number='111')
+        self.bob = User.objects.create_user(username='bob', password='x', sms_enabled=True, phone_number='222')
+        quiet = User.objects.create_user(username='quiet', password='x', sms_enabled=False, phone_number='333')
+        for user in (self.alice, self.bob, quiet):
+            medicine = Medicine.objects.create(user=user, name=f'Med {user.username}', dosage='1', med_type='pill')
+            MedicineIntake.objects.create(medicine=medicine, scheduled_time=self.now + timedelta(minutes=10))
+            MedicineIntake.objects.create(medicine=medicine, scheduled_time=self.now + timedelta(hours=3))
+
+    def test_due_intakes_is_one_joined_query(self):
+        with self.assertNumQueries(1):
+            phones = sorted(i.medicine.user.phone_number for i in due_intakes(self.now))
+        self.assertEqual(phones, ['111', '222'])
+
+    def test_due_reminders_go_out_through_the_outbox(self):
+        enqueue_reminders(due_intakes(self.now), self.now)
+        self.assertEqual(MedicineIntake.objects.filter(notified_at__isnull=False).count(), 2)
+        client = FakeSMSClient(fail_for={'222'})
+        stats = drain(client=client, concurrency=4, now=self.now)
+        self.assertEqual((stats.sent, stats.retried), (1, 1))
+        self.assertEqual([phone for phone, _ in client.messages], ['111'])
+        # The failed send is retried from the outbox, not by scanning the intakes again
+        self.assertFalse(due_intakes(self.now).exists())
+        self.assertEqual(OutboxMessage.objects.get(recipient='222').status, 'pending')
+
+
+class NotificationOutboxTest(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        for username, phone in (('alice', '111'), ('bob', '222')):
+            user = User.objects.create_user(username=username, password='x', sms_enabled=True, phone_number=phone)
+            medicine = Medicine.objects.create(user=user, name=f'Med {username}', dosage='1', med_type='pill')
+            MedicineIntake.objects.create(medicine=medicine, scheduled_time=self.now + timedelta(minutes=10))
+
+    def test_enqueue_is_transactional_and_idempotent(self):
+        intakes = list(due_intakes(self.now))
+        self.assertEqual(enqueue_reminders(intakes, self.now).messages, 2)
+        enqueue_reminders(intakes, self.now)
+        self.assertEqual(OutboxMessage.objects.filter(status='pending').count(), 2)
+        # The intakes are stamped with the messages, so the next scan does not queue them again
+        self.assertFalse(due_intakes(self.now).exists())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_BACKOFF_SECONDS=60)
+    def test_failures_back_off_then_dead_letter(self):
+        enqueue_reminders(due_intakes(self.now), self.now)
+        client = FakeSMSClient(fail_for={'222'})
+        stats = drain(client=client, concurrency=2, now=self.now)
+        self.assertEqual((stats.claimed, stats.sent, stats.retried, stats.dead), (2, 1, 1, 0))
+        failed = OutboxMessage.objects.get(recipient='222')
+        self.assertEqual((failed.status, failed.attempts), ('pending', 1))
+        self.assertIn('gateway unavailable', failed.last_error)
+        self.assertTrue(self.now + timedelta(seconds=30) <= failed.available_at <= self.now + timedelta(seconds=60))
+
+        # Not due yet, then due again and out of attempts
+        self.assertEqual(drain(client=client, now=self.now).claimed, 0)
+        stats = drain(client=client, now=self.now + timedelta(minutes=5))
+        self.assertEqual((stats.claimed, stats.dead), (1, 1))
+        self.assertEqual(OutboxMessage.objects.get(recipient='222').status, 'dead')
+        self.assertEqual(OutboxMessage.objects.get(recipient='111').status, 'sent')
+        self.assertEqual(len(client.messages), 1)
+        self.assertEqual(backlog(self.now)['counts'], {'pending': 0, 'sending': 0, 'sent': 1, 'dead': 1})
+
+    def test_expired_lease_is_reclaimed(self):
+        enqueue_reminders(due_intakes(self.now), self.now)
+        self.assertEqual(len(claim(10, self.now)), 2)
+        self.assertEqual(claim(10, self.now), [])
+        reclaimed = claim(10, self.now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS + 1))
+        self.assertEqual([message.attempts for message in reclaimed], [2, 2])
+
+    def test_push_channel_creates_notification(self):
+        user = User.objects.get(username='alice')
+        OutboxMessage.objects.create(channel='push', recipient=str(user.id), user=user, subject='Refill', body='Running low', available_at=self.now)
+        stats = drain(client=FakeSMSClient(), now=self.now)
+        self.assertEqual(stats.sent, 1)
+        self.assertEqual(Notification.objects.get(user=user).title, 'Refill')
+
+
+class ReminderCoalescingTest(TestCase):
+    def setUp(self):
+        self.now = datetime(2026, 3, 2, 12, 50, tzinfo=ZoneInfo('UTC'))
+        self.user = User.objects.create_user(username='many', password='x', sms_enabled=True, phone_number='111', timezone='Europe/Berlin')
+        other = User.objects.create_user(username='one', password='x', sms_enabled=True, phone_number='222')
+        slot = datetime(2026, 3, 2, 13, tzinfo=ZoneInfo('UTC'))
+        for name in ('Aspirin', 'Metformin', 'Statin'):
+            medicine = Medicine.objects.create(user=self.user, name=name, dosage='10mg', med_type='pill')
+            MedicineIntake.objects.create(medicine=medicine, scheduled_time=slot)
+        MedicineIntake.objects.create(medicine=medicine, scheduled_time=slot + timedelta(minutes=15))
+        single = Medicine.objects.create(user=other, name='Solo', dosage='1', med_type='pill')
+        MedicineIntake.objects.create(medicine=single, scheduled_time=slot)
+
+    def test_one_message_per_user_and_slot(self):
+        stats = enqueue_reminders(due_intakes(self.now), self.now)
+        self.assertEqual((stats.intakes, stats.messages), (5, 3))
+        bodies = sorted(OutboxMessage.objects.values_list('recipient', 'body'))
+        self.assertEqual(bodies, [
+            ('111', 'Reminder: Take your medicine Statin at 14:15'),
+            ('111', 'Reminder: Take your medicines at 14:00: Aspirin 10mg, Metformin 10mg and Statin 10mg'),
+            ('222', 'Reminder: Take your medicine Solo at 13:00'),
+        ])
+        self.assertFalse(due_intakes(self.now).exists())
+
+    def test_late_addition_to_a_slot_gets_its_own_reminder(self):
+        enqueue_reminders(due_intakes(self.now), self.now)
+        medicine = Medicine.objects.create(user=self.user, name='Late', dosage='1', med_type='pill')
+        MedicineIntake.objects.create(medicine=medicine, scheduled_time=datetime(2026, 3, 2, 13, tzinfo=ZoneInfo('UTC')))
+        self.assertEqual(enqueue_reminders(due_intakes(self.now), self.now).messages, 1)
+        self.assertEqual(OutboxMessage.objects.count(), 4)
+
+    def test_command_reports_coalescing_and_batches(self):
+        out = io.StringIO()
+        with patch('api.outbox.SMSClient', return_value=FakeSMSClient()), patch('api.management.commands.send_medication_reminders.timezone.now', return_value=self.now):
+            call_command('send_medication_reminders', stdout=out)
+        output = out.getvalue()
+        self.assertIn('Queued 5 reminders as 3 messages (1.67 intakes per message)', output)
+        self.assertIn('Batch 1: claimed=3 sent=3 failed=0', output)
+
+
+class ReminderTaskTest(TestCase):
+    """The beat coordinator fans out per-shard sub-tasks; runs with Celery in eager mode."""
+
+    def setUp(self):
+        celery_app.conf.update(task_always_eager=True)
+        self.addCleanup(celery_app.conf.update, task_always_eager=False)
+        cache.clear()
+        self.now = timezone.now()
+        self.users = []
+        for index in range(5):
+            user = User.objects.create_user(username=f'user{index}', password='x', sms_enabled=True, phone_number=f'55{index}')
+            medicine = Medicine.objects.create(user=user, name=f'Med {index}', dosage='1', med_type='pill')
+            MedicineIntake.objects.create(medicine=medicine, scheduled_time=self.now + timedelta(minutes=5))
+            self.users.append(user)
+
+    def test_shards_partition_due_intakes(self):
+        shards = [set(due_intakes(self.now, shard=shard, shards=3).values_list('id', flat=True)) for shard in range(3)]
+        self.assertEqual(sum(len(ids) for ids in shards), 5)
+        self.assertEqual(set().union(*shards), set(due_intakes(self.now).values_list('id', flat=True)))
+
+    def test_beat_sends_each_reminder_once(self):
+        client = FakeSMSClient()
+        with patch('api.outbox.SMSClient', return_value=client):
+            self.assertEqual(send_medication_reminders.delay(shards=3).get(), 3)
+            send_medication_reminders.delay(shards=3)
+        self.assertEqual(sorted(phone for phone, _ in client.messages), [f'55{index}' for index in range(5)])
+        self.assertEqual(OutboxMessage.objects.filter(status='sent').count(), 5)
+
+    def test_locked_shard_is_skipped(self):
+        with lock('reminder-shard:0/1', 60):
+            result = send_reminder_shard.delay(0, 1, self.now.isoformat(), 30).get()
+        self.assertEqual(result, {'shard': 0, 'skipped': True})
+        self.assertFalse(OutboxMessage.objects.exists())
+
+
+class MaterializeIntakesTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='tz', password='x', timezone='America/New_York')
+        self.medicine = Medicine.objects.create(user=user, name='Metformin', dosage='500mg', med_type='pill')
+        MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='08:00', days_of_week=[1, 2, 3, 4, 5])
+        MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='20:00', days_of_week=[1], is_active=False)
+        # Friday 2026-01-02 00:00 in New York
+        self.now = datetime(2026, 1, 2, 0, 0, tzinfo=ZoneInfo('America/New_York'))
+        reindex_schedules(MedicineSchedule.objects.all(), after=self.now)
+
+    def test_expands_in_user_timezone(self):
+        materialize_intakes(horizon_hours=96, now=self.now)
+        times = list(MedicineIntake.objects.order_by('scheduled_time').values_list('scheduled_time', flat=True))
+        # Friday and Monday 08:00 local (13:00 UTC); the weekend and the inactive schedule are skipped
+        self.assertEqual([t.astimezone(ZoneInfo('UTC')).isoformat() for t in times], [
+            '2026-01-02T13:00:00+00:00',
+            '2026-01-05T13:00:00+00:00',
+        ])
+
+    def test_is_idempotent(self):
+        materialize_intakes(horizon_hours=96, now=self.now, chunk_size=1)
+        materialize_intakes(horizon_hours=96, now=self.now, chunk_size=1)
+        self.assertEqual(MedicineIntake.objects.count(), 2)
+
+    def test_overlapping_schedules_and_concurrent_writers_count_once(self):
+        # Daily 08:00 overlaps the weekday 08:00 schedule on Friday and Monday
+        schedule = MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='08:00', days_of_week=[1, 2, 3, 4, 5, 6, 7])
+        reindex_schedules(MedicineSchedule.objects.filter(id=schedule.id), after=self.now)
+        # Monday's slot is taken by another writer after the materializer read the existing rows
+        monday = datetime(2026, 1, 5, 8, 0, tzinfo=ZoneInfo('America/New_York'))
+        expand = expand_schedule
+
+        def racing_expand(*args):
+            if not MedicineIntake.objects.filter(scheduled_time=monday).exists():
+                MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=monday, status='taken')
+            return expand(*args)
+
+        with patch('api.scheduling.expand_schedule', side_effect=racing_expand):
+            created = materialize_intakes(horizon_hours=96, now=self.now)
+        # Friday through Monday is four local days
+        self.assertEqual(created, 3)
+        self.assertEqual(MedicineIntake.objects.count(), 4)
+        rollup = AdherenceDaily.objects.aggregate(pending=Sum('pending'), taken=Sum('taken'))
+        self.assertEqual(rollup, {'pending': 3, 'taken': 1})
+
+
+class ScheduleFireIndexTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='idx', password='x', timezone='Europe/Berlin')
+        self.medicine = Medicine.objects.create(user=user, name='Ramipril', dosage='5mg', med_type='pill')
+
+    def test_save_populates_normalized_fields(self):
+        schedule = MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='07:30', days_of_week=[1, 7])
+        self.assertEqual(schedule.minute_of_day, 450)
+        self.assertEqual(schedule.days_mask, 0b1000001)
+        local = schedule.next_fire_at.astimezone(ZoneInfo('Europe/Berlin'))
+        self.assertEqual((local.hour, local.minute), (7, 30))
+        self.assertIn(local.isoweekday(), (1, 7))
+        self.assertGreater(schedule.next_fire_at, timezone.now())
+
+        schedule.is_active = False
+        schedule.save(update_fields=['is_active'])
+        schedule.refresh_from_db()
+        self.assertIsNone(schedule.next_fire_at)
+
+    def test_due_window_and_advance(self):
+        # Wednesday 2026-01-07 08:55 Berlin
+        now = datetime(2026, 1, 7, 8, 55, tzinfo=ZoneInfo('Europe/Berlin'))
+        MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='09:00', days_of_week=[3])
+        MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='21:00', days_of_week=[3])
+        reindex_schedules(MedicineSchedule.objects.all(), after=now)
+        due = schedules_due(now, now + timedelta(minutes=10))
+        self.assertEqual([s.time_of_day for s in due], ['09:00'])
+
+        advance_fired_schedules(now + timedelta(minutes=6))
+        fired = MedicineSchedule.objects.get(time_of_day='09:00')
+        self.assertEqual(fired.next_fire_at, datetime(2026, 1, 14, 9, 0, tzinfo=ZoneInfo('Europe/Berlin')))
+
+    def test_api_rejects_times_and_days_the_index_cannot_parse(self):
+        client = APIClient()
+        client.force_authenticate(self.medicine.user)
+        for time_of_day, days in (('8am', [1]), ('25:00', [1]), ('08:00', ['x']), ('08:00', [8]), ('08:00', '1,2')):
+            response = client.post('/api/schedules/', {'medicine': self.medicine.id, 'time_of_day': time_of_day, 'days_of_week': days}, format='json')
+            self.assertEqual(response.status_code, 400, (time_of_day, days))
+        self.assertFalse(MedicineSchedule.objects.exists())
+        response = client.post('/api/schedules/', {'medicine': self.medicine.id, 'time_of_day': '8:05', 'days_of_week': ['3', 1]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['time_of_day'], response.data['days_of_week']), ('08:05', [1, 3]))
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        base = timezone.now().replace(microsecond=0)
+        # Two medicines share every scheduled_time to exercise the id tie-breaker
+        for name in ('Statin', 'Aspirin'):
+            medicine = Medicine.objects.create(user=self.user, name=name, dosage='20mg', med_type='pill')
+            for hours in range(4):
+                MedicineIntake.objects.create(medicine=medicine, scheduled_time=base - timedelta(hours=hours))
+
+    def test_walks_all_intakes_in_order_without_duplicates(self):
+        url, seen = '/api/intakes/?page_size=3', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend(response.data['results'])
+            url = response.data['next']
+        expected = list(MedicineIntake.objects.order_by('-scheduled_time', '-id').values_list('id', flat=True))
+        self.assertEqual([item['id'] for item in seen], expected)
+
+    def test_default_page_size_and_envelope(self):
+        response = self.client.get('/api/notifications/')
+        self.assertEqual(set(response.data), {'next', 'previous', 'results'})
+
+
+class AdherenceRollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='adh', password='x', timezone='Asia/Tokyo')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.medicine = Medicine.objects.create(user=self.user, name='Levothyroxine', dosage='50mcg', med_type='pill')
+        # 2026-03-02 is a Monday
+        self.day = datetime(2026, 3, 2, 8, 0, tzinfo=ZoneInfo('Asia/Tokyo'))
+
+    def rollup(self):
+        return list(AdherenceDaily.objects.order_by('date').values_list('date', 'pending', 'taken', 'missed', 'skipped'))
+
+    def test_status_transitions_update_rollup(self):
+        intake = MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.day)
+        other = MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.day + timedelta(hours=12))
+        self.assertEqual(self.rollup(), [(self.day.date(), 2, 0, 0, 0)])
+
+        intake.status = 'taken'
+        intake.save()
+        fetched = MedicineIntake.objects.get(pk=other.pk)
+        fetched.status = 'missed'
+        fetched.save()
+        self.assertEqual(self.rollup(), [(self.day.date(), 0, 1, 1, 0)])
+
+        fetched.delete()
+        self.assertEqual(self.rollup(), [(self.day.date(), 0, 1, 0, 0)])
+
+    def test_rebuild_matches_incremental(self):
+        for offset, status_name in enumerate(['taken', 'taken', 'missed', 'skipped', 'pending']):
+            MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.day + timedelta(days=offset // 2, hours=offset), status=status_name)
+        incremental = self.rollup()
+        rebuild_rollup()
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_endpoint_aggregates_by_week(self):
+        for offset, status_name in enumerate(['taken', 'taken', 'missed', 'skipped']):
+            MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.day + timedelta(days=offset * 3), status=status_name)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/adherence/', {'period': 'week', 'start': '2026-03-01', 'end': '2026-03-31'})
+        self.assertEqual(response.status_code, 200)
+        weeks = [(str(row['period_start']), row['taken'], row['missed'], row['skipped']) for row in response.data['results']]
+        self.assertEqual(weeks, [('2026-03-02', 2, 1, 0), ('2026-03-09', 0, 0, 1)])
+        self.assertEqual(response.data['totals']['adherence'], 0.5)
+        self.assertEqual(self.client.get('/api/adherence/', {'period': 'year'}).status_code, 400)
+        for params in ({'start': '2026-02-30'}, {'end': 'March'}, {'medicine': 'abc'}):
+            self.assertEqual(self.client.get('/api/adherence/', params).status_code, 400, params)
+
+
+class BulkIntakeTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulk', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.medicine = Medicine.objects.create(user=self.user, name='Insulin', dosage='10u', med_type='injection')
+        stranger = User.objects.create_user(username='stranger', password='x')
+        self.foreign = Medicine.objects.create(user=stranger, name='Other', dosage='1', med_type='pill')
+        self.base = timezone.now().replace(microsecond=0)
+        self.pending = MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.base)
+
+    def post(self, items):
+        return self.client.post('/api/intakes/bulk/', items, format='json')
+
+    def test_mixed_batch_reports_per_item_results(self):
+        response = self.post([
+            {'id': self.pending.id, 'status': 'taken', 'actual_time': self.base.isoformat()},
+            {'medicine': self.medicine.id, 'scheduled_time': (self.base + timedelta(hours=8)).isoformat(), 'status': 'skipped'},
+            {'medicine': self.foreign.id, 'scheduled_time': self.base.isoformat(), 'status': 'taken'},
+            {'status': 'taken'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['result'] for item in response.data], ['updated', 'created', 'error', 'error'])
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, 'taken')
+        self.assertFalse(MedicineIntake.objects.filter(medicine=self.foreign).exists())
+        self.assertEqual(sum(AdherenceDaily.objects.values_list('taken', flat=True)), 1)
+
+    def test_replayed_create_updates_existing_slot(self):
+        response = self.post([{'medicine': self.medicine.id, 'scheduled_time': self.base.isoformat(), 'status': 'taken'}])
+        self.assertEqual(response.data[0]['result'], 'updated')
+        self.assertEqual(response.data[0]['intake']['id'], self.pending.id)
+        self.assertEqual(MedicineIntake.objects.count(), 1)
+
+    def test_concurrently_created_slot_is_a_conflict(self):
+        when = self.base + timedelta(hours=1)
+        create = MedicineIntake.objects.bulk_create
+
+        def racing_bulk_create(intakes, *args, **kwargs):
+            # Another request inserts the same slot between this one's read and its insert
+            MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=when)
+            return create(intakes, *args, **kwargs)
+
+        with patch.object(MedicineIntake.objects, 'bulk_create', side_effect=racing_bulk_create):
+            response = self.post([
+                {'id': self.pending.id, 'status': 'taken'},
+                {'medicine': self.medicine.id, 'scheduled_time': when.isoformat(), 'status': 'taken'},
+            ])
+        self.assertEqual(response.status_code, 409)
+        # The batch is all or nothing
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, 'pending')
+        self.assertEqual(sum(AdherenceDaily.objects.values_list('taken', flat=True)), 0)
+
+        replay = self.post([{'medicine': self.medicine.id, 'scheduled_time': when.isoformat(), 'status': 'taken'}])
+        self.assertEqual(replay.status_code, 200)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def run(count, offset):
+            items = [
+                {'medicine': self.medicine.id, 'scheduled_time': (self.base + timedelta(days=offset, minutes=i)).isoformat(), 'status': 'taken'}
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post(items).status_code, 200)
+            return len(queries)
+        # The rollup costs one UPDATE per (medicine, day), so keep both batches within one day
+        self.base = self.base.replace(hour=0, minute=0, second=0)
+        self.assertEqual(run(2, 1), run(20, 3))
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0)
+class DeltaSyncTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sync', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.kept = Medicine.objects.create(user=self.user, name='Kept', dosage='1', med_type='pill')
+        self.dropped = Medicine.objects.create(user=self.user, name='Dropped', dosage='1', med_type='pill')
+        MedicineSchedule.objects.create(medicine=self.dropped, time_of_day='08:00', days_of_week=[1])
+        self.intake = MedicineIntake.objects.create(medicine=self.kept, scheduled_time=timezone.now())
+        MedicineIntake.objects.create(medicine=self.dropped, scheduled_time=timezone.now())
+        self.caregiver = Caregiver.objects.create(user=self.user, name='Sam')
+        Notification.objects.create(user=self.user, title='Hi', message='There')
+        hour_ago = timezone.now() - timedelta(hours=1)
+        for model in (Medicine, MedicineSchedule, MedicineIntake, Caregiver, Notification):
+            model.objects.update(updated_at=hour_ago)
+
+    def test_initial_sync_returns_everything(self):
+        data = self.client.get('/api/sync/').data
+        self.assertEqual(len(data['medicines']), 2)
+        self.assertEqual(len(data['intakes']), 2)
+        self.assertEqual(len(data['notifications']), 1)
+        self.assertTrue(data['token'])
+
+    def test_delta_returns_only_changes_and_tombstones(self):
+        token = self.client.get('/api/sync/').data['token']
+        self.intake.status = 'taken'
+        self.intake.save()
+        caregiver_id, medicine_id = self.caregiver.id, self.dropped.id
+        self.caregiver.delete()
+        self.dropped.delete()
+
+        data = self.client.get('/api/sync/', {'since': token}).data
+        self.assertEqual([row['id'] for row in data['intakes']], [self.intake.id])
+        self.assertEqual(data['medicines'], [])
+        self.assertEqual(data['notifications'], [])
+        self.assertEqual(data['deleted']['caregivers'], [caregiver_id])
+        self.assertEqual(data['deleted']['medicines'], [medicine_id])
+        # The medicine's tombstone stands in for its cascaded schedules and intakes
+        self.assertEqual(data['deleted']['intakes'], [])
+        self.assertEqual(Tombstone.objects.count(), 2)
+
+    def test_rejects_garbage_token(self):
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'nope'}).status_code, 400)
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cache', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.medicine = Medicine.objects.create(user=self.user, name='Cached', dosage='1', med_type='pill')
+
+    def test_repeat_list_is_served_from_cache(self):
+        first = self.client.get('/api/medicines/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/medicines/')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get('/api/caregivers/')['ETag']
+        response = self.client.get('/api/caregivers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_schedule_write_invalidates_medicine_list_on_commit(self):
+        etag = self.client.get('/api/medicines/')['ETag']
+        with self.captureOnCommitCallbacks() as callbacks:
+            MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='09:00', days_of_week=[1])
+            # Until the write commits, a reader must not cache the old rows under a new version
+            self.assertEqual(self.client.get('/api/medicines/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        for callback in callbacks:
+            callback()
+        response = self.client.get('/api/medicines/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['results'][0]['schedules']), 1)
+
+    def test_profile_update_invalidates_me(self):
+        self.client.get('/api/me/')
+        self.user.phone_number = '+15551234'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get('/api/me/').data['phone_number'], '+15551234')
+
+
+SLOW_PATH = {
+    'API_FAST_LIST_SERIALIZATION': False,
+    'REST_FRAMEWORK': {**settings.REST_FRAMEWORK, 'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer']},
+}
+
+
+class FastPathParityTest(TestCase):
+    """The fast list path must produce exactly the bytes of the serializer path."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='parity', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        odd = 'Żółć \u2028 line\u2029para "quoted" \\ back\x01slash / ünïcødé 💊'
+        bare = Medicine.objects.create(user=self.user, name='Bare', dosage='1', med_type='pill')
+        full = Medicine.objects.create(
+            user=self.user, name=odd, dosage=odd, med_type='liquid', remaining_count=-3,
+            refill_threshold=2 ** 40, instructions=odd, side_effects='',
+        )
+        for time_of_day, days in (('21:00', []), ('08:00', [1, 3, 5]), ('08:00', [7])):
+            MedicineSchedule.objects.create(medicine=full, time_of_day=time_of_day, days_of_week=days, is_active=time_of_day != '21:00')
+        moment = datetime(2026, 5, 17, 6, 7, 8, 123456, tzinfo=ZoneInfo('Pacific/Chatham'))
+        MedicineIntake.objects.create(medicine=full, scheduled_time=moment, actual_time=moment, status='taken', notes=odd)
+        MedicineIntake.objects.create(medicine=bare, scheduled_time=moment.replace(microsecond=0), notes=None)
+        Notification.objects.create(user=self.user, title=odd, message='', type='test', scheduled_for=moment)
+        Notification.objects.create(user=self.user, title='t', message='m', scheduled_for=None)
+
+    def fetch(self, url):
+        cache.clear()
+        fast = self.client.get(url)
+        cache.clear()
+        with override_settings(**SLOW_PATH):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        return fast.content, slow.content
+
+    def test_medicines(self):
+        fast, slow = self.fetch('/api/medicines/')
+        self.assertEqual(fast, slow)
+
+    def test_intakes(self):
+        fast, slow = self.fetch('/api/intakes/')
+        self.assertEqual(fast, slow)
+
+    def test_notifications(self):
+        fast, slow = self.fetch('/api/notifications/')
+        self.assertEqual(fast, slow)
+
+    def test_paginated_pages(self):
+        for url in ('/api/intakes/?page_size=1', '/api/medicines/?page_size=1', '/api/notifications/?page_size=1'):
+            fast, slow = self.fetch(url)
+            self.assertEqual(fast, slow)
+
+    def test_renderer_matches_json_renderer(self):
+        data = {'a': [1, -2, None, True, 'x\u2028y', '\x7f\x00', {'n': 2 ** 53}], 'ü': 'é'}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class AsyncEndpointTest(TestCase):
+    """The async views under /api/async/ answer like the DRF viewsets."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='async', password='x')
+        self.other = User.objects.create_user(username='other', password='x')
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.medicine = Medicine.objects.create(user=self.user, name='Aspirin', dosage='100mg', med_type='pill')
+        Medicine.objects.create(user=self.user, name='Statin', dosage='10mg', med_type='pill')
+        self.foreign = Medicine.objects.create(user=self.other, name='Theirs', dosage='1', med_type='pill')
+        MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='08:00', days_of_week=[1, 2])
+        base = timezone.now().replace(microsecond=0)
+        for hours in range(3):
+            MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=base - timedelta(hours=hours))
+        self.notification = Notification.objects.create(user=self.user, title='t', message='m')
+        Notification.objects.create(user=self.other, title='x', message='y')
+        self.sync_client = APIClient()
+        self.sync_client.force_authenticate(self.user)
+
+    async def test_lists_match_sync_endpoints(self):
+        for name in ('medicines', 'intakes', 'notifications'):
+            response = await self.async_client.get(f'/api/async/{name}/', headers=self.auth)
+            self.assertEqual(response.status_code, 200)
+            expected = await sync_to_async(self.sync_client.get)(f'/api/{name}/')
+            self.assertEqual(response.json()['results'], expected.json()['results'])
+        response = await self.async_client.get('/api/async/me/', headers=self.auth)
+        self.assertEqual(response.json()['username'], 'async')
+
+    async def test_keyset_pages_walk_both_ways(self):
+        seen = []
+        url = '/api/async/intakes/?page_size=1'
+        while url:
+            page = (await self.async_client.get(url, headers=self.auth)).json()
+            seen.extend(row['id'] for row in page['results'])
+            last, url = page, page['next']
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(len(set(seen)), 3)
+        previous = (await self.async_client.get(last['previous'], headers=self.auth)).json()
+        self.assertEqual([row['id'] for row in previous['results']], seen[1:2])
+        # Undecodable, and decodable but with a key that is not a datetime
+        not_a_date = base64.urlsafe_b64encode(json.dumps({'v': 'soon', 'id': 1, 'r': 0}).encode()).decode()
+        for cursor in ('nope', not_a_date):
+            bad = await self.async_client.get(f'/api/async/intakes/?cursor={cursor}', headers=self.auth)
+            self.assertEqual(bad.status_code, 400)
+
+    async def test_requires_valid_token(self):
+        response = await self.async_client.get('/api/async/medicines/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response.headers)
+        for header in ('Bearer junk', 'Bearer a b', 'Bearer'):
+            response = await self.async_client.get('/api/async/me/', headers={'Authorization': header})
+            self.assertEqual(response.status_code, 401, header)
+
+    async def test_create_intake(self):
+        when = '2026-03-01T08:00:00Z'
+        payload = {'medicine': self.medicine.id, 'scheduled_time': when, 'status': 'taken'}
+        response = await self.async_client.post('/api/async/intakes/', payload, content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'taken')
+        self.assertTrue(await AdherenceDaily.objects.filter(medicine=self.medicine, taken=1).aexists())
+        again = await self.async_client.post('/api/async/intakes/', payload, content_type='application/json', headers=self.auth)
+        self.assertEqual(again.status_code, 400)
+        foreign = dict(payload, medicine=self.foreign.id)
+        response = await self.async_client.post('/api/async/intakes/', foreign, content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_mark_read(self):
+        url = f'/api/async/notifications/{self.notification.id}/mark_read/'
+        response = await self.async_client.post(url, headers=self.auth)
+        self.assertEqual(response.json()['status'], 'read')
+        other = await Notification.objects.aget(user=self.other)
+        response = await self.async_client.post(f'/api/async/notifications/{other.id}/mark_read/', headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+
+
+class NotificationPushTest(TestCase):
+    """New notifications reach connected clients over the SSE stream."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='push', password='x')
+        self.token = str(StreamToken.for_user(self.user))
+        self.earlier = Notification.objects.create(user=self.user, title='earlier', message='m')
+
+    def create_committed(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(user=self.user, message='m', **fields)
+
+    async def open_stream(self, **headers):
+        response = await self.async_client.get(f'/api/async/notifications/stream/?stream_token={self.token}', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return aiter(response.streaming_content)
+
+    async def test_pushes_created_notification(self):
+        stream = await self.open_stream()
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        notification = await sync_to_async(self.create_committed)(title='Take aspirin')
+        chunk = await asyncio.wait_for(anext(stream), 2)
+        self.assertTrue(chunk.startswith(b'id: %d\nevent: notification\n' % notification.id))
+        self.assertIn(b'"title":"Take aspirin"', chunk)
+        # A client disconnect cancels the pending read, which must drop the subscription
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(get_broker().subscriber_count(self.user.id), 0)
+
+    async def test_replays_after_last_event_id(self):
+        later = await sync_to_async(self.create_committed)(title='later')
+        stream = await self.open_stream(**{'Last-Event-ID': str(self.earlier.id)})
+        await anext(stream)
+        chunk = await asyncio.wait_for(anext(stream), 2)
+        self.assertTrue(chunk.startswith(b'id: %d\n' % later.id))
+        await stream.aclose()
+
+    async def test_requires_token(self):
+        response = await self.async_client.get('/api/async/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_token_is_issued_and_only_opens_the_stream(self):
+        access = RefreshToken.for_user(self.user).access_token
+        response = await self.async_client.post(
+            '/api/async/notifications/stream/token/', headers={'Authorization': f'Bearer {access}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.content)
+        self.assertEqual(body['expires_in'], settings.NOTIFICATION_STREAM_TOKEN_LIFETIME)
+        self.token = body['token']
+        stream = await self.open_stream()
+        await stream.aclose()
+
+        # An access token no longer works in the query string, and a stream token works nowhere else
+        response = await self.async_client.get(f'/api/async/notifications/stream/?access_token={access}')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(f'/api/async/notifications/stream/?stream_token={access}')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/async/me/', headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refused_outside_asgi(self):
+        response = self.client.get(f'/api/async/notifications/stream/?stream_token={self.token}')
+        self.assertEqual(response.status_code, 503)
+        response = self.client.post('/api/async/notifications/stream/token/')
+        self.assertEqual(response.status_code, 503)
+
+
+class MetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        REGISTRY.reset()
+        self.user = User.objects.create_user(username='metrics', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for index in range(3):
+            Medicine.objects.create(user=self.user, name=f'Med {index}', dosage='1', med_type='pill')
+
+    def test_records_route_latency_and_queries(self):
+        cache.clear()
+        self.client.get('/api/medicines/')
+        self.client.get('/api/medicines/')
+        self.client.get('/api/nowhere/')
+        entry = REGISTRY.routes[('medicine-list', 'GET')]
+        self.assertEqual(entry.statuses[200], 2)
+        self.assertEqual(entry.latency.count, 2)
+        # The second request is answered from the response cache
+        self.assertGreater(entry.queries.sum, 0)
+        self.assertGreater(entry.response_bytes, 0)
+        self.assertEqual(REGISTRY.routes[('unmatched', 'GET')].statuses[404], 1)
+
+        with self.settings(METRICS_PUBLIC=True):
+            body = self.client.get('/metrics').content.decode()
+        self.assertIn('pillpall_http_requests_total{route="medicine-list",method="GET",status="200"} 2', body)
+        self.assertIn('pillpall_http_request_duration_seconds_bucket{route="medicine-list",method="GET",le="+Inf"} 2', body)
+        self.assertIn('pillpall_http_request_db_queries_count{route="medicine-list",method="GET"} 2', body)
+        self.assertIn('pillpall_outbox_messages_total{outcome="sent"}', body)
+
+    async def test_counts_async_view_queries(self):
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        await self.async_client.get('/api/async/medicines/', headers=headers)
+        entry = REGISTRY.routes[('async-medicine-list', 'GET')]
+        self.assertEqual(entry.statuses[200], 1)
+        self.assertGreaterEqual(entry.queries.sum, 2)
+
+    @override_settings(METRICS_QUERY_WARNING_THRESHOLD=1)
+    def test_warns_over_query_threshold(self):
+        cache.clear()
+        with self.assertLogs('api.metrics', level='WARNING') as logs:
+            self.client.get('/api/medicines/')
+        self.assertIn('GET /api/medicines/ issued 2 queries', logs.output[0])
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_protects_endpoint(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_closed_without_token_unless_public(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(METRICS_PUBLIC=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class RefillForecastTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = datetime(2026, 3, 2, 12, tzinfo=ZoneInfo('UTC'))
+        self.user = User.objects.create_user(username='refill', password='x')
+        self.medicine = Medicine.objects.create(user=self.user, name='Aspirin', dosage='1', med_type='pill', remaining_count=10, refill_threshold=5)
+        MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='08:00', days_of_week=[1, 2, 3, 4, 5, 6, 7])
+        MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='20:00', days_of_week=[1, 3, 5, 7])
+        MedicineSchedule.objects.create(medicine=self.medicine, time_of_day='12:00', days_of_week=[1, 2, 3], is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def remaining(self):
+        return Medicine.objects.values_list('remaining_count', flat=True).get(id=self.medicine.id)
+
+    def test_taken_transitions_adjust_the_count(self):
+        intake = MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.now)
+        self.assertEqual(self.remaining(), 10)
+        self.client.patch(f'/api/intakes/{intake.id}/', {'status': 'taken'}, format='json')
+        self.assertEqual(self.remaining(), 9)
+        self.client.patch(f'/api/intakes/{intake.id}/', {'notes': 'with food'}, format='json')
+        self.assertEqual(self.remaining(), 9)
+        # Undoing gives the dose back
+        self.client.patch(f'/api/intakes/{intake.id}/', {'status': 'skipped'}, format='json')
+        self.assertEqual(self.remaining(), 10)
+        self.client.post('/api/intakes/bulk/', [
+            {'medicine': self.medicine.id, 'scheduled_time': (self.now + timedelta(hours=hours)).isoformat(), 'status': 'taken'}
+            for hours in (1, 2, 3)
+        ], format='json')
+        self.assertEqual(self.remaining(), 7)
+        # The cached medicine list sees the new count
+        self.assertEqual(self.client.get('/api/medicines/').json()['results'][0]['remaining_count'], 7)
+
+    def test_moving_an_intake_to_another_medicine_moves_its_counts(self):
+        other = Medicine.objects.create(user=self.user, name='Ibuprofen', dosage='1', med_type='pill', remaining_count=5)
+        intake = MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.now, status='taken')
+        self.assertEqual(self.remaining(), 9)
+        response = self.client.patch(f'/api/intakes/{intake.id}/', {'medicine': other.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.remaining(), 10)
+        self.assertEqual(Medicine.objects.get(id=other.id).remaining_count, 4)
+        taken = dict(AdherenceDaily.objects.values_list('medicine_id', 'taken'))
+        self.assertEqual(taken, {self.medicine.id: 0, other.id: 1})
+
+    def test_zero_count_stays_untracked(self):
+        intake = MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.now - timedelta(days=1), status='taken')
+        Medicine.objects.filter(id=self.medicine.id).update(remaining_count=0)
+        untouched = Medicine.objects.values_list('updated_at', flat=True).get(id=self.medicine.id)
+        MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.now, status='taken')
+        self.assertEqual(self.remaining(), 0)
+        # Undoing a dose must not invent stock (or bump updated_at for delta sync) either
+        self.client.patch(f'/api/intakes/{intake.id}/', {'status': 'skipped'}, format='json')
+        self.assertEqual(self.remaining(), 0)
+        self.assertEqual(Medicine.objects.values_list('updated_at', flat=True).get(id=self.medicine.id), untouched)
+
+    def test_forecast_and_reminders(self):
+        idle = Medicine.objects.create(user=self.user, name='Idle', dosage='1', med_type='pill', remaining_count=3)
+        with self.assertNumQueries(4):
+            stats = forecast_refills(now=self.now)
+        self.assertEqual((stats.medicines, stats.updated, stats.reminded), (2, 1, 0))
+        self.medicine.refresh_from_db()
+        # 7 + 4 active doses a week: 10 left lasts 6 days; no schedules means no forecast
+        self.assertEqual(self.medicine.runs_out_on.isoformat(), '2026-03-08')
+        idle.refresh_from_db()
+        self.assertIsNone(idle.runs_out_on)
+
+        Medicine.objects.filter(id=self.medicine.id).update(remaining_count=4)
+        self.assertEqual(forecast_refills(now=self.now).reminded, 1)
+        self.assertEqual(forecast_refills(now=self.now).reminded, 0)
+        notification = Notification.objects.get(type='refill_reminder')
+        self.assertEqual(notification.medicine_id, str(self.medicine.id))
+        self.assertEqual(notification.message, 'Aspirin is running low: 4 left, enough until about Mar 04.')
+
+        # Restocking re-arms the reminder
+        Medicine.objects.filter(id=self.medicine.id).update(remaining_count=30)
+        forecast_refills(now=self.now)
+        Medicine.objects.filter(id=self.medicine.id).update(remaining_count=2)
+        self.assertEqual(forecast_refills(now=self.now).reminded, 1)
+
+
+class MissedDoseSweepTest(TestCase):
+    def setUp(self):
+        self.now = datetime(2026, 3, 2, 12, tzinfo=ZoneInfo('UTC'))
+        self.patient = User.objects.create_user(username='pat', password='x', first_name='Pat')
+        self.medicine = Medicine.objects.create(user=self.patient, name='Aspirin', dosage='1', med_type='pill')
+        self.overdue = MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.now - timedelta(hours=2))
+        self.old = MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.now - timedelta(days=3))
+        self.in_grace = MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.now - timedelta(minutes=30))
+        self.taken = MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=self.now - timedelta(hours=3), status='taken')
+        Caregiver.objects.create(user=self.patient, name='Sam', phone_number='555')
+        Caregiver.objects.create(user=self.patient, name='Muted', phone_number='556', notifications_enabled=False)
+        Caregiver.objects.create(user=self.patient, name='Kin', email='kin@example.com', notifications_enabled=False, emergency_contact=True)
+        loner = User.objects.create_user(username='loner', password='x')
+        other = Medicine.objects.create(user=loner, name='Other', dosage='1', med_type='pill')
+        self.lonely = MedicineIntake.objects.create(medicine=other, scheduled_time=self.now - timedelta(hours=2))
+
+    def test_overdue_pending_intakes_become_missed(self):
+        stats = sweep_missed_doses(now=self.now, grace_minutes=60)
+        self.assertEqual((stats.missed, stats.batches), (3, 1))
+        statuses = dict(MedicineIntake.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[self.overdue.id], 'missed')
+        self.assertEqual(statuses[self.old.id], 'missed')
+        self.assertEqual(statuses[self.lonely.id], 'missed')
+        self.assertEqual(statuses[self.in_grace.id], 'pending')
+        self.assertEqual(statuses[self.taken.id], 'taken')
+        self.assertGreaterEqual(MedicineIntake.objects.get(id=self.overdue.id).updated_at, self.now)
+        day = AdherenceDaily.objects.get(medicine=self.medicine, date=self.overdue.scheduled_time.date())
+        self.assertEqual((day.pending, day.missed, day.taken), (1, 1, 1))
+
+    def test_caregivers_are_escalated_to_once(self):
+        stats = sweep_missed_doses(now=self.now, grace_minutes=60)
+        self.assertEqual(stats.escalated, 2)
+        messages = {message.recipient: message for message in OutboxMessage.objects.all()}
+        self.assertEqual(set(messages), {'555', 'kin@example.com'})
+        self.assertEqual(messages['555'].channel, 'sms')
+        self.assertEqual(messages['kin@example.com'].channel, 'email')
+        # The three-day-old dose is marked missed but not escalated
+        self.assertEqual(messages['555'].body, 'PillPall: Pat missed Aspirin at 10:00.')
+        self.assertEqual(sweep_missed_doses(now=self.now, grace_minutes=60).missed, 0)
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+
+    def test_query_count_does_not_grow_with_users(self):
+        for index in range(5):
+            user = User.objects.create_user(username=f'extra{index}', password='x')
+            medicine = Medicine.objects.create(user=user, name='Extra', dosage='1', med_type='pill')
+            MedicineIntake.objects.create(medicine=medicine, scheduled_time=self.now - timedelta(hours=2))
+            Caregiver.objects.create(user=user, name='Carer', phone_number=f'7{index}')
+        with CaptureQueriesContext(connection) as queries:
+            stats = sweep_missed_doses(now=self.now, grace_minutes=60)
+        self.assertEqual((stats.missed, stats.escalated), (8, 7))
+        # Pending scan, bulk update, rollup insert, caregivers, outbox insert, then the empty final scan;
+        # the rollup itself takes one UPDATE per (medicine, day) touched
+        statements = [q['sql'] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        rollup = [sql for sql in statements if sql.startswith('UPDATE "api_adherencedaily"')]
+        self.assertEqual(len(rollup), 8)
+        self.assertEqual(len(statements) - len(rollup), 6)
+
+    def test_batches(self):
+        stats = sweep_missed_doses(now=self.now, grace_minutes=60, batch_size=1)
+        self.assertEqual((stats.missed, stats.batches), (3, 3))
+        self.assertEqual(sweep_missed_doses(now=self.now, grace_minutes=60, batch_size=1).batches, 0)
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='export', password='x', timezone='America/New_York')
+        other = User.objects.create_user(username='other', password='x')
+        self.medicine = Medicine.objects.create(user=self.user, name='Aspirin', dosage='100mg', med_type='pill')
+        self.second = Medicine.objects.create(user=self.user, name='Metformin', dosage='500mg', med_type='pill')
+        foreign = Medicine.objects.create(user=other, name='Theirs', dosage='1', med_type='pill')
+        zone = ZoneInfo('America/New_York')
+        for day in range(1, 4):
+            MedicineIntake.objects.create(medicine=self.medicine, scheduled_time=datetime(2026, 3, day, 22, tzinfo=zone), status='taken')
+        MedicineIntake.objects.create(medicine=self.second, scheduled_time=datetime(2026, 3, 2, 8, tzinfo=zone), status='missed', notes='=HYPERLINK("x")')
+        MedicineIntake.objects.create(medicine=foreign, scheduled_time=datetime(2026, 3, 2, 8, tzinfo=zone))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def read(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_intakes_csv(self):
+        with self.assertNumQueries(1):
+            response, body = self.read('/api/export/intakes.csv/')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="pillpall-intakes.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual([row['medicine_name'] for row in rows], ['Aspirin', 'Metformin', 'Aspirin', 'Aspirin'])
+        # Local time, and the user's note cannot run as a spreadsheet formula
+        self.assertEqual(rows[0]['scheduled_time'], '2026-03-01T22:00:00-05:00')
+        self.assertEqual(rows[1]['notes'], "'=HYPERLINK(\"x\")")
+
+    def test_filters_are_applied(self):
+        _, body = self.read(f'/api/export/intakes.ndjson/?start=2026-03-02&end=2026-03-02&medicine={self.medicine.id}')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['scheduled_time'], '2026-03-02T22:00:00-05:00')
+        self.assertEqual(rows[0]['dosage'], '100mg')
+
+    def test_adherence_ndjson(self):
+        _, body = self.read('/api/export/adherence.ndjson/?start=2026-03-02')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(row['date'], row['medicine_name'], row['adherence']) for row in rows], [
+            ('2026-03-02', 'Aspirin', 1.0), ('2026-03-02', 'Metformin', 0.0), ('2026-03-03', 'Aspirin', 1.0),
+        ])
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_streams_in_chunks(self):
+        response = self.client.get('/api/export/intakes.csv/')
+        self.assertEqual(len(list(response.streaming_content)), 3)
+
+    def test_bad_filters(self):
+        self.assertEqual(self.client.get('/api/export/intakes.csv/?start=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/api/export/intakes.csv/?medicine=x').status_code, 400)
+
+
+class CachedAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cached', password='pw-123456')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_user_is_served_from_the_cache(self):
+        # /api/me/ is itself response-cached, so the only query left is loading the user
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/me/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['username'], 'cached')
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        self.assertEqual(self.client.get('/api/me/').status_code, 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get('/api/me/').status_code, 401)
+
+    def test_cached_user_keeps_the_password(self):
+        self.client.get('/api/me/')
+        cached = get_user(self.user.id)
+        cached.first_name = 'Renamed'
+        cached.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Renamed')
+        self.assertTrue(self.user.check_password('pw-123456'))
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_hash_cost_follows_the_setting_and_upgrades_on_login(self):
+        self.user.set_password('pw-123456')
+        self.user.save()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            response = self.client.post('/api/auth/login/', {'username': 'cached', 'password': 'pw-123456'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+
+class DrugMatchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='scanner', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ocr_noise_still_finds_the_drug_and_dosage(self):
+        response = self.client.post('/api/medicines/match/', {
+            'text': 'CVS Pharmacy\nAMOXICI11IN 5OO mg capsules\nTake 1 capsule by mouth 3 times daily',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        best = response.data['results'][0]
+        self.assertEqual(best['name'], 'Amoxicillin')
+        self.assertEqual(best['dosage'], '500 mg')
+        self.assertEqual(best['score'], 1.0)
+
+        misspelt = get_catalog().match('Metfromin 850mg', limit=1)
+        self.assertEqual([(result['name'], result['dosage']) for result in misspelt], [('Metformin', '850 mg')])
+
+    def test_index_merges_duplicates_and_ranks_by_similarity(self):
+        catalog = DrugCatalog([('Losartan', ['50 mg']), ('LOSARTAN', ['100 mg']), ('Valsartan', ['80 mg'])])
+        self.assertEqual(len(catalog), 2)
+        results = catalog.match('losartan 1OO mg', limit=5, threshold=0.3)
+        self.assertEqual([result['name'] for result in results], ['Losartan', 'Valsartan'])
+        self.assertEqual(results[0]['strengths'], ['50 mg', '100 mg'])
+        self.assertEqual(results[0]['dosage'], '100 mg')
+        self.assertEqual(catalog.match('take with food', threshold=0.3), [])
+        self.assertEqual(parse_dosages('2.50 mg, 10ml and 5OO mcg'), ['2.5 mg', '10 ml', '500 mcg'])
+
+    def test_validates_input_and_requires_auth(self):
+        self.assertEqual(self.client.post('/api/medicines/match/', {'text': ''}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/medicines/match/', {'text': 'x' * 5001}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/medicines/match/', {'text': 'Aspirin', 'limit': 50}, format='json').status_code, 400)
+        self.assertEqual(APIClient().post('/api/medicines/match/', {'text': 'Aspirin'}, format='json').status_code, 401)
+
+    def test_catalog_is_indexed_at_startup_when_preloading(self):
+        config = django_apps.get_app_config('api')
+        _load.cache_clear()
+        with self.settings(DRUG_CATALOG_PRELOAD=True):
+            config.ready()
+        self.assertEqual(_load.cache_info().currsize, 1)
+
+        with self.settings(DRUG_CATALOG_PRELOAD=True, DRUG_CATALOG_PATH='/nonexistent/catalog.tsv'):
+            with self.assertLogs('api.drugmatch', level='WARNING'):
+                config.ready()
+
+
+class TodayTimelineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.zone = ZoneInfo('America/New_York')
+        # Wednesday 10:00 in New York
+        self.now = datetime(2026, 3, 4, 15, tzinfo=ZoneInfo('UTC'))
+        self.user = User.objects.create_user(username='today', password='x', timezone='America/New_York')
+        self.aspirin = Medicine.objects.create(user=self.user, name='Aspirin', dosage='100mg', med_type='pill')
+        self.vitamin = Medicine.objects.create(user=self.user, name='Vitamin D', dosage='1', med_type='pill')
+        MedicineSchedule.objects.create(medicine=self.aspirin, time_of_day='08:00', days_of_week=[1, 2, 3, 4, 5, 6, 7])
+        MedicineSchedule.objects.create(medicine=self.aspirin, time_of_day='20:00', days_of_week=[1])
+        MedicineSchedule.objects.create(medicine=self.aspirin, time_of_day='12:00', days_of_week=[3], is_active=False)
+        MedicineSchedule.objects.create(medicine=self.vitamin, time_of_day='09:00', days_of_week=[3])
+        self.taken = MedicineIntake.objects.create(
+            medicine=self.aspirin, scheduled_time=datetime(2026, 3, 4, 8, tzinfo=self.zone), status='taken',
+            actual_time=datetime(2026, 3, 4, 8, 5, tzinfo=self.zone),
+        )
+        self.extra = MedicineIntake.objects.create(medicine=self.vitamin, scheduled_time=datetime(2026, 3, 4, 14, 30, tzinfo=self.zone))
+        MedicineIntake.objects.create(medicine=self.aspirin, scheduled_time=datetime(2026, 3, 3, 8, tzinfo=self.zone), status='missed')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self):
+        with patch('api.views.timezone.now', return_value=self.now):
+            return self.client.get('/api/today/')
+
+    def test_slots_join_schedules_and_intakes_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['date'], date(2026, 3, 4))
+        self.assertEqual(
+            [(slot['time'], slot['medicine_name'], slot['intake'], slot['status']) for slot in response.data['slots']],
+            [('08:00', 'Aspirin', self.taken.id, 'taken'), ('09:00', 'Vitamin D', None, 'pending'), ('14:30', 'Vitamin D', self.extra.id, 'pending')],
+        )
+        first = response.data['slots'][0]
+        self.assertEqual(first['actual_time'], '2026-03-04T08:05:00-05:00')
+        self.assertEqual(response.data['slots'][1]['scheduled_time'], '2026-03-04T09:00:00-05:00')
+        self.assertEqual(response.data['counts'], {'pending': 2, 'taken': 1, 'missed': 0, 'skipped': 0})
+
+        # Served from the cache until something the timeline shows changes
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().data, response.data)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/intakes/{self.extra.id}/', {'status': 'skipped'}, format='json')
+        self.assertEqual(self.get().data['counts']['skipped'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            MedicineSchedule.objects.create(medicine=self.vitamin, time_of_day='21:00', days_of_week=[3])
+        self.assertEqual(self.get().data['slots'][-1]['time'], '21:00')
+
+    def test_the_day_follows_the_users_clock(self):
+        self.get()
+        # Past midnight in New York the cached timeline no longer applies
+        self.now = datetime(2026, 3, 5, 6, tzinfo=ZoneInfo('UTC'))
+        response = self.get()
+        self.assertEqual(response.data['date'], date(2026, 3, 5))
+        self.assertEqual([(slot['time'], slot['intake']) for slot in response.data['slots']], [('08:00', None)])
+
+    def test_recording_a_slot_through_bulk_resolves_it_in_place(self):
+        # What the client's recordIntake does: post the slot's own time back to the bulk endpoint
+        slots = {slot['time']: slot for slot in self.get().data['slots']}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/intakes/bulk/', [
+                {'medicine': self.vitamin.id, 'scheduled_time': slots['14:30']['scheduled_time'], 'status': 'taken'},
+                {'medicine': self.vitamin.id, 'scheduled_time': slots['09:00']['scheduled_time'], 'status': 'skipped'},
+            ], format='json')
+        self.assertEqual([result['result'] for result in response.data], ['updated', 'created'])
+        self.assertEqual(response.data[0]['intake']['id'], self.extra.id)
+        self.assertEqual(MedicineIntake.objects.filter(medicine=self.vitamin).count(), 2)
+        self.assertEqual(
+            [(slot['time'], slot['status']) for slot in self.get().data['slots']],
+            [('08:00', 'taken'), ('09:00', 'skipped'), ('14:30', 'taken')],
+        )
+
+
+class QueryBudgetTest(TestCase):
+    """Exact query counts per endpoint; several rows of each kind so an N+1 would show."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='budget', password='x', is_staff=True, is_superuser=True)
+        other = User.objects.create_user(username='other', password='x')
+        self.foreign = Medicine.objects.create(user=other, name='Theirs', dosage='1', med_type='pill')
+        base = datetime(2026, 1, 5, 8, tzinfo=ZoneInfo('UTC'))
+        for index in range(3):
+            medicine = Medicine.objects.create(user=self.user, name=f'Med {index}', dosage='1', med_type='pill')
+            for time_of_day in ('08:00', '20:00'):
+                MedicineSchedule.objects.create(medicine=medicine, time_of_day=time_of_day, days_of_week=[1, 2])
+            for day in range(3):
+                MedicineIntake.objects.create(medicine=medicine, scheduled_time=base + timedelta(days=day))
+            Notification.objects.create(user=self.user, title=f'n{index}', message='m')
+            Caregiver.objects.create(user=self.user, name=f'Carer {index}', phone_number='1')
+        self.medicine = medicine
+        self.intake = MedicineIntake.objects.filter(medicine=medicine).first()
+        self.notification = Notification.objects.filter(user=self.user).first()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertBudget(self, queries, method, url, data=None, status=200):
+        cache.clear()
+        with self.assertNumQueries(queries):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, status, response.content)
+
+    def test_list_endpoints(self):
+        self.assertBudget(0, 'get', '/api/me/')
+        self.assertBudget(2, 'get', '/api/medicines/')
+        self.assertBudget(1, 'get', '/api/schedules/')
+        self.assertBudget(1, 'get', '/api/intakes/')
+        self.assertBudget(1, 'get', '/api/notifications/')
+        self.assertBudget(1, 'get', '/api/caregivers/')
+        self.assertBudget(1, 'get', '/api/today/')
+
+    def test_write_endpoints(self):
+        self.assertBudget(2, 'post', '/api/medicines/', {'name': 'New', 'dosage': '1', 'type': 'pill'}, 201)
+        # Owned medicine (with owner joined) + insert
+        self.assertBudget(2, 'post', '/api/schedules/', {'medicine': self.medicine.id, 'time_of_day': '09:00', 'days_of_week': [1]}, 201)
+        # Owned medicine + unique slot check + insert + rollup upsert and update + stock decrement (in a savepoint)
+        when = '2026-03-01T08:00:00Z'
+        self.assertBudget(8, 'post', '/api/intakes/', {'medicine': self.medicine.id, 'scheduled_time': when, 'status': 'taken'}, 201)
+        # Intake with medicine and owner + update + rollup upsert and update + stock decrement (in a savepoint)
+        self.assertBudget(7, 'patch', f'/api/intakes/{self.intake.id}/', {'status': 'taken'})
+        self.assertBudget(2, 'post', f'/api/notifications/{self.notification.id}/mark_read/')
+        self.assertBudget(1, 'post', '/api/notifications/create_test_notification/', status=201)
+
+    def test_foreign_medicine_is_rejected_by_the_field(self):
+        response = self.client.post('/api/intakes/', {'medicine': self.foreign.id, 'scheduled_time': '2026-03-01T08:00:00Z'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('medicine', response.json())
+        response = self.client.post('/api/schedules/', {'medicine': self.foreign.id, 'time_of_day': '09:00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.user)
+        # Session, user, two counts and one joined page query, however many rows there are
+        for model in ('medicineschedule', 'medicineintake', 'notification', 'caregiver'):
+            with self.assertNumQueries(5):
+                self.assertEqual(self.client.get(f'/admin/api/{model}/').status_code, 200)
+
+
+class DatabaseBackendTest(TestCase):
+    """
+    The suite is backend-agnostic; run it against PostgreSQL with
+    ``DB_ENGINE=postgres DB_NAME=... python manage.py test api.tests``.
+    """
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite tuning')
+    def test_sqlite_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1 if settings.SQLITE_WAL else 2)  # NORMAL with WAL, else FULL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite tuning')
+    def test_sqlite_file_database_uses_wal_only_when_enabled(self):
+        # The test database lives in memory, so open a file-backed connection with the same options
+        path = os.path.join(tempfile.mkdtemp(), 'wal.sqlite3')
+        wrapper = connections['default'].__class__({**connection.settings_dict, 'NAME': path}, alias='wal_check')
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal' if settings.SQLITE_WAL else 'delete')
+        finally:
+            wrapper.close()
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'PostgreSQL configuration')
+    def test_postgres_connections_and_partial_index(self):
+        self.assertTrue(connection.settings_dict['CONN_HEALTH_CHECKS'])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'intake_pending_time_idx'")
+            self.assertIn("WHERE ((status)::text = 'pending'::text)", cursor.fetchone()[0])
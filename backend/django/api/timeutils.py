@@ -0,0 +1,44 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+def parse_time_of_day(value):
+    """Parse a schedule's HH:MM string into a ``datetime.time``."""
+    hours, minutes = value.split(':')[:2]
+    return time(int(hours), int(minutes))
+
+
+def get_zone(name):
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def minute_of_day(time_of_day):
+    at = parse_time_of_day(time_of_day)
+    return at.hour * 60 + at.minute
+
+
+def days_to_mask(days_of_week):
+    """Pack ISO weekdays (1=Monday .. 7=Sunday) into a 7-bit mask, bit n-1 for day n."""
+    mask = 0
+    for day in days_of_week or []:
+        if 1 <= int(day) <= 7:
+            mask |= 1 << (int(day) - 1)
+    return mask
+
+
+def next_fire_after(minute, mask, zone, after):
+    """First aware datetime strictly after ``after`` matching the minute-of-day and day mask, or None."""
+    if not mask:
+        return None
+    at = time(minute // 60, minute % 60)
+    local_day = after.astimezone(zone).date()
+    for offset in range(8):
+        day = local_day + timedelta(days=offset)
+        if mask & (1 << (day.isoweekday() - 1)):
+            fire_at = datetime.combine(day, at, tzinfo=zone)
+            if fire_at > after:
+                return fire_at
+    return None
@@ -0,0 +1,64 @@
+"""
+The "today" timeline: every dose slot of a user's local day with its intake status.
+
+One query reads the user's medicines LEFT JOINed to their active schedules and to the
+intakes scheduled within the day (two FilteredRelations), and the slots are assembled from
+those rows in Python: a slot is a (medicine, local HH:MM) pair that a schedule fires on
+today or that an intake exists for. The view caches the result per user and local date
+under the 'today' scope, which schedule, medicine and intake writes invalidate.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import FilteredRelation, Q
+
+from .models import Medicine
+from .timeutils import parse_time_of_day
+
+STATUSES = ('pending', 'taken', 'missed', 'skipped')
+
+
+def day_bounds(day, zone):
+    """Aware [start, end) of a local calendar day."""
+    return datetime.combine(day, time.min, zone), datetime.combine(day + timedelta(days=1), time.min, zone)
+
+
+def timeline(user_id, zone, day):
+    """Dose slots of ``day`` in ``zone``, ordered by time and medicine name, plus a status count."""
+    start, end = day_bounds(day, zone)
+    weekday_bit = 1 << (day.isoweekday() - 1)
+    rows = (
+        Medicine.objects
+        .filter(user_id=user_id)
+        .annotate(
+            slot=FilteredRelation('schedules', condition=Q(schedules__is_active=True)),
+            dose=FilteredRelation('intakes', condition=Q(intakes__scheduled_time__gte=start, intakes__scheduled_time__lt=end)),
+        )
+        .values_list(
+            'id', 'name', 'dosage', 'med_type', 'slot__time_of_day', 'slot__days_mask',
+            'dose__id', 'dose__scheduled_time', 'dose__status', 'dose__actual_time',
+        )
+    )
+
+    slots = {}
+    for medicine_id, name, dosage, med_type, time_of_day, days_mask, intake_id, scheduled_time, intake_status, actual_time in rows:
+        # Each medicine comes back once per (schedule, intake) pair, so slots are keyed to dedupe
+        medicine = {'medicine': medicine_id, 'medicine_name': name, 'dosage': dosage, 'med_type': med_type}
+        if time_of_day is not None and days_mask & weekday_bit:
+            at = parse_time_of_day(time_of_day)
+            slots.setdefault((medicine_id, at), {
+                **medicine, 'time': f'{at:%H:%M}', 'scheduled_time': datetime.combine(day, at, zone).isoformat(),
+                'intake': None, 'status': 'pending', 'actual_time': None,
+            })
+        if intake_id is not None:
+            local = scheduled_time.astimezone(zone)
+            slot = slots.setdefault((medicine_id, local.time().replace(second=0, microsecond=0)), {**medicine, 'time': f'{local:%H:%M}'})
+            slot.update({
+                'scheduled_time': local.isoformat(), 'intake': intake_id, 'status': intake_status,
+                'actual_time': actual_time.astimezone(zone).isoformat() if actual_time else None,
+            })
+
+    ordered = sorted(slots.values(), key=lambda slot: (slot['time'], slot['medicine_name'], slot['medicine']))
+    counts = dict.fromkeys(STATUSES, 0)
+    for slot in ordered:
+        counts[slot['status']] = counts.get(slot['status'], 0) + 1
+    return ordered, counts
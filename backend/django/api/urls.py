@@ -8,7 +8,12 @@ from .views import (
     MedicineIntakeViewSet,
     CaregiverViewSet,
     AuthViewSet,
+    AdherenceViewSet,
+    ExportViewSet,
+    SyncViewSet,
+    TodayViewSet,
 )
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'me', MeViewSet, basename='me')
@@ -18,8 +23,23 @@ router.register(r'schedules', MedicineScheduleViewSet, basename='schedule')
 router.register(r'notifications', NotificationViewSet, basename='notification')
 router.register(r'intakes', MedicineIntakeViewSet, basename='intake')
 router.register(r'caregivers', CaregiverViewSet, basename='caregiver')
+router.register(r'adherence', AdherenceViewSet, basename='adherence')
+router.register(r'export', ExportViewSet, basename='export')
+router.register(r'sync', SyncViewSet, basename='sync')
+router.register(r'today', TodayViewSet, basename='today')
+
+async_urlpatterns = [
+    path('me/', async_views.me, name='async-me'),
+    path('medicines/', async_views.medicine_list, name='async-medicine-list'),
+    path('intakes/', async_views.intake_list, name='async-intake-list'),
+    path('notifications/', async_views.notification_list, name='async-notification-list'),
+    path('notifications/stream/', async_views.notification_stream, name='async-notification-stream'),
+    path('notifications/stream/token/', async_views.notification_stream_token, name='async-notification-stream-token'),
+    path('notifications/<int:pk>/mark_read/', async_views.notification_mark_read, name='async-notification-mark-read'),
+]
 
 urlpatterns = [
+    path('async/', include(async_urlpatterns)),
     path('', include(router.urls)),
 ]
 
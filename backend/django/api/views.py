@@ -1,18 +1,44 @@
+from datetime import datetime, timezone as dt_timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
 from django.utils import timezone
-from .models import Medicine, MedicineSchedule, Notification, MedicineIntake, Caregiver
+from django.utils.dateparse import parse_date
+from . import export
+from .adherence import record_status_changes
+from .cache import cached_response, invalidate_on_commit
+from .drugmatch import get_catalog
+from .fastpath import (
+    FastListMixin,
+    INTAKE_FIELDS,
+    MEDICINE_FIELDS,
+    NOTIFICATION_FIELDS,
+    intake_rows,
+    medicine_rows,
+    notification_rows,
+)
+from .models import AdherenceDaily, Medicine, MedicineSchedule, Notification, MedicineIntake, Caregiver, Tombstone
+from .timeutils import get_zone
+from .today import timeline
+from .refills import adjust_stock
+from .pagination import ScheduledTimeCursorPagination, TimeOfDayCursorPagination
 from .serializers import (
     UserSerializer,
     MedicineSerializer,
     MedicineScheduleSerializer,
     NotificationSerializer,
     MedicineIntakeSerializer,
+    BulkIntakeItemSerializer,
     CaregiverSerializer,
+    DrugMatchSerializer,
     SignupSerializer,
 )
 
@@ -22,6 +48,7 @@ User = get_user_model()
 class MeViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_response('me')
     def list(self, request):
         serializer = UserSerializer(request.user)
         return Response(serializer.data)
@@ -70,39 +97,57 @@ class AuthViewSet(viewsets.ViewSet):
             }, status=status.HTTP_401_UNAUTHORIZED)
 
 
-class MedicineViewSet(viewsets.ModelViewSet):
+class MedicineViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = MedicineSerializer
     permission_classes = [permissions.IsAuthenticated]
+    fast_list_fields = MEDICINE_FIELDS
+    fast_list_builder = staticmethod(medicine_rows)
 
     def get_queryset(self):
         return Medicine.objects.filter(user=self.request.user).prefetch_related('schedules').order_by("-created_at")
 
+    @cached_response('medicines')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=["post"], url_path="match")
+    def match(self, request):
+        """Catalog drugs (with the dosage read from the label) best matching a scan's OCR text."""
+        serializer = DrugMatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = get_catalog().match(serializer.validated_data['text'], limit=serializer.validated_data['limit'])
+        return Response({'results': results})
+
 
 class MedicineScheduleViewSet(viewsets.ModelViewSet):
     serializer_class = MedicineScheduleSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TimeOfDayCursorPagination
 
     def get_queryset(self):
-        queryset = MedicineSchedule.objects.filter(medicine__user=self.request.user)
+        # Joining the owner lets update's save() and cache signals run without extra queries
+        queryset = MedicineSchedule.objects.filter(medicine__user=self.request.user).select_related('medicine__user')
         medicine_id = self.request.query_params.get('medicine', None)
         if medicine_id is not None:
             queryset = queryset.filter(medicine_id=medicine_id)
         return queryset.order_by('time_of_day')
 
     def perform_create(self, serializer):
-        # Ensure the medicine belongs to the current user
-        medicine = serializer.validated_data['medicine']
-        if medicine.user != self.request.user:
-            raise permissions.PermissionDenied("You can only create schedules for your own medicines")
+        # The medicine field only accepts the user's own medicines; this is a query-free backstop
+        if serializer.validated_data['medicine'].user_id != self.request.user.id:
+            raise PermissionDenied("You can only create schedules for your own medicines")
         serializer.save()
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    fast_list_fields = NOTIFICATION_FIELDS
+    fast_list_builder = staticmethod(notification_rows)
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user).order_by("-created_at")
@@ -115,7 +160,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
         try:
             notif = self.get_object()
             notif.status = "read"
-            notif.save()
+            notif.save(update_fields=["status", "updated_at"])
             return Response(NotificationSerializer(notif).data)
         except Exception as e:
             return Response({
@@ -141,20 +186,120 @@ class NotificationViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class MedicineIntakeViewSet(viewsets.ModelViewSet):
+class MedicineIntakeViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = MedicineIntakeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    fast_list_fields = INTAKE_FIELDS
+    fast_list_builder = staticmethod(intake_rows)
+    pagination_class = ScheduledTimeCursorPagination
+    BULK_MAX_ITEMS = 500
 
     def get_queryset(self):
-        return MedicineIntake.objects.filter(medicine__user=self.request.user).order_by("-scheduled_time")
+        return MedicineIntake.objects.filter(medicine__user=self.request.user).select_related('medicine__user').order_by("-scheduled_time")
 
     def perform_create(self, serializer):
-        # Ensure the medicine belongs to the current user
-        medicine = serializer.validated_data['medicine']
-        if medicine.user != self.request.user:
-            raise permissions.PermissionDenied("You can only create intakes for your own medicines")
+        # The medicine field only accepts the user's own medicines; this is a query-free backstop
+        if serializer.validated_data['medicine'].user_id != self.request.user.id:
+            raise PermissionDenied("You can only create intakes for your own medicines")
         serializer.save()
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Apply many intake creates and status transitions in one transaction.
+
+        Creates for a (medicine, scheduled_time) slot that already exists update that intake
+        instead, so offline clients can safely replay. Returns one result per submitted item.
+        """
+        items = request.data if isinstance(request.data, list) else None
+        if items is None:
+            return Response({"error": "Expected a list of intakes"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.BULK_MAX_ITEMS:
+            return Response({"error": f"At most {self.BULK_MAX_ITEMS} intakes per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = BulkIntakeItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'result': 'error', 'errors': serializer.errors}
+
+        owned_medicines = set(
+            Medicine.objects
+            .filter(user=request.user, id__in={data['medicine'] for _, data in valid if 'medicine' in data})
+            .values_list('id', flat=True)
+        )
+        creates = [(index, data) for index, data in valid if 'id' not in data]
+        slots = {(data['medicine'], data['scheduled_time']) for _, data in creates}
+        # One query loads both the intakes named by id and the slots targeted by creates, scoped to the user
+        existing = MedicineIntake.objects.filter(medicine__user=request.user).filter(
+            models.Q(id__in=[data['id'] for _, data in valid if 'id' in data])
+            | models.Q(medicine_id__in={medicine for medicine, _ in slots}, scheduled_time__in={when for _, when in slots})
+        ) if valid else MedicineIntake.objects.none()
+        by_id = {intake.id: intake for intake in existing}
+        by_slot = {(intake.medicine_id, intake.scheduled_time): intake for intake in by_id.values()}
+
+        to_create, to_update, changes = [], {}, []
+        for index, data in valid:
+            if 'id' in data:
+                intake = by_id.get(data['id'])
+                if intake is None:
+                    results[index] = {'index': index, 'result': 'error', 'errors': {'id': ['Intake not found.']}}
+                    continue
+            elif data['medicine'] not in owned_medicines:
+                results[index] = {'index': index, 'result': 'error', 'errors': {'medicine': ['You can only record intakes for your own medicines.']}}
+                continue
+            else:
+                intake = by_slot.get((data['medicine'], data['scheduled_time']))
+            if intake is None:
+                intake = MedicineIntake(
+                    medicine_id=data['medicine'], scheduled_time=data['scheduled_time'], status=data['status'],
+                    actual_time=data.get('actual_time'), notes=data.get('notes'),
+                )
+                by_slot[(intake.medicine_id, intake.scheduled_time)] = intake
+                to_create.append(intake)
+                results[index] = {'index': index, 'result': 'created', 'intake': intake}
+                continue
+            intake.status = data['status']
+            for field in ('actual_time', 'notes'):
+                if field in data:
+                    setattr(intake, field, data[field])
+            if intake.pk:
+                to_update[intake.pk] = intake
+                changes.append((intake.medicine_id, intake.scheduled_time, intake._rollup_state[2], intake.status))
+                intake._rollup_state = (intake.medicine_id, intake.scheduled_time, intake.status)
+            results[index] = {'index': index, 'result': 'updated' if intake.pk else 'created', 'intake': intake}
+
+        try:
+            with transaction.atomic():
+                MedicineIntake.objects.bulk_create(to_create)
+                if to_update:
+                    now = timezone.now()
+                    for intake in to_update.values():
+                        intake.updated_at = now
+                    MedicineIntake.objects.bulk_update(to_update.values(), ['status', 'actual_time', 'notes', 'updated_at'])
+                changes.extend((intake.medicine_id, intake.scheduled_time, None, intake.status) for intake in to_create)
+                # Every medicine here was checked to be the requesting user's
+                owners = {change[0]: (request.user.id, request.user.timezone) for change in changes}
+                record_status_changes(changes, owners)
+                adjust_stock(changes, owners)
+        except IntegrityError:
+            # A concurrent request created one of the slots after they were read; nothing was
+            # applied, and a replay turns that create into an update
+            return Response(
+                {"error": "Another request created one of these intakes at the same time; retry the batch"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if to_create or to_update:
+            invalidate_on_commit('today', request.user.id)
+
+        for result in results:
+            if 'intake' in result:
+                result['intake'] = MedicineIntakeSerializer(result['intake']).data
+        return Response(results)
+
 
 class CaregiverViewSet(viewsets.ModelViewSet):
     serializer_class = CaregiverSerializer
@@ -163,5 +308,172 @@ class CaregiverViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Caregiver.objects.filter(user=self.request.user).order_by("-created_at")
 
+    @cached_response('caregivers')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+
+def _local_today(request):
+    return timezone.now().astimezone(get_zone(request.user.timezone)).date()
+
+
+class TodayViewSet(viewsets.ViewSet):
+    """The home screen's dose slots for the user's local day, each with its intake status."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    @cached_response('today', vary=lambda request: _local_today(request).isoformat())
+    def list(self, request):
+        day = _local_today(request)
+        slots, counts = timeline(request.user.id, get_zone(request.user.timezone), day)
+        return Response({'date': day, 'timezone': request.user.timezone, 'counts': counts, 'slots': slots})
+
+
+def _range_filters(request):
+    """Optional ``start``/``end`` dates and repeated ``medicine`` ids of a query string; None if malformed."""
+    start = request.query_params.get('start')
+    end = request.query_params.get('end')
+    try:
+        filters = {
+            'start': parse_date(start) if start else None,
+            'end': parse_date(end) if end else None,
+            'medicine_ids': [int(value) for value in request.query_params.getlist('medicine')],
+        }
+    except ValueError:
+        # parse_date raises for well-formed but impossible dates such as 2026-02-30
+        return None
+    if (start and filters['start'] is None) or (end and filters['end'] is None):
+        return None
+    return filters
+
+
+RANGE_FILTERS_ERROR = "start/end must be YYYY-MM-DD and medicine an id"
+
+
+class AdherenceViewSet(viewsets.ViewSet):
+    """Adherence per medicine per day, week or month, read from the daily rollup."""
+    permission_classes = [permissions.IsAuthenticated]
+    PERIODS = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+    STATUSES = ('pending', 'taken', 'missed', 'skipped')
+
+    @staticmethod
+    def _counts(row):
+        counts = {name: row[name] or 0 for name in AdherenceViewSet.STATUSES}
+        resolved = counts['taken'] + counts['missed'] + counts['skipped']
+        counts['total'] = resolved + counts['pending']
+        counts['adherence'] = round(counts['taken'] / resolved, 4) if resolved else None
+        return counts
+
+    def list(self, request):
+        period = request.query_params.get('period', 'day')
+        if period not in self.PERIODS:
+            return Response({"error": "period must be one of day, week, month"}, status=status.HTTP_400_BAD_REQUEST)
+        filters = _range_filters(request)
+        if filters is None:
+            return Response({"error": RANGE_FILTERS_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        end = filters['end'] or _local_today(request)
+        start = filters['start'] or end - timezone.timedelta(days=29)
+
+        rows = AdherenceDaily.objects.filter(user=request.user, date__gte=start, date__lte=end)
+        if filters['medicine_ids']:
+            rows = rows.filter(medicine_id__in=filters['medicine_ids'])
+        sums = {name: Sum(name) for name in self.STATUSES}
+
+        trunc = self.PERIODS[period]
+        bucketed = rows.annotate(period_start=trunc('date') if trunc else F('date'))
+        results = [
+            {
+                'medicine': row['medicine_id'],
+                'medicine_name': row['medicine__name'],
+                'period_start': row['period_start'],
+                **self._counts(row),
+            }
+            for row in bucketed.values('medicine_id', 'medicine__name', 'period_start').annotate(**sums).order_by('period_start', 'medicine_id')
+        ]
+        return Response({
+            'period': period,
+            'start': start,
+            'end': end,
+            'totals': self._counts(rows.aggregate(**sums)),
+            'results': results,
+        })
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Streaming downloads for doctor visits: ``/api/export/intakes.csv`` (or ``.ndjson``) and
+    ``/api/export/adherence.csv``. Optional ``start``/``end`` local dates and repeated
+    ``medicine`` ids narrow the rows; see api/export.py.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=False, methods=["get"], url_path=r'intakes\.(?P<fmt>csv|ndjson)')
+    def intakes(self, request, fmt):
+        filters = _range_filters(request)
+        if filters is None:
+            return Response({"error": RANGE_FILTERS_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        rows = export.intake_rows(request.user.id, get_zone(request.user.timezone), **filters)
+        return export.streaming_export(export.INTAKE_COLUMNS, rows, fmt, 'pillpall-intakes')
+
+    @action(detail=False, methods=["get"], url_path=r'adherence\.(?P<fmt>csv|ndjson)')
+    def adherence(self, request, fmt):
+        filters = _range_filters(request)
+        if filters is None:
+            return Response({"error": RANGE_FILTERS_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        rows = export.adherence_rows(request.user.id, **filters)
+        return export.streaming_export(export.ADHERENCE_COLUMNS, rows, fmt, 'pillpall-adherence')
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Delta sync for offline-first clients.
+
+    ``GET /api/sync/`` returns every collection in full together with a token; passing that
+    token back as ``?since=`` returns only rows changed after it, plus the ids deleted since.
+    Changes are re-sent for a short overlap window so rows committed late are never missed,
+    which means clients must apply them as idempotent upserts.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @staticmethod
+    def encode_token(moment):
+        return str(int(moment.timestamp() * 1_000_000))
+
+    @staticmethod
+    def decode_token(token):
+        return datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+
+    def list(self, request):
+        token = self.encode_token(timezone.now())
+        since = request.query_params.get('since')
+        user = request.user
+        collections = {
+            'medicines': (Medicine.objects.filter(user=user).prefetch_related('schedules'), MedicineSerializer),
+            'schedules': (MedicineSchedule.objects.filter(medicine__user=user), MedicineScheduleSerializer),
+            'intakes': (MedicineIntake.objects.filter(medicine__user=user), MedicineIntakeSerializer),
+            'notifications': (Notification.objects.filter(user=user), NotificationSerializer),
+            'caregivers': (Caregiver.objects.filter(user=user), CaregiverSerializer),
+        }
+        deleted = {name: [] for name in collections}
+
+        if since:
+            try:
+                cutoff = self.decode_token(since) - timezone.timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+            except (TypeError, ValueError, OverflowError, OSError):
+                return Response({"error": "Invalid sync token"}, status=status.HTTP_400_BAD_REQUEST)
+            collections = {
+                name: (queryset.filter(updated_at__gte=cutoff), serializer)
+                for name, (queryset, serializer) in collections.items()
+            }
+            for model, object_id in Tombstone.objects.filter(user=user, deleted_at__gte=cutoff).values_list('model', 'object_id'):
+                deleted.setdefault(model, []).append(object_id)
+
+        payload = {
+            name: serializer(queryset.order_by('id'), many=True).data
+            for name, (queryset, serializer) in collections.items()
+        }
+        payload['deleted'] = deleted
+        payload['token'] = token
+        return Response(payload)
@@ -0,0 +1,127 @@
+"""
+Async views (/api/async/...) vs the DRF viewsets under concurrent load.
+
+    python -m benchmarks.async_views --requests 2000 --concurrency 200 --threads 8
+
+The sync path goes through Django's WSGI handler from a pool of ``--threads`` workers, like
+a threaded WSGI server; the async path goes through the ASGI handler with ``--concurrency``
+requests in flight on one event loop. Both use the same bearer token and the response
+cache is disabled so each request reaches the database. Reports requests/s, p50/p95
+latency and the peak thread count for each endpoint.
+
+Note Django's async ORM still runs each query in asgiref's thread executor; the async
+path saves the per-request thread, not the per-query one.
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import setup_django
+
+ENDPOINTS = ('me', 'medicines', 'intakes', 'notifications')
+
+
+class PeakThreads:
+    """Sample threading.active_count() in the background while a run is in progress."""
+
+    def __enter__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._sampler.join()
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def run_sync(url, headers, total, threads):
+    from django.test import Client
+
+    local = threading.local()
+
+    def one(_):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        client = local.client
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.status_code
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(one, range(total)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def run_async(url, headers, total, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with gate:
+                started = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                assert response.status_code == 200, response.status_code
+                return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(total)))
+        return summarize(latencies, time.perf_counter() - started)
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import override_settings
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from .seed import seed
+
+    users = seed(users=args.users, days=args.days)
+    headers = {'Authorization': f'Bearer {RefreshToken.for_user(users[0]).access_token}'}
+
+    for name in ENDPOINTS:
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            with PeakThreads() as sync_threads:
+                sync = run_sync(f'/api/{name}/', headers, args.requests, args.threads)
+            with PeakThreads() as async_threads:
+                async_ = run_async(f'/api/async/{name}/', headers, args.requests, args.concurrency)
+        print(
+            f"{name:<14} wsgi: {sync['rps']:7.1f} req/s p50={sync['p50']:7.2f} p95={sync['p95']:7.2f} ms threads={sync_threads.peak:<4}"
+            f" asgi: {async_['rps']:7.1f} req/s p50={async_['p50']:7.2f} p95={async_['p95']:7.2f} ms threads={async_threads.peak}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Shared setup for the offline benchmarks.
+
+Benchmarks run against a throwaway SQLite file so they never touch db.sqlite3::
+
+    cd backend/django
+    python -m benchmarks.indexes --users 500
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_path=None):
+    """Configure Django against a fresh SQLite database and apply migrations."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pillpall_backend.settings')
+    from django.conf import settings
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix='pillpall-bench-'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = db_path
+    # Keep one connection across requests, so per-request query capture sees every query
+    settings.DATABASES['default']['CONN_MAX_AGE'] = None
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return db_path
+
+
+def timed(fn, repeat=5):
+    """Run ``fn`` ``repeat`` times and return the median wall time in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def profile(fn, repeat=20, setup=None):
+    """
+    Latency percentiles (ms) of ``fn`` over ``repeat`` runs, plus the queries one run issues.
+
+    ``setup`` runs untimed before every call, e.g. to reset state a write consumed.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    if setup:
+        setup()
+    with CaptureQueriesContext(connection) as captured:
+        fn()
+    # Read now: captured queries are sliced from the live log, which the next request resets
+    queries = len(captured)
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        'queries': queries,
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'mean_ms': statistics.fmean(samples),
+    }
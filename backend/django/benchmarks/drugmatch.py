@@ -0,0 +1,79 @@
+"""
+Drug-name matching (api/drugmatch.py) against a large synthetic catalog.
+
+    python -m benchmarks.drugmatch --entries 100000 --queries 500
+
+Builds a catalog of ``--entries`` generated names on top of the bundled one, then times
+``match`` on label-like text around a misspelled name (one character dropped, swapped or
+OCR-confused). Reports the index build time, lookup p50/p95/max and how often the
+intended name ranked first.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from .common import percentile, setup_django
+
+SYLLABLES = (
+    'a', 'ab', 'ac', 'al', 'am', 'an', 'ar', 'ba', 'be', 'ci', 'cil', 'co', 'da', 'de', 'di', 'do', 'fa', 'fen', 'flu',
+    'ga', 'gli', 'ha', 'i', 'in', 'ka', 'la', 'le', 'li', 'lo', 'ma', 'me', 'mi', 'mo', 'na', 'ne', 'ni', 'no', 'ol',
+    'pa', 'pe', 'pi', 'pra', 'pro', 'ra', 're', 'ri', 'ro', 'sa', 'se', 'si', 'so', 'ta', 'te', 'ti', 'to', 'tra',
+    'va', 've', 'vi', 'xa', 'za', 'zo',
+)
+SUFFIXES = ('pril', 'sartan', 'olol', 'statin', 'mab', 'cillin', 'azole', 'pine', 'tide', 'mycin', 'vir', 'done', 'pam', 'ine')
+LABEL = 'Rx 0042 {name} {dose} mg tablets\nTake 1 tablet by mouth twice daily with food\nQty 60 Refills 2'
+
+
+def generate(count, rng):
+    names = set()
+    while len(names) < count:
+        stem = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        names.add((stem + rng.choice(SUFFIXES)).capitalize())
+    return [(name, [f'{dose} mg' for dose in rng.sample((5, 10, 20, 25, 50, 100, 250, 500), 3)]) for name in sorted(names)]
+
+
+def misspell(name, rng):
+    index = rng.randrange(1, len(name) - 1)
+    edit = rng.choice(('drop', 'swap', 'ocr'))
+    if edit == 'drop':
+        return name[:index] + name[index + 1:]
+    if edit == 'swap':
+        return name[:index] + name[index + 1] + name[index] + name[index + 2:]
+    return name.replace('l', '1', 1).replace('o', '0', 1) if ('l' in name or 'o' in name) else name.upper()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    from api.drugmatch import DrugCatalog
+
+    rng = random.Random(args.seed)
+    entries = generate(args.entries, rng)
+    bundled = list(DrugCatalog.load(settings.DRUG_CATALOG_PATH).names)
+    started = time.perf_counter()
+    catalog = DrugCatalog([*((name, []) for name in bundled), *entries])
+    print(f'indexed {len(catalog)} names in {time.perf_counter() - started:.2f}s ({len(catalog.postings)} trigrams)')
+
+    samples, hits = [], 0
+    for name, strengths in rng.sample(entries, args.queries):
+        text = LABEL.format(name=misspell(name, rng), dose=strengths[0].split()[0])
+        started = time.perf_counter()
+        results = catalog.match(text, limit=5)
+        samples.append((time.perf_counter() - started) * 1000)
+        hits += bool(results) and results[0]['name'] == name
+    print(
+        f'match: p50={statistics.median(samples):.2f} ms p95={percentile(samples, 95):.2f} ms '
+        f'max={max(samples):.2f} ms top-1={hits / len(samples):.1%}'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Cost of one password hash (what every login and signup pays) at several PBKDF2 work factors.
+
+    python -m benchmarks.hashers --iterations 260000,600000,1000000 --threads 8
+
+For each iteration count reports the median time of one verify and the logins per second
+one core and ``--threads`` concurrent workers sustain (hashlib releases the GIL, so threads
+scale with cores). Pick the highest PASSWORD_HASH_ITERATIONS whose throughput still covers
+the login burst you expect after an app release.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import setup_django, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', default='260000,600000,1000000', help='Comma-separated PBKDF2 iteration counts')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--logins', type=int, default=32, help='Verifications per concurrent run')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+    hasher = PBKDF2PasswordHasher()
+    password = 'correct horse battery staple'
+    for iterations in [int(value) for value in args.iterations.split(',') if value]:
+        encoded = hasher.encode(password, hasher.salt(), iterations)
+        verify_ms = timed(lambda: hasher.verify(password, encoded), repeat=args.repeat)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(lambda _: hasher.verify(password, encoded), range(args.logins)))
+        concurrent = args.logins / (time.perf_counter() - started)
+        print(
+            f'{iterations:>9} iterations  verify={verify_ms:7.1f} ms  '
+            f'{1000 / verify_ms:6.1f} logins/s/core  {concurrent:6.1f} logins/s with {args.threads} threads'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Query plans and timings for the per-user hot queries, with and without the composite indexes.
+
+    python -m benchmarks.indexes --users 500 --days 180
+
+The "before" pass drops every index declared in the models' Meta.indexes, the "after"
+pass recreates them; the dataset is the same for both.
+"""
+import argparse
+
+from .common import setup_django, timed
+
+
+def hot_queries(user, now):
+    from datetime import timedelta
+
+    from api.models import Caregiver, Medicine, MedicineIntake, MedicineSchedule, Notification
+
+    return {
+        'medicines': Medicine.objects.filter(user=user).order_by('-created_at'),
+        'schedules': MedicineSchedule.objects.filter(medicine__user=user).order_by('time_of_day'),
+        'notifications': Notification.objects.filter(user=user).order_by('-created_at'),
+        'intakes': MedicineIntake.objects.filter(medicine__user=user).order_by('-scheduled_time'),
+        'caregivers': Caregiver.objects.filter(user=user).order_by('-created_at'),
+        'reminder_scan': MedicineIntake.objects.filter(
+            scheduled_time__gte=now, scheduled_time__lte=now + timedelta(minutes=30), status='pending',
+        ),
+        'missed_last_week': MedicineIntake.objects.filter(
+            status='missed', scheduled_time__gte=now - timedelta(days=7), scheduled_time__lt=now,
+        ),
+    }
+
+
+def declared_indexes():
+    from django.apps import apps
+
+    return [(model, index) for model in apps.get_app_config('api').get_models() for index in model._meta.indexes]
+
+
+def measure(queries, repeat):
+    results = {}
+    for name, queryset in queries.items():
+        results[name] = {
+            'plan': queryset.explain(),
+            'ms': timed(lambda qs=queryset: list(qs.all()), repeat=repeat),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.utils import timezone
+
+    from .seed import seed
+
+    users = seed(users=args.users, days=args.days)
+    target = users[len(users) // 2]
+    queries = hot_queries(target, timezone.now())
+    indexes = declared_indexes()
+
+    with connection.schema_editor() as editor:
+        for model, index in indexes:
+            editor.remove_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    before = measure(queries, args.repeat)
+
+    with connection.schema_editor() as editor:
+        for model, index in indexes:
+            editor.add_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    after = measure(queries, args.repeat)
+
+    for name in queries:
+        print(f"== {name}: {before[name]['ms']:.2f} ms -> {after[name]['ms']:.2f} ms")
+        print(f"   before: {before[name]['plan']}")
+        print(f"   after:  {after[name]['plan']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from api.adherence import rebuild_rollup
+from api.models import Caregiver, Medicine, MedicineIntake, MedicineSchedule, Notification, User
+from api.scheduling import reindex_schedules
+from api.timeutils import days_to_mask, minute_of_day
+
+TIMES = ['07:00', '08:00', '12:30', '18:00', '21:00']
+STATUSES = ['taken'] * 8 + ['missed', 'skipped']
+
+
+@transaction.atomic
+def seed(users=200, medicines_per_user=3, schedules_per_medicine=2, days=90, notifications_per_day=1, seed=1):
+    """
+    Bulk-insert a synthetic, deterministic dataset and return the created users.
+
+    Bulk inserts skip save(), so the schedule fire index and the adherence rollup are
+    rebuilt at the end the way the migrations do.
+    """
+    rng = random.Random(seed)
+    now = timezone.now().replace(second=0, microsecond=0)
+    start = User.objects.count()
+    User.objects.bulk_create([
+        User(username=f'bench{start + i}@example.com', password='!', sms_enabled=True, phone_number=f'+1555{start + i:07d}')
+        for i in range(users)
+    ], batch_size=1000)
+    created_users = list(User.objects.order_by('-id')[:users])
+
+    Medicine.objects.bulk_create([
+        Medicine(user=user, name=f'Med {user.id}-{m}', dosage='10mg', med_type='pill', remaining_count=rng.randint(0, 60))
+        for user in created_users for m in range(medicines_per_user)
+    ], batch_size=1000)
+    medicines = list(Medicine.objects.filter(user__in=created_users))
+
+    schedules = []
+    for medicine in medicines:
+        for time_of_day in rng.sample(TIMES, schedules_per_medicine):
+            days_of_week = [1, 2, 3, 4, 5, 6, 7]
+            schedules.append(MedicineSchedule(
+                medicine=medicine, time_of_day=time_of_day, days_of_week=days_of_week,
+                minute_of_day=minute_of_day(time_of_day), days_mask=days_to_mask(days_of_week),
+            ))
+    MedicineSchedule.objects.bulk_create(schedules, batch_size=1000)
+
+    intakes = []
+    for schedule in schedules:
+        hours, minutes = map(int, schedule.time_of_day.split(':'))
+        for day in range(-days, 2):
+            scheduled_time = (now + timedelta(days=day)).replace(hour=hours, minute=minutes)
+            status = 'pending' if scheduled_time > now else rng.choice(STATUSES)
+            intakes.append(MedicineIntake(
+                medicine_id=schedule.medicine_id, scheduled_time=scheduled_time, status=status,
+                actual_time=scheduled_time if status == 'taken' else None,
+            ))
+        if len(intakes) >= 20000:
+            MedicineIntake.objects.bulk_create(intakes, batch_size=2000)
+            intakes = []
+    MedicineIntake.objects.bulk_create(intakes, batch_size=2000)
+
+    notifications = [
+        Notification(user=user, title='Reminder', message='Time for your medicine', type='medication_reminder', status='read')
+        for user in created_users for _ in range(days * notifications_per_day)
+    ]
+    Notification.objects.bulk_create(notifications, batch_size=2000)
+    Caregiver.objects.bulk_create([
+        Caregiver(user=user, name=f'Carer {user.id}', phone_number='+15550000000') for user in created_users
+    ], batch_size=1000)
+    reindex_schedules(MedicineSchedule.objects.filter(medicine__user__in=created_users), after=now)
+    rebuild_rollup(created_users)
+    return created_users
@@ -0,0 +1,64 @@
+"""
+Serializer path vs fast path for the read-heavy list payloads.
+
+    python -m benchmarks.serializers --users 20 --days 365
+
+Each case renders the same rows both ways (query + serialization + JSON rendering)
+and checks the bytes are identical before reporting timings.
+"""
+import argparse
+
+from .common import setup_django, timed
+
+
+def cases(user):
+    from rest_framework.renderers import JSONRenderer
+
+    from api import fastpath
+    from api.models import Medicine, MedicineIntake, Notification
+    from api.serializers import MedicineIntakeSerializer, MedicineSerializer, NotificationSerializer
+
+    slow_renderer, fast_renderer = JSONRenderer(), fastpath.FastJSONRenderer()
+    specs = {
+        'medicines': (
+            Medicine.objects.filter(user=user).order_by('-created_at', '-id'),
+            MedicineSerializer, fastpath.MEDICINE_FIELDS, fastpath.medicine_rows, ['schedules'],
+        ),
+        'intakes': (
+            MedicineIntake.objects.filter(medicine__user=user).order_by('-scheduled_time', '-id'),
+            MedicineIntakeSerializer, fastpath.INTAKE_FIELDS, fastpath.intake_rows, [],
+        ),
+        'notifications': (
+            Notification.objects.filter(user=user).order_by('-created_at', '-id'),
+            NotificationSerializer, fastpath.NOTIFICATION_FIELDS, fastpath.notification_rows, [],
+        ),
+    }
+    for name, (queryset, serializer_class, fields, builder, prefetch) in specs.items():
+        def slow(queryset=queryset, serializer_class=serializer_class, prefetch=prefetch):
+            return slow_renderer.render(serializer_class(queryset.prefetch_related(*prefetch), many=True).data)
+
+        def fast(queryset=queryset, fields=fields, builder=builder):
+            return fast_renderer.render(builder(list(queryset.values(*fields))))
+
+        yield name, queryset.count(), slow, fast
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from .seed import seed
+
+    users = seed(users=args.users, days=args.days)
+    for name, rows, slow, fast in cases(users[0]):
+        assert slow() == fast(), f'{name}: fast path output differs from the serializers'
+        slow_ms, fast_ms = timed(slow, args.repeat), timed(fast, args.repeat)
+        print(f'{name:<14} rows={rows:<6} serializer={slow_ms:8.2f} ms  fast={fast_ms:8.2f} ms  speedup={slow_ms / fast_ms:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Microbenchmarks for the API hot paths against a seeded synthetic dataset.
+
+    python -m benchmarks.suite --users 50 --days 365 --output before.json
+    python -m benchmarks.suite --users 50 --days 365 --compare before.json
+
+Covers the viewset list and create endpoints, the serializers (slow and fast path), the
+reminder command and signup/login. Each case reports the queries one run issues and
+p50/p95/mean latency. Requests go through the full middleware and JWT authentication
+stack with the response cache disabled, so every run reaches the database (pass
+--with-cache to keep it). Results are written as JSON (by default under
+benchmarks/results/) and --compare prints the p50 change against an earlier run.
+"""
+import argparse
+import io
+import itertools
+import json
+import platform
+import subprocess
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+from .common import BASE_DIR, profile, setup_django
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+LIST_ENDPOINTS = ('me', 'medicines', 'schedules', 'intakes', 'notifications', 'caregivers', 'adherence', 'sync')
+PASSWORD = 'bench-password'
+
+
+class NullSMSClient:
+    """Stands in for the SMS gateway so the reminder command runs offline."""
+
+    def send(self, phone, message):
+        pass
+
+    def close(self):
+        pass
+
+
+def api_cases(user):
+    from django.test import Client
+    from django.utils import timezone
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    client = Client()
+    headers = {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+    medicine_id = user.medicines.values_list('id', flat=True).first()
+    counter = itertools.count()
+    base = timezone.now().replace(microsecond=0) + timedelta(days=3650)
+
+    def get(url):
+        def run():
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200, (url, response.status_code)
+        return run
+
+    def post(url, payload):
+        def run():
+            response = client.post(url, payload() if callable(payload) else payload, content_type='application/json', headers=headers)
+            assert response.status_code == 201, (url, response.status_code, response.content[:200])
+        return run
+
+    for name in LIST_ENDPOINTS:
+        yield f'list.{name}', get(f'/api/{name}/'), None
+    yield 'list.intakes.async', get('/api/async/intakes/'), None
+    yield 'create.medicine', post('/api/medicines/', {'name': 'Bench', 'dosage': '5mg', 'type': 'pill'}), None
+    yield 'create.intake', post('/api/intakes/', lambda: {
+        'medicine': medicine_id, 'status': 'taken',
+        'scheduled_time': (base + timedelta(minutes=next(counter))).isoformat(),
+    }), None
+    yield 'create.notification', post('/api/notifications/create_test_notification/', {}), None
+
+
+def serializer_cases(user):
+    from .serializers import cases
+
+    for name, rows, slow, fast in cases(user):
+        yield f'serialize.{name}.serializer', slow, None
+        yield f'serialize.{name}.fast', fast, None
+
+
+def reminder_cases():
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from api.models import MedicineIntake, OutboxMessage
+
+    def reset():
+        # Make the next window's intakes due again so every run does the full scan, queue and send
+        now = timezone.now()
+        MedicineIntake.objects.filter(scheduled_time__gte=now, scheduled_time__lte=now + timedelta(minutes=30)).update(notified_at=None)
+        OutboxMessage.objects.all().delete()
+
+    def run():
+        with patch('api.outbox.SMSClient', return_value=NullSMSClient()):
+            call_command('send_medication_reminders', window=30, stdout=io.StringIO())
+
+    yield 'command.send_medication_reminders', run, reset
+
+
+def auth_cases(user):
+    from django.test import Client
+
+    client = Client()
+    counter = itertools.count()
+
+    def signup():
+        email = f'signup-{time.time_ns()}-{next(counter)}@example.com'
+        payload = {'email': email, 'password': PASSWORD, 'full_name': 'Bench User'}
+        response = client.post('/api/auth/signup/', payload, content_type='application/json')
+        assert response.status_code == 201, response.content[:200]
+
+    def login():
+        payload = {'username': user.username, 'password': PASSWORD}
+        response = client.post('/api/auth/login/', payload, content_type='application/json')
+        assert response.status_code == 200, response.content[:200]
+
+    yield 'auth.signup', signup, None
+    yield 'auth.login', login, None
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text())['results']
+    print(f'\nvs {baseline_path}')
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = (current['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        queries = current['queries'] - before['queries']
+        print(f"{name:<40} p50 {before['p50_ms']:8.2f} -> {current['p50_ms']:8.2f} ms ({change:+6.1f}%)  queries {queries:+d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--medicines', type=int, default=3, help='Medicines per user')
+    parser.add_argument('--schedules', type=int, default=2, help='Schedules per medicine')
+    parser.add_argument('--days', type=int, default=365, help='Days of intake and notification history')
+    parser.add_argument('--notifications-per-day', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--only', default='', help='Comma-separated case name prefixes to run')
+    parser.add_argument('--with-cache', action='store_true', help='Keep the per-user response cache enabled')
+    parser.add_argument('--output', default=None, help='Results file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', default=None, help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    setup_django()
+    import django
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+    from django.test import override_settings
+
+    from api.models import User
+
+    from .seed import seed
+
+    started = time.perf_counter()
+    users = seed(
+        users=args.users, medicines_per_user=args.medicines, schedules_per_medicine=args.schedules,
+        days=args.days, notifications_per_day=args.notifications_per_day, seed=args.seed,
+    )
+    print(f'seeded {args.users} users x {args.days} days in {time.perf_counter() - started:.1f}s')
+    target = users[len(users) // 2]
+    User.objects.filter(pk=target.pk).update(password=make_password(PASSWORD))
+    target.refresh_from_db()
+
+    overrides = {} if args.with_cache else {'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}}
+    prefixes = [prefix for prefix in args.only.split(',') if prefix]
+    results = {}
+    with override_settings(**overrides):
+        cases = itertools.chain(api_cases(target), serializer_cases(target), reminder_cases(), auth_cases(target))
+        for name, fn, setup in cases:
+            if prefixes and not any(name.startswith(prefix) for prefix in prefixes):
+                continue
+            results[name] = profile(fn, repeat=args.repeat, setup=setup)
+            result = results[name]
+            print(f"{name:<40} queries={result['queries']:<4} p50={result['p50_ms']:8.2f} ms  p95={result['p95_ms']:8.2f} ms")
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        'meta': {
+            'revision': git_revision(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'args': vars(args),
+        },
+        'results': results,
+    }, indent=2))
+    print(f'results written to {output}')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
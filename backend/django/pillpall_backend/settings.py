@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -58,6 +59,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -91,27 +93,112 @@ WSGI_APPLICATION = 'pillpall_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgres for production; the default SQLite file suits single-node installs.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'pillpall'),
+            'USER': os.environ.get('DB_USER', 'pillpall'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # Persistent connections, verified before reuse after a request boundary
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('DB_POOL_MAX_SIZE'):
+        # psycopg's in-process pool replaces persistent connections
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        }
+    if os.environ.get('DB_PGBOUNCER') == '1':
+        # Transaction-mode PgBouncer cannot keep server-side cursors open across statements
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+else:
+    # WAL lets readers proceed while the reminder jobs write; NORMAL sync is durable in WAL
+    # mode short of power loss. Opt-in (SQLITE_WAL=1) because switching converts the file
+    # for good, which would rewrite the committed dev database on every manage.py run.
+    SQLITE_WAL = os.environ.get('SQLITE_WAL') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # busy_timeout waits for locks instead of failing with "database is locked",
+                # and IMMEDIATE takes the write lock at BEGIN so transactions never deadlock
+                # upgrading it.
+                'init_command': (
+                    ('PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;' if SQLITE_WAL else '')
+                    + f"PRAGMA busy_timeout={int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))};"
+                ),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
-}
+
+# Cache
+# Local memory by default; point CACHE_URL at Redis (redis://host:6379/1) when running several workers
+if os.environ.get('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Per-route request metrics served at /metrics (api/metrics.py). The scraper must send
+# "Authorization: Bearer <METRICS_TOKEN>"; without a token the endpoint is closed unless METRICS_PUBLIC=1
+# opts into serving it to anyone. Requests over the query threshold are logged (0 disables).
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_PUBLIC = os.environ.get('METRICS_PUBLIC') == '1'
+METRICS_QUERY_WARNING_THRESHOLD = int(os.environ.get('METRICS_QUERY_WARNING_THRESHOLD', '30'))
+
+# Fan-out for the notification push stream (api/push.py). The in-process broker only reaches
+# clients connected to the same worker; use api.push.RedisBroker when running several.
+NOTIFICATION_PUSH_BROKER = os.environ.get('NOTIFICATION_PUSH_BROKER', 'api.push.InProcessBroker')
+NOTIFICATION_PUSH_URL = os.environ.get('NOTIFICATION_PUSH_URL', os.environ.get('CACHE_URL', 'redis://localhost:6379/0'))
+# Seconds between keep-alive comments on an idle stream
+NOTIFICATION_STREAM_HEARTBEAT = 15
+# Seconds a stream token (the ?stream_token= EventSource connects with) stays valid; it only has to
+# outlive the connect, since an open stream is not re-checked
+NOTIFICATION_STREAM_TOKEN_LIFETIME = 60
+
+# Seconds a cached per-user API response is kept; signals invalidate it earlier on writes
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Build list responses from .values() rows instead of ModelSerializers (see api/fastpath.py)
+API_FAST_LIST_SERIALIZATION = True
 
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.fastpath.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', '50')),
 }
 
 # JWT Settings
@@ -120,7 +207,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': False,
-    'UPDATE_LAST_LOGIN': True,
+    # Writing last_login on every /api/auth/token/ call costs an UPDATE per login; opt in with JWT_UPDATE_LAST_LOGIN=1
+    'UPDATE_LAST_LOGIN': os.environ.get('JWT_UPDATE_LAST_LOGIN', '0') == '1',
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'VERIFYING_KEY': None,
@@ -148,6 +236,85 @@ CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BEAT_SCHEDULE = {
+    'send-medication-reminders': {
+        'task': 'api.tasks.send_medication_reminders',
+        'schedule': 60.0,
+    },
+    'drain-notification-outbox': {
+        'task': 'api.tasks.drain_notification_outbox',
+        'schedule': 30.0,
+    },
+    'sweep-missed-doses': {
+        'task': 'api.tasks.sweep_missed_doses',
+        'schedule': 300.0,
+    },
+    'forecast-refills': {
+        'task': 'api.tasks.forecast_refills',
+        'schedule': 3600.0,
+    },
+    'materialize-medicine-intakes': {
+        'task': 'api.tasks.materialize_medicine_intakes',
+        'schedule': 3600.0,
+    },
+}
+
+# Reminder fan-out: user-id shards per beat, minutes ahead to scan, and how long a shard lock lives
+REMINDER_SHARDS = int(os.environ.get('REMINDER_SHARDS', '8'))
+REMINDER_WINDOW_MINUTES = 30
+REMINDER_SHARD_LOCK_SECONDS = 120
+
+# Missed-dose sweeper (api/sweeper.py): pending intakes this long overdue become "missed";
+# caregivers only hear about doses due within the max age, so an old backlog pages nobody
+MISSED_DOSE_GRACE_MINUTES = int(os.environ.get('MISSED_DOSE_GRACE_MINUTES', '60'))
+MISSED_DOSE_ESCALATION_MAX_AGE_HOURS = 24
+MISSED_DOSE_SWEEP_BATCH_SIZE = 1000
+MISSED_DOSE_SWEEP_LOCK_SECONDS = 600
+
+# SMS gateway used for medication reminders
+SMS_GATEWAY_URL = os.environ.get('SMS_GATEWAY_URL', 'http://localhost:8787/api/sms')
+SMS_GATEWAY_TIMEOUT = float(os.environ.get('SMS_GATEWAY_TIMEOUT', '5'))
+SMS_DISPATCH_CONCURRENCY = int(os.environ.get('SMS_DISPATCH_CONCURRENCY', '16'))
+
+# Notification outbox (api/outbox.py): batch size, retry backoff and the lease a worker holds on claimed rows
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '6'))
+OUTBOX_BACKOFF_SECONDS = 30
+OUTBOX_BACKOFF_MAX_SECONDS = 3600
+OUTBOX_LEASE_SECONDS = 300
+
+# How far ahead schedules are expanded into pending intakes
+INTAKE_MATERIALIZE_HORIZON_HOURS = 48
+
+# Rows fetched per database round trip and encoded per streamed chunk by the exports (api/export.py)
+EXPORT_CHUNK_SIZE = 2000
+
+# Drug catalog behind /api/medicines/match/ (api/drugmatch.py): one "name<TAB>strength;strength"
+# per line. The bundled file is a small sample; point this at a full export in production.
+DRUG_CATALOG_PATH = os.environ.get('DRUG_CATALOG_PATH', str(BASE_DIR / 'api' / 'data' / 'drug_catalog.tsv'))
+# Index the catalog when the app starts instead of on the first match request. On by default when
+# DRUG_CATALOG_PATH points at a real export; the bundled sample is cheap enough to build lazily.
+DRUG_CATALOG_PRELOAD = os.environ.get('DRUG_CATALOG_PRELOAD', '1' if 'DRUG_CATALOG_PATH' in os.environ else '0') == '1'
+# Minimum trigram similarity (0-1) for a catalog name to be suggested
+DRUG_MATCH_THRESHOLD = 0.3
+
+# Delta sync re-sends rows changed this long before the client's token, to cover late commits
+SYNC_OVERLAP_SECONDS = 5
+
+# Authenticated users are served from the cache for this many seconds (api/authentication.py); 0 disables
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', '300'))
+
+# Password hashing cost. Each login and signup spends one hash; Django's default of 1,000,000
+# PBKDF2 iterations is ~0.5 s of CPU, so a login burst pins every core. 600,000 is the OWASP
+# minimum for PBKDF2-SHA256; measure with `python -m benchmarks.hashers` before changing it.
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', '600000'))
+PASSWORD_HASHERS = [
+    'api.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -4,9 +4,12 @@ import { Button } from "@/components/ui/button";
 import { Badge } from "@/components/ui/badge";
 import { Bell, BellOff, Clock, Pill, AlertTriangle, Check, X } from "lucide-react";
 import { useAuth } from "@/hooks/useAuth";
-import { apiFetch } from "@/lib/apiClient";
+import { apiFetch, openEventStream } from "@/lib/apiClient";
 import { useToast } from "@/components/ui/use-toast";
 
+// How often the list is re-fetched when the push stream is unavailable
+const POLL_INTERVAL_MS = 30000;
+
 interface Notification {
   id: string;
   title: string;
@@ -32,8 +35,9 @@ const NotificationCenter = () => {
     }
 
     try {
+      // Only the newest page is shown
       const data = await apiFetch('/notifications/');
-      setNotifications((data || []).map((notif: any) => ({
+      setNotifications((data?.results || []).map((notif: any) => ({
         ...notif,
         status: notif.status as 'pending' | 'sent' | 'read'
       })) || []);
@@ -57,7 +61,7 @@ const NotificationCenter = () => {
         title: "Test notification created!",
         description: "Check your notifications list to see the test notification.",
       });
-      fetchNotifications(); // Refresh the list
+      fetchNotifications();
     } catch (error: any) {
       toast({
         title: "Error creating test notification",
@@ -129,6 +133,61 @@ const NotificationCenter = () => {
     fetchNotifications();
   }, [user]);
 
+  // New notifications are pushed by the server; without a stream the list is polled instead
+  useEffect(() => {
+    if (!user) return;
+    let stream: EventSource | null = null;
+    let poll: ReturnType<typeof setInterval> | undefined;
+    let lastEventId = '';
+    let cancelled = false;
+
+    const startPolling = () => {
+      if (!poll) poll = setInterval(fetchNotifications, POLL_INTERVAL_MS);
+    };
+
+    const connect = async () => {
+      let opened = false;
+      try {
+        stream = await openEventStream(
+          '/async/notifications/stream/',
+          '/async/notifications/stream/token/',
+          lastEventId ? { last_event_id: lastEventId } : {},
+        );
+      } catch {
+        if (!cancelled) startPolling();
+        return;
+      }
+      if (cancelled) {
+        stream.close();
+        return;
+      }
+      stream.onopen = () => { opened = true; };
+      stream.addEventListener('notification', (event) => {
+        const message = event as MessageEvent;
+        lastEventId = message.lastEventId;
+        const notif = JSON.parse(message.data) as Notification;
+        setNotifications(prev => prev.some(n => n.id === notif.id) ? prev : [notif, ...prev]);
+      });
+      stream.onerror = () => {
+        // EventSource retries a dropped connection with the same, by then expired, token and
+        // gives up on the 401; reconnect with a fresh one, or poll if the stream never came up
+        if (stream?.readyState !== EventSource.CLOSED || cancelled) return;
+        if (opened) {
+          connect();
+        } else {
+          startPolling();
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      cancelled = true;
+      stream?.close();
+      clearInterval(poll);
+    };
+  }, [user]);
+
   if (loading) {
     return (
       <Card className="pill-card">
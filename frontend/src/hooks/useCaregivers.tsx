@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { apiFetch } from "@/lib/apiClient";
+import { apiFetch, apiFetchAll } from "@/lib/apiClient";
 import { useAuth } from "./useAuth";
 import { useToast } from "@/components/ui/use-toast";
 
@@ -35,7 +35,7 @@ export const useCaregivers = () => {
     }
 
     try {
-      const data = await apiFetch('/caregivers/');
+      const data = await apiFetchAll('/caregivers/');
       setCaregivers(data || []);
     } catch (error: any) {
       console.error('Error fetching caregivers:', error);
@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { apiFetch } from "@/lib/apiClient";
+import { apiFetch, apiFetchAll } from "@/lib/apiClient";
 import { useAuth } from "./useAuth";
 import { useToast } from "@/components/ui/use-toast";
 
@@ -28,7 +28,7 @@ export const useMedicineIntakes = () => {
 
     try {
       // Fetch recent intakes (server filters by user)
-      const data = await apiFetch('/intakes/');
+      const data = await apiFetchAll('/intakes/');
       setIntakes((data || []).map((intake: any) => ({
         ...intake,
         status: intake.status as 'pending' | 'taken' | 'missed' | 'skipped',
@@ -52,17 +52,30 @@ export const useMedicineIntakes = () => {
     }
 
     try {
-      const now = new Date().toISOString();
-      await apiFetch('/intakes/', {
+      const now = new Date();
+      // Resolve the dose slot the scheduler already created (the pending one closest to now) rather
+      // than adding a second intake next to it, which the missed-dose sweeper would then mark missed
+      const today = await apiFetch('/today/');
+      const pending = (today?.slots || []).filter(
+        (slot: any) => String(slot.medicine) === String(medicineId) && slot.status === 'pending'
+      );
+      const distance = (slot: any) => Math.abs(new Date(slot.scheduled_time).getTime() - now.getTime());
+      const slot = pending.sort((a: any, b: any) => distance(a) - distance(b))[0];
+
+      // The bulk endpoint updates the intake already at (medicine, scheduled_time) or creates it
+      const [result] = await apiFetch('/intakes/bulk/', {
         method: 'POST',
-        body: JSON.stringify({
+        body: JSON.stringify([{
           medicine: parseInt(medicineId),
-          scheduled_time: now,
-          actual_time: status === 'taken' ? now : null,
+          scheduled_time: slot ? slot.scheduled_time : now.toISOString(),
+          actual_time: status === 'taken' ? now.toISOString() : null,
           status,
           notes: notes || '',
-        })
+        }])
       });
+      if (result?.result === 'error') {
+        throw new Error(Object.values(result.errors || {}).flat().join(' ') || "Failed to record medication intake");
+      }
 
       await fetchTodayIntakes();
     } catch (error: any) {
@@ -75,16 +88,14 @@ export const useMedicineIntakes = () => {
     if (!user) return { compliance: 0, totalDoses: 0, takenDoses: 0 };
 
     try {
-      const data = await apiFetch('/intakes/');
+      // Counts are aggregated server-side from the daily adherence rollup
       const windowStart = new Date();
       windowStart.setDate(windowStart.getDate() - days);
-      
-      const windowed = (data || []).filter((i: any) => 
-        new Date(i.scheduled_time) >= windowStart
-      );
-      
-      const totalDoses = windowed.length || 0;
-      const takenDoses = windowed.filter((i: any) => i.status === 'taken').length || 0;
+      const start = windowStart.toISOString().slice(0, 10);
+      const data = await apiFetch(`/adherence/?start=${start}`);
+
+      const totalDoses = data?.totals?.total || 0;
+      const takenDoses = data?.totals?.taken || 0;
       const compliance = totalDoses > 0 ? Math.round((takenDoses / totalDoses) * 100) : 0;
 
       return { compliance, totalDoses, takenDoses };
@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { apiFetch } from "@/lib/apiClient";
+import { apiFetch, apiFetchAll } from "@/lib/apiClient";
 import { useAuth } from "./useAuth";
 import { useToast } from "@/components/ui/use-toast";
 
@@ -17,6 +17,7 @@ export interface Medicine {
   type: string;
   remaining_count: number;
   refill_threshold: number;
+  runs_out_on?: string | null;
   instructions?: string;
   side_effects?: string;
   schedules?: MedicineSchedule[];
@@ -46,7 +47,7 @@ export const useMedicines = () => {
     }
 
     try {
-      const data = await apiFetch('/medicines/');
+      const data = await apiFetchAll('/medicines/');
       setMedicines(data || []);
     } catch (error: any) {
       console.error('Error fetching medicines:', error);
@@ -129,7 +130,7 @@ export const useMedicines = () => {
 
       // Get existing schedules and delete them
       try {
-        const existingSchedules = await apiFetch(`/schedules/?medicine=${medicineId}`);
+        const existingSchedules = await apiFetchAll(`/schedules/?medicine=${medicineId}`);
         if (existingSchedules && existingSchedules.length > 0) {
           const deletePromises = existingSchedules.map((schedule: any) =>
             apiFetch(`/schedules/${schedule.id}/`, { method: 'DELETE' })
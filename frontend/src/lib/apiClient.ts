@@ -17,7 +17,9 @@ export async function apiFetch(path: string, options: RequestInit = {}) {
   }
 
   try {
-    const res = await fetch(`${API_BASE}${path}`, { 
+    // Pagination links come back as absolute URLs
+    const url = /^https?:\/\//.test(path) ? path : `${API_BASE}${path}`;
+    const res = await fetch(url, { 
       ...options, 
       headers,
       credentials: 'include'
@@ -59,4 +61,30 @@ export async function apiFetch(path: string, options: RequestInit = {}) {
     }
     throw new Error('Network error occurred');
   }
-}
\ No newline at end of file
+}
+
+// List endpoints are cursor-paginated; follow `next` links and return every row.
+export async function apiFetchAll(path: string, options: RequestInit = {}) {
+  const rows: any[] = [];
+  let next: string | null = path;
+  while (next) {
+    const page = await apiFetch(next, options);
+    if (Array.isArray(page)) return page;
+    rows.push(...(page?.results || []));
+    next = page?.next || null;
+  }
+  return rows;
+}
+
+// Server-Sent Events stream. EventSource cannot send headers, so it connects with a short-lived
+// token from `tokenPath` rather than putting the access token in the URL (and in access logs).
+// Rejects when the server cannot stream (503 outside ASGI); callers fall back to polling.
+export async function openEventStream(path: string, tokenPath: string, params: Record<string, string> = {}) {
+  const { token } = await apiFetch(tokenPath, { method: 'POST' });
+  const url = new URL(`${API_BASE}${path}`);
+  for (const [key, value] of Object.entries(params)) {
+    url.searchParams.set(key, value);
+  }
+  url.searchParams.set('stream_token', token);
+  return new EventSource(url.toString());
+}